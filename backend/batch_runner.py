@@ -0,0 +1,195 @@
+# Dec207Hub Backend Batch Runner
+# 배치 채팅 - 동시 실행 상한, 완료 순서 NDJSON 결과, 항목 ID 기반 재개
+
+import time
+import uuid
+import hashlib
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, AsyncIterator
+from config import (
+    DEFAULT_MODEL, BATCH_DEFAULT_CONCURRENCY, BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS,
+    BATCH_STORE_MAX_BATCHES, BATCH_RESULT_TTL, BATCH_QUEUE_RETRY_DELAY, BATCH_QUEUE_MAX_RETRIES
+)
+from chat_handler import chat_with_ollama
+from scheduler import SchedulerQueueFull, PRIORITY_BATCH
+
+logger = logging.getLogger(__name__)
+
+class BatchValidationError(ValueError):
+    """배치 입력 오류"""
+
+class BatchItem:
+    """배치 항목 1건"""
+    __slots__ = ("item_id", "message", "model")
+
+    def __init__(self, item_id: str, message: str, model: str):
+        self.item_id = item_id
+        self.message = message
+        self.model = model
+
+def parse_batch_items(raw_items: List[Dict[str, Any]], default_model: Optional[str] = None) -> List[BatchItem]:
+    """배치 항목 검증 - ID가 없으면 순번을 ID로 사용 (같은 목록을 다시 보내면 같은 ID)"""
+    if not raw_items:
+        raise BatchValidationError("배치 항목이 없습니다")
+    if len(raw_items) > BATCH_MAX_ITEMS:
+        raise BatchValidationError(f"배치 항목은 최대 {BATCH_MAX_ITEMS}개입니다")
+
+    items = []
+    seen = set()
+    for index, raw in enumerate(raw_items):
+        if not isinstance(raw, dict):
+            raise BatchValidationError(f"{index}번째 항목이 객체가 아닙니다")
+        item_id = str(raw.get("id", index))
+        if item_id in seen:
+            raise BatchValidationError(f"중복된 항목 ID: {item_id}")
+        seen.add(item_id)
+        message = str(raw.get("message", "")).strip()
+        if not message:
+            raise BatchValidationError(f"항목 {item_id}에 메시지가 없습니다")
+        items.append(BatchItem(item_id, message, raw.get("model") or default_model or DEFAULT_MODEL))
+    return items
+
+def validate_batch_options(batch_id: Any, concurrency: Any):
+    """JSON 본문의 batch_id/concurrency 형식 검증 (스트리밍 시작 전에 400으로 거절하기 위함)"""
+    if batch_id is not None and (not isinstance(batch_id, str) or not batch_id.strip()):
+        raise BatchValidationError("batch_id는 비어 있지 않은 문자열이어야 합니다")
+    if concurrency is not None and (not isinstance(concurrency, int) or isinstance(concurrency, bool)):
+        raise BatchValidationError("concurrency는 정수여야 합니다")
+
+def item_fingerprint(item: BatchItem) -> str:
+    """재개 시 같은 항목인지 확인하는 지문 (모델 + 메시지)"""
+    return hashlib.sha256(f"{item.model}\x00{item.message}".encode("utf-8")).hexdigest()
+
+class BatchResultStore:
+    """배치별 완료 결과 보관 (재개 시 완료된 항목은 다시 실행하지 않음)"""
+
+    def __init__(self, max_batches: int, ttl: float):
+        self.max_batches = max_batches
+        self.ttl = ttl
+        self._batches: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        self._expire()
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            batch = {"results": {}, "fingerprints": {}, "updated": time.monotonic()}
+            self._batches[batch_id] = batch
+            while len(self._batches) > self.max_batches:
+                self._batches.popitem(last=False)
+        else:
+            self._batches.move_to_end(batch_id)
+        return batch["results"]
+
+    def store(self, batch_id: str, item: BatchItem, result: Dict[str, Any]):
+        batch = self._batches.get(batch_id)
+        if batch is not None:
+            batch["results"][item.item_id] = result
+            batch["fingerprints"][item.item_id] = item_fingerprint(item)
+            batch["updated"] = time.monotonic()
+
+    def validate_resume(self, batch_id: str, items: List[BatchItem]):
+        """같은 batch_id 재개 시 완료된 항목의 메시지/모델이 이전 실행과 다르면 거절"""
+        self._expire()
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            return
+        for item in items:
+            stored = batch["fingerprints"].get(item.item_id)
+            if stored is not None and stored != item_fingerprint(item):
+                raise BatchValidationError(f"항목 {item.item_id}의 내용이 같은 batch_id의 이전 실행과 다릅니다")
+
+    def _expire(self):
+        now = time.monotonic()
+        for batch_id in [b for b, batch in self._batches.items() if now - batch["updated"] > self.ttl]:
+            del self._batches[batch_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "batches": len(self._batches),
+            "stored_results": sum(len(b["results"]) for b in self._batches.values())
+        }
+
+async def run_batch_item(item: BatchItem, client_id: str) -> str:
+    """배치 항목 실행 - 스케줄러 대기열이 가득 차면 대화형 요청에 양보하고 잠시 후 재시도
+
+    생성 실패(타임아웃, 서킷 open, 연결 오류)는 안내 문구 대신 GenerationFailed로 전달
+    """
+    for attempt in range(BATCH_QUEUE_MAX_RETRIES + 1):
+        try:
+            return await chat_with_ollama(
+                item.message, item.model, None,
+                client_id=client_id, priority=PRIORITY_BATCH, raise_on_failure=True
+            )
+        except SchedulerQueueFull:
+            if attempt == BATCH_QUEUE_MAX_RETRIES:
+                raise
+            await asyncio.sleep(BATCH_QUEUE_RETRY_DELAY)
+
+async def run_batch(items: List[BatchItem], batch_id: Optional[str] = None,
+                    concurrency: Optional[int] = None, client_id: str = "unknown",
+                    emit_completed: bool = True) -> AsyncIterator[Dict[str, Any]]:
+    """배치 실행 - 시작/결과(완료 순서)/요약 이벤트를 차례로 반환
+
+    같은 batch_id로 다시 요청하면 이미 완료된 항목은 실행하지 않고 저장된 결과를 돌려줌
+    (emit_completed=False면 생략). 클라이언트 연결이 끊기면 진행 중인 항목은 취소됨
+    """
+    batch_id = batch_id or uuid.uuid4().hex
+    concurrency = max(1, min(concurrency or BATCH_DEFAULT_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    completed = batch_store.results(batch_id)
+    pending = [item for item in items if item.item_id not in completed]
+    resumed = len(items) - len(pending)
+    started = time.monotonic()
+    failed = 0
+
+    logger.info(f"📦 배치 시작 {batch_id[:12]}: {len(pending)}건 실행, {resumed}건 재개 생략 (동시 {concurrency})")
+    yield {"type": "batch_start", "batch_id": batch_id, "total": len(items),
+           "pending": len(pending), "resumed": resumed, "concurrency": concurrency}
+
+    if emit_completed:
+        for item in items:
+            if item.item_id in completed:
+                yield {**completed[item.item_id], "resumed": True}
+
+    results: asyncio.Queue = asyncio.Queue()
+    queue_iter = iter(pending)
+
+    async def worker():
+        for item in queue_iter:
+            item_started = time.monotonic()
+            result = {"type": "result", "id": item.item_id, "model": item.model,
+                      "started": round(item_started - started, 3)}
+            try:
+                result["response"] = await run_batch_item(item, f"batch:{client_id}")
+                result["status"] = "ok"
+                result["elapsed"] = round(time.monotonic() - item_started, 3)
+                batch_store.store(batch_id, item, result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 실패한 항목은 저장하지 않음 → 같은 batch_id로 재개하면 다시 실행
+                result["status"] = "error"
+                result["error"] = str(e)
+                result["elapsed"] = round(time.monotonic() - item_started, 3)
+            await results.put(result)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(pending)))]
+    try:
+        for _ in range(len(pending)):
+            result = await results.get()
+            if result["status"] != "ok":
+                failed += 1
+            yield result
+    finally:
+        for task in workers:
+            task.cancel()
+
+    elapsed = time.monotonic() - started
+    logger.info(f"📦 배치 완료 {batch_id[:12]}: {len(pending) - failed}건 성공, {failed}건 실패 ({elapsed:.1f}초)")
+    yield {"type": "summary", "batch_id": batch_id, "total": len(items),
+           "completed": len(pending) - failed + resumed, "failed": failed,
+           "resumed": resumed, "elapsed": round(elapsed, 3)}
+
+# 전역 배치 결과 저장소 인스턴스
+batch_store = BatchResultStore(BATCH_STORE_MAX_BATCHES, BATCH_RESULT_TTL)
@@ -2,171 +2,592 @@
 # Gemma3-Tools 4B + Gemma3 4B 일반화된 할루시네이션 방지
 
 import json
+import time
 import httpx
+import asyncio
 import logging
 import re
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
 from config import (
-    OLLAMA_BASE_URL, DEFAULT_MODEL, FALLBACK_MODEL, HTTP_TIMEOUT, 
+    DEFAULT_MODEL, FALLBACK_MODEL, HTTP_TIMEOUT, 
     MAX_CONVERSATION_HISTORY, MAX_CONTEXT_MESSAGES, MAX_MESSAGE_LENGTH,
     AI_TEMPERATURE, AI_TOP_P, AI_REPEAT_PENALTY, AI_MAX_NEW_TOKENS,
     ENABLE_MCP, ENABLE_FUNCTION_CALLING, ENABLE_FACT_CHECK, 
-    FAST_RESPONSE_MODE, RESPONSE_TIMEOUT
+    FAST_RESPONSE_MODE, RESPONSE_TIMEOUT, ENABLE_STREAMING, FALLBACK_TIMEOUT,
+    REQUEST_DEADLINE, ENABLE_HEDGING, CONTEXT_WINDOW, OLLAMA_NUM_CTX, OLLAMA_NUM_PREDICT,
+    PROMPT_LAYOUT, OLLAMA_KEEP_ALIVE
 )
+from ollama_pool import ollama_pool, OllamaNode
+from response_cache import response_cache, make_cache_key
+from semantic_cache import semantic_cache
+from request_coalescer import request_coalescer, InFlightGeneration, make_coalesce_key
+from scheduler import gpu_scheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE, QueueUpdateCallback
+from hedging import RequestDeadline, latency_tracker, hedge_stats, hedged_call, hedged_stream
+from circuit_breaker import circuit_breakers, CircuitOpenError
+from context_builder import ContextPlan, plan_context, estimate_tokens, MESSAGE_OVERHEAD_TOKENS
+from prompt_metrics import prompt_eval_stats
+from response_filter import response_filter, FilterRule
 
 logger = logging.getLogger(__name__)
 
+CONTEXT_HEADER = "이전 대화:\n"
+SUMMARY_HEADER = "이전 대화 요약:\n"
+EXCESS_NEWLINES = re.compile(r'\n{3,}')
+# 턴마다 바이트 단위로 동일해야 Ollama KV 캐시가 prefix를 재사용함 (시각 등 가변 값 넣지 말 것)
+SAFETY_SYSTEM_PROMPT = """정확성을 최우선으로 하는 AI 어시스턴트입니다.
+
+**응답 원칙:**
+1. 존재하지 않는 정보나 최신 정보 조작 금지
+2. 사실과 의견을 명확히 구분"""
+CIRCUIT_OPEN_MESSAGE = "AI 서버가 일시적으로 응답하지 않아 요청을 바로 중단했습니다. 잠시 후 다시 시도해주세요."
+TIMEOUT_MESSAGE = "응답 시간이 초과되었습니다. 잠시 후 다시 시도해주세요."
+CONNECTION_ERROR_MESSAGE = "AI 연결 오류가 발생했습니다. 잠시 후 다시 시도해주세요."
+FALLBACK_FAILED_MESSAGE = "죄송합니다. 현재 AI 서비스에 문제가 있습니다. 잠시 후 다시 시도해주세요."
+
+class GenerationFailed(Exception):
+    """응답 생성 실패 - 사용자에게 보여줄 안내 문구를 담음"""
+
 async def chat_with_ollama(message: str, model: str = DEFAULT_MODEL, 
                           conversation_history: List[Dict] = None,
-                          enable_tools: bool = True) -> str:
-    """Gemma3-Tools 4B 채팅 + 일반화된 할루시네이션 방지"""
+                          enable_tools: bool = True,
+                          client_id: str = "unknown",
+                          priority: str = PRIORITY_BATCH,
+                          on_queue_update: Optional[QueueUpdateCallback] = None,
+                          summary: Optional[str] = None,
+                          num_predict: Optional[int] = None,
+                          raise_on_failure: bool = False) -> str:
+    """Gemma3-Tools 4B 채팅 + 일반화된 할루시네이션 방지
+    
+    생성은 GPU 스케줄러 슬롯 안에서만 실행되며, 대기열이 가득 차면 SchedulerQueueFull 발생
+    summary는 conversation_history 이전 턴들의 누적 요약 (세션 저장소 제공)
+    num_predict는 모델 라우터가 정한 응답 길이 상한 (없으면 OLLAMA_NUM_PREDICT)
+    생성 실패 시 안내 문구를 응답으로 반환하며, raise_on_failure면 GenerationFailed 발생 (배치 등)
+    """
+    # 토큰 예산 안에서 컨텍스트 + 일반화된 안전 프롬프트 구성
+    messages, plan = build_prompt_messages(conversation_history, message, summary)
+    
+    # 안전한 응답용 페이로드
+    payload = build_safe_payload(model, messages, num_predict=num_predict)
+    
+    # 응답 캐시 조회 (정확 일치 → 의미 유사)
+    cached, cache_ref = await lookup_cached_response(
+        model, message, conversation_history, prompt_cache_text(messages), payload["options"]
+    )
+    if cached is not None:
+        logger.info(f"캐시 응답 반환: {message[:30]}...")
+        return cached
+    
+    # 동일 요청이 진행 중이면 그 결과를 함께 받음
+    async def generate(shared: InFlightGeneration):
+        # 슬롯은 합류한 요청 중 가장 높은 우선순위로 잡고, 대기 순번은 모든 요청에 알림
+        async with gpu_scheduler.slot(model, client_id, shared.priority, shared.notify_queue, shared.key):
+            try:
+                ai_response = await generate_ollama_response(
+                    message, model, conversation_history, payload, cache_ref, plan.prompt_tokens
+                )
+            except GenerationFailed as e:
+                # 합류한 요청마다 실패 처리 방식이 다르므로 예외 대신 표시된 done 이벤트로 공유
+                yield {"type": "done", "content": str(e), "failed": True}
+                return
+        yield {"type": "done", "content": ai_response}
+    
+    done = await request_coalescer.run(make_coalesce_key(cache_ref["key"], stream=False), generate,
+                                       priority, on_queue_update)
+    if done.get("failed") and raise_on_failure:
+        raise GenerationFailed(done["content"])
+    return done["content"]
+
+async def generate_ollama_response(message: str, model: str, conversation_history: List[Dict],
+                                   payload: Dict[str, Any], cache_ref: Dict[str, Any],
+                                   prompt_tokens: Optional[int] = None) -> str:
+    """Ollama 단건 생성 - 요청 예산 안에서 주 모델 지연 시 백업 모델로 헤지 (실패 시 GenerationFailed)"""
+    deadline = RequestDeadline(REQUEST_DEADLINE)
+    num_predict = payload["options"]["num_predict"]  # 백업 모델도 같은 응답 길이 상한
+    hedge = None
+    if ENABLE_HEDGING and model != FALLBACK_MODEL:
+        hedge = lambda: request_fallback_chat(message, deadline.remaining(), num_predict)
+    
     try:
-        timeout = RESPONSE_TIMEOUT if FAST_RESPONSE_MODE else HTTP_TIMEOUT
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            # 컨텍스트 구성
-            context_prompt = build_safe_context_prompt(conversation_history)
-            
-            # 일반화된 안전 프롬프트
-            enhanced_prompt = build_general_safety_prompt(context_prompt, message)
-            
-            # 안전한 응답용 페이로드
-            payload = build_safe_payload(model, enhanced_prompt)
-            
-            logger.info(f"Gemma3-Tools 4B 요청: {message[:30]}...")
-            response = await client.post(f"{OLLAMA_BASE_URL}/api/chat", json=payload)
+        logger.info(f"Gemma3-Tools 4B 요청: {message[:30]}...")
+        winner, data = await hedged_call(
+            lambda: request_ollama_chat(payload, deadline.remaining()),
+            hedge,
+            latency_tracker.hedge_delay(model, "total"),
+            deadline,
+            hedge_allowed=lambda: gpu_scheduler.has_capacity(FALLBACK_MODEL)
+        )
+        
+        if winner == "primary":
+            latency_tracker.record(model, "total", deadline.elapsed())
+            prompt_eval_stats.record(model, data, prompt_tokens)
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                # 응답 추출 및 검증
-                ai_response = extract_and_validate_response(data, message)
-                
-                logger.info(f"Gemma3-Tools 4B 응답 완료: {ai_response[:50]}...")
-                return ai_response
-            else:
-                logger.error(f"Ollama API 오류: {response.status_code}")
-                return await fallback_chat(message, conversation_history)
-                
-    except httpx.TimeoutException:
-        logger.warning("Gemma3-Tools 4B 응답 시간 초과 - 백업 모델 사용")
-        return await fallback_chat(message, conversation_history)
+            # 응답 추출 및 검증
+            ai_response = extract_and_validate_response(data, message)
+            await store_cached_response(model, message, cache_ref, ai_response)
+            logger.info(f"Gemma3-Tools 4B 응답 완료: {ai_response[:50]}...")
+        else:
+            # 백업 모델 응답도 같은 검증/필터를 거침 (주 모델 캐시 키에는 저장하지 않음)
+            ai_response = extract_and_validate_response(data, message)
+            logger.info(f"백업 모델 {FALLBACK_MODEL} 헤지 응답 채택")
+        return ai_response
+    
+    except asyncio.TimeoutError:
+        logger.warning(f"요청 예산 {REQUEST_DEADLINE:.0f}초 초과")
+        raise GenerationFailed(TIMEOUT_MESSAGE)
+    except CircuitOpenError as e:
+        logger.warning(f"서킷 open으로 즉시 실패: {str(e)}")
+        raise GenerationFailed(CIRCUIT_OPEN_MESSAGE)
     except Exception as e:
+        if hedge is None and not deadline.expired():
+            # 헤지 비활성화 시 기존 방식대로 남은 예산으로 백업 모델 시도
+            logger.warning(f"Gemma3-Tools 4B 실패 - 백업 모델 사용: {str(e)}")
+            return await fallback_chat(message, conversation_history, timeout=deadline.remaining(),
+                                       num_predict=num_predict)
         logger.error(f"Gemma3-Tools 4B 오류: {str(e)}")
-        return "AI 연결 오류가 발생했습니다. 잠시 후 다시 시도해주세요."
+        raise GenerationFailed(CONNECTION_ERROR_MESSAGE)
 
-def build_safe_context_prompt(conversation_history: List[Dict]) -> str:
-    """안전한 컨텍스트 프롬프트 구성"""
-    if not conversation_history:
-        return ""
+def acquire_node(model: str, tried: List[OllamaNode]) -> Tuple[OllamaNode, Any]:
+    """요청을 보낼 노드와 해당 노드의 서킷 브레이커 선택 (이미 시도한 노드 제외)"""
+    node = ollama_pool.select(model, exclude=tried)
+    breaker = circuit_breakers.get(model, node.base_url)
+    if not breaker.allow_request():
+        raise CircuitOpenError(f"{model} 서킷 open - 즉시 거절 ({node.base_url})")
+    tried.append(node)
+    return node, breaker
+
+def can_retry_on_other_node(model: str, tried: List[OllamaNode]) -> bool:
+    """연결 실패 시 아직 시도하지 않은 정상 노드가 남아 있는지"""
+    return any(node not in tried and node.has_model(model) for node in ollama_pool.usable_nodes())
+
+async def request_ollama_chat(payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """Ollama /api/chat 단건 호출 (200이 아니면 예외, 서킷 open 시 즉시 CircuitOpenError)
     
-    # 최근 대화만 간단히 포함 (4B 모델용)
-    recent_history = conversation_history[-2:]
-    context_lines = []
+    노드 풀에서 노드를 고르며, 연결 자체가 실패하면 다른 노드로 재시도
+    """
+    tried: List[OllamaNode] = []
+    while True:
+        node, breaker = acquire_node(payload["model"], tried)
+        started = time.monotonic()
+        recorded = False
+        try:
+            async with ollama_pool.track(node):
+                response = await node.client.post("/api/chat", json=payload, timeout=max(timeout, 0.1))
+            if response.status_code != 200:
+                logger.error(f"Ollama API 오류: {response.status_code} ({node.base_url})")
+                raise RuntimeError(f"Ollama API 오류: {response.status_code}")
+            breaker.record_success(time.monotonic() - started)
+            recorded = True
+            return response.json()
+        except httpx.ConnectError as e:
+            breaker.record_failure(str(e) or type(e).__name__)
+            recorded = True
+            if not can_retry_on_other_node(payload["model"], tried):
+                raise
+            logger.warning(f"Ollama 노드 연결 실패 - 다른 노드로 재시도: {node.base_url}")
+        except Exception as e:
+            breaker.record_failure(str(e) or type(e).__name__)
+            recorded = True
+            raise
+        finally:
+            if not recorded:
+                breaker.record_cancelled(time.monotonic() - started)
+
+async def stream_ollama_chat(payload: Dict[str, Any], timeout: float,
+                             final_stats: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Ollama /api/chat NDJSON 스트림에서 content 조각만 반환 (오류 시 예외, 서킷 open 시 즉시 CircuitOpenError)
+    
+    final_stats가 주어지면 마지막(done) 청크의 평가 지표를 채움.
+    첫 응답을 받기 전 연결이 실패하면 다른 노드로 재시도
+    """
+    tried: List[OllamaNode] = []
+    while True:
+        node, breaker = acquire_node(payload["model"], tried)
+        started = time.monotonic()
+        recorded = False
+        connected = False
+        try:
+            async with ollama_pool.track(node):
+                async with node.client.stream("POST", "/api/chat", json=payload, timeout=timeout) as response:
+                    connected = True
+                    if response.status_code != 200:
+                        logger.error(f"Ollama API 오류 (스트리밍): {response.status_code} ({node.base_url})")
+                        raise RuntimeError(f"Ollama API 오류: {response.status_code}")
+                    
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise RuntimeError(chunk["error"])
+                        
+                        content = chunk.get("message", {}).get("content", "")
+                        if content:
+                            if not recorded:
+                                # 첫 토큰 지연 기준으로 성공 기록
+                                breaker.record_success(time.monotonic() - started)
+                                recorded = True
+                            yield content
+                        
+                        if chunk.get("done"):
+                            if final_stats is not None:
+                                final_stats.update({k: v for k, v in chunk.items() if k != "message"})
+                            break
+            return
+        except httpx.ConnectError as e:
+            breaker.record_failure(str(e) or type(e).__name__)
+            recorded = True
+            if connected or not can_retry_on_other_node(payload["model"], tried):
+                raise
+            logger.warning(f"Ollama 노드 연결 실패 - 다른 노드로 재시도 (스트리밍): {node.base_url}")
+        except Exception as e:
+            breaker.record_failure(str(e) or type(e).__name__)
+            recorded = True
+            raise
+        finally:
+            if not recorded:
+                breaker.record_cancelled(time.monotonic() - started)
+
+async def stream_chat_with_ollama(message: str, model: str = DEFAULT_MODEL,
+                                  conversation_history: List[Dict] = None,
+                                  client_id: str = "unknown",
+                                  priority: str = PRIORITY_INTERACTIVE,
+                                  on_queue_update: Optional[QueueUpdateCallback] = None,
+                                  summary: Optional[str] = None,
+                                  num_predict: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Ollama NDJSON 스트리밍 채팅 - 토큰 단위 delta 이벤트 후 최종 done 이벤트 반환
+
+    이벤트 형식:
+        {"type": "delta", "content": "..."}
+        {"type": "done", "content": "<검증된 전체 응답>", "first_token_time": float | None,
+         "context": {컨텍스트 토큰 사용 내역}}
+    """
+    messages, plan = build_prompt_messages(conversation_history, message, summary)
+    payload = build_safe_payload(model, messages, stream=True, num_predict=num_predict)
+    
+    # 응답 캐시 조회 (적중 시 한 번에 전달)
+    cached, cache_ref = await lookup_cached_response(
+        model, message, conversation_history, prompt_cache_text(messages), payload["options"]
+    )
+    if cached is not None:
+        logger.info(f"캐시 응답 반환 (스트리밍): {message[:30]}...")
+        yield {"type": "delta", "content": cached}
+        yield {"type": "done", "content": cached, "first_token_time": 0.0, "cached": True,
+               "context": plan.to_dict()}
+        return
+    
+    # 동일 요청이 진행 중이면 같은 스트림을 처음부터 재생
+    async def generate(shared: InFlightGeneration):
+        async with gpu_scheduler.slot(model, client_id, shared.priority, shared.notify_queue, shared.key):
+            async for event in generate_ollama_stream(message, model, conversation_history, payload,
+                                                      cache_ref, plan.prompt_tokens):
+                yield event
     
-    for msg in recent_history:
+    events = request_coalescer.stream(make_coalesce_key(cache_ref["key"], stream=True), generate,
+                                      priority, on_queue_update)
+    async for event in events:
+        if event.get("type") == "done":
+            # 합쳐진 구독자끼리 이벤트 dict를 공유하므로 복사해서 추가
+            event = {**event, "context": plan.to_dict()}
+        yield event
+
+async def generate_ollama_stream(message: str, model: str, conversation_history: List[Dict],
+                                 payload: Dict[str, Any], cache_ref: Dict[str, Any],
+                                 prompt_tokens: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Ollama NDJSON 스트림 생성 - 첫 토큰이 늦으면 백업 모델로 헤지, 먼저 토큰을 낸 쪽 채택
+
+    요청 예산은 스트림 끝까지 적용 (소진되면 받은 만큼으로 마무리, done 이벤트에 deadline_exceeded)
+    """
+    deadline = RequestDeadline(REQUEST_DEADLINE)
+    read_timeout = RESPONSE_TIMEOUT if FAST_RESPONSE_MODE else HTTP_TIMEOUT
+    num_predict = payload["options"]["num_predict"]  # 백업 모델도 같은 응답 길이 상한
+    hedge = None
+    if ENABLE_HEDGING and model != FALLBACK_MODEL:
+        hedge = lambda: stream_fallback_chat(message, min(read_timeout, deadline.remaining()), num_predict)
+    chunks: List[str] = []
+    scanner = response_filter.scanner()  # 도착한 청크를 바로 검사 (완료 시 전체 재검사 없음)
+    final_stats: Dict[str, Any] = {}
+    prompt_eval = None
+    
+    try:
+        logger.info(f"Gemma3-Tools 4B 스트리밍 요청: {message[:30]}...")
+        winner, first_chunk, stream = await hedged_stream(
+            lambda: stream_ollama_chat(payload, min(read_timeout, deadline.remaining()), final_stats),
+            hedge,
+            latency_tracker.hedge_delay(model, "first_token"),
+            deadline,
+            hedge_allowed=lambda: gpu_scheduler.has_capacity(FALLBACK_MODEL)
+        )
+    except Exception as e:
+        answered_by = None  # 안내 문구로 끝나면 응답한 모델 없음
+        if isinstance(e, CircuitOpenError):
+            logger.warning(f"서킷 open으로 즉시 실패: {str(e)}")
+            ai_response = CIRCUIT_OPEN_MESSAGE
+        elif isinstance(e, (asyncio.TimeoutError, httpx.TimeoutException)) or deadline.expired():
+            logger.warning(f"요청 예산 {REQUEST_DEADLINE:.0f}초 초과 (스트리밍)")
+            ai_response = TIMEOUT_MESSAGE
+        elif hedge is not None:
+            logger.error(f"스트리밍 실패: {str(e)}")
+            ai_response = CONNECTION_ERROR_MESSAGE
+        else:
+            logger.warning(f"스트리밍 실패 - 백업 모델 사용: {str(e)}")
+            try:
+                ai_response = await fallback_chat(message, conversation_history, timeout=deadline.remaining(),
+                                                  num_predict=num_predict)
+                answered_by = FALLBACK_MODEL
+            except GenerationFailed as failed:
+                ai_response = str(failed)
+        yield {"type": "delta", "content": ai_response}
+        yield {"type": "done", "content": ai_response, "first_token_time": deadline.elapsed(),
+               "model": answered_by, "failed": answered_by is None}
+        return
+    
+    first_token_time = deadline.elapsed()
+    answered_by = model if winner == "primary" else FALLBACK_MODEL
+    if winner == "primary":
+        latency_tracker.record(model, "first_token", first_token_time)
+    logger.info(f"첫 토큰 도착: {first_token_time:.2f}초 ({answered_by})")
+    
+    chunks.append(first_chunk)
+    scanner.feed(first_chunk)
+    yield {"type": "delta", "content": first_chunk}
+    
+    deadline_exceeded = False
+    try:
+        while True:
+            try:
+                content = await asyncio.wait_for(stream.__anext__(), deadline.remaining())
+            except StopAsyncIteration:
+                break
+            chunks.append(content)
+            scanner.feed(content)
+            yield {"type": "delta", "content": content}
+        
+        findings = scanner.finish()
+        ai_response = extract_and_validate_response({"message": {"content": "".join(chunks)}}, message, findings)
+        if winner == "primary":
+            prompt_eval = prompt_eval_stats.record(model, final_stats, prompt_tokens)
+            await store_cached_response(model, message, cache_ref, ai_response)
+        logger.info(f"스트리밍 완료 ({answered_by}): {ai_response[:50]}...")
+    except asyncio.TimeoutError:
+        # 요청 예산 소진 → 업스트림 생성을 끊고 받은 만큼으로 마무리 (잘린 응답은 캐시하지 않음)
+        deadline_exceeded = True
+        hedge_stats.deadline_exceeded += 1
+        logger.warning(f"요청 예산 {REQUEST_DEADLINE:.0f}초 초과 - 스트리밍 중단 ({answered_by}, {len(chunks)}개 청크)")
+        findings = scanner.finish()
+        ai_response = extract_and_validate_response({"message": {"content": "".join(chunks)}}, message, findings)
+    except Exception as e:
+        # 이미 일부 토큰이 전송된 경우 받은 만큼으로 마무리
+        logger.error(f"스트리밍 중단: {str(e)}")
+        findings = scanner.finish()
+        ai_response = extract_and_validate_response({"message": {"content": "".join(chunks)}}, message, findings)
+    finally:
+        # 취소 시에도 업스트림 HTTP 스트림을 즉시 닫아 Ollama 생성 중단
+        await stream.aclose()
+    
+    yield {"type": "done", "content": ai_response, "first_token_time": first_token_time,
+           "model": answered_by, "prompt_eval": prompt_eval, "deadline_exceeded": deadline_exceeded,
+           "filter": [rule.rule_id for rule in findings]}
+
+async def lookup_cached_response(model: str, message: str, conversation_history: List[Dict],
+                                 prompt: str, options: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any]]:
+    """정확 일치 캐시 → 의미 유사 캐시 순 조회 - (캐시 응답, 저장용 참조) 반환
+    
+    의미 캐시는 대화 히스토리가 없는 단독 질문에만 사용 (문맥 의존 답변 오적중 방지)
+    """
+    cache_ref: Dict[str, Any] = {"key": make_cache_key(model, prompt, options), "embedding": None}
+    
+    if response_cache is not None:
+        cached = await response_cache.get(cache_ref["key"])
+        if cached is not None:
+            return cached, cache_ref
+    
+    if semantic_cache is not None and not conversation_history:
+        cached, cache_ref["embedding"] = await semantic_cache.lookup(model, message)
+        if cached is not None:
+            return cached, cache_ref
+    
+    return None, cache_ref
+
+async def store_cached_response(model: str, message: str, cache_ref: Dict[str, Any], ai_response: str):
+    """생성된 응답을 캐시에 저장"""
+    if response_cache is not None:
+        await response_cache.set(cache_ref["key"], ai_response)
+    if semantic_cache is not None and cache_ref.get("embedding") is not None:
+        semantic_cache.store(model, message, cache_ref["embedding"], ai_response)
+
+def pack_history(conversation_history: List[Dict], fixed_tokens: int) -> ContextPlan:
+    """토큰 예산 안에 들어가는 최근 히스토리 선택
+    
+    예산 = min(CONTEXT_WINDOW, num_ctx) - 생성 예약(num_predict) - 고정 프롬프트(안전 지침/질문) 토큰
+    """
+    plan = plan_context(
+        conversation_history,
+        num_ctx=min(CONTEXT_WINDOW, OLLAMA_NUM_CTX),
+        reserved_tokens=OLLAMA_NUM_PREDICT,
+        fixed_tokens=fixed_tokens
+    )
+    if conversation_history:
+        logger.info(
+            f"컨텍스트 패킹: {len(plan.messages)}/{len(conversation_history)}개 메시지, "
+            f"{plan.history_tokens}/{plan.budget} 토큰 (고정 {fixed_tokens}, 사유: {plan.reason})"
+        )
+    return plan
+
+def build_prompt_messages(conversation_history: List[Dict], message: str,
+                          summary: Optional[str] = None) -> Tuple[List[Dict[str, str]], ContextPlan]:
+    """Ollama messages 구성 - (메시지 목록, 패킹 결과) 반환
+    
+    chat 레이아웃: 고정 system 메시지 (+ 요약) + 역할별 히스토리 + 질문 → 같은 세션의 연속 턴이
+    동일한 prefix를 공유하므로 Ollama KV 캐시가 이전 턴 평가 결과를 재사용
+    legacy 레이아웃: 안전 지침/요약/히스토리/질문을 하나의 user 메시지로 합침
+    """
+    if PROMPT_LAYOUT != "chat":
+        context_prompt, plan = build_context_prompt(conversation_history, message, summary)
+        return [{"role": "user", "content": build_general_safety_prompt(context_prompt, message)}], plan
+    
+    fixed_tokens = (estimate_tokens(SAFETY_SYSTEM_PROMPT) + estimate_tokens(message)
+                    + 2 * MESSAGE_OVERHEAD_TOKENS)
+    if summary:
+        fixed_tokens += estimate_tokens(SUMMARY_HEADER + summary) + MESSAGE_OVERHEAD_TOKENS
+    plan = pack_history(conversation_history, fixed_tokens)
+    
+    messages = [{"role": "system", "content": SAFETY_SYSTEM_PROMPT}]
+    if summary:
+        # 요약은 새 버전이 나올 때만 바뀌므로 그 사이 턴들은 prefix 캐시를 계속 재사용
+        messages.append({"role": "system", "content": SUMMARY_HEADER + summary})
+    for msg in plan.messages:
+        role = "user" if msg.get('role') == 'user' else "assistant"
+        messages.append({"role": role, "content": msg.get('content', '')})
+    messages.append({"role": "user", "content": message})
+    return messages, plan
+
+def prompt_cache_text(messages: List[Dict[str, str]]) -> str:
+    """응답 캐시 키용 프롬프트 직렬화"""
+    return json.dumps(messages, ensure_ascii=False, separators=(",", ":"))
+
+def build_context_prompt(conversation_history: List[Dict], message: str,
+                         summary: Optional[str] = None) -> Tuple[str, ContextPlan]:
+    """토큰 예산 기반 컨텍스트 프롬프트 구성 (legacy 레이아웃) - (컨텍스트 프롬프트, 패킹 결과) 반환"""
+    summary_prompt = f"{SUMMARY_HEADER}{summary}\n\n" if summary else ""
+    fixed_tokens = estimate_tokens(build_general_safety_prompt(summary_prompt + CONTEXT_HEADER, message))
+    plan = pack_history(conversation_history, fixed_tokens)
+    
+    context_lines = []
+    for msg in plan.messages:
         role = "사용자" if msg.get('role') == 'user' else "AI"
-        content = msg.get('content', '')[:150]
-        context_lines.append(f"{role}: {content}")
+        context_lines.append(f"{role}: {msg.get('content', '')}")
     
-    return "이전 대화:\n" + "\n".join(context_lines) + "\n\n" if context_lines else ""
+    context_prompt = CONTEXT_HEADER + "\n".join(context_lines) + "\n\n" if context_lines else ""
+    return summary_prompt + context_prompt, plan
+
+def build_safe_context_prompt(conversation_history: List[Dict], message: str = "") -> str:
+    """안전한 컨텍스트 프롬프트 구성"""
+    return build_context_prompt(conversation_history, message)[0]
 
 def build_general_safety_prompt(context_prompt: str, message: str) -> str:
     """일반화된 안전 프롬프트"""
-    return f"""정확성을 최우선으로 하는 AI 어시스턴트입니다.
-
-**응답 원칙:**
-1. 존재하지 않는 정보나 최신 정보 조작 금지
-2. 사실과 의견을 명확히 구분
+    return f"""{SAFETY_SYSTEM_PROMPT}
 
 {context_prompt}질문: {message}
 
 정확한 답변:"""
 
-def build_safe_payload(model: str, prompt: str) -> Dict[str, Any]:
-    """안전한 응답용 페이로드 (4B 모델 최적화)"""
+def build_safe_payload(model: str, prompt, stream: bool = False,
+                       num_predict: Optional[int] = None) -> Dict[str, Any]:
+    """안전한 응답용 페이로드 (4B 모델 최적화) - prompt는 문자열 또는 messages 목록"""
+    messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
     return {
         "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "stream": False,
+        "messages": messages,
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,  # 모델/KV 캐시를 메모리에 유지
         "options": {
             "temperature": 0.2,  # 낮은 온도로 일관성 확보
             "top_p": 0.95,         # 토큰 선택 범위 축소
             "repeat_penalty": 1.2,
-            "num_predict": 2000,   # 4B 모델용 토큰 수
-            "num_ctx": 4096,      # 4B 모델용 컨텍스트
+            "num_predict": num_predict or OLLAMA_NUM_PREDICT,  # 4B 모델용 토큰 수 (부하 시 라우터가 축소)
+            "num_ctx": OLLAMA_NUM_CTX,          # 4B 모델용 컨텍스트
         }
     }
 
-def extract_and_validate_response(data: Dict[str, Any], original_message: str) -> str:
-    """응답 추출 및 일반화된 검증"""
+def extract_and_validate_response(data: Dict[str, Any], original_message: str,
+                                  findings: Optional[List[FilterRule]] = None) -> str:
+    """응답 추출 및 일반화된 검증 (스트리밍에서 이미 검사한 결과가 있으면 재검사하지 않음)"""
     ai_response = data.get("message", {}).get("content", "응답을 생성할 수 없습니다.").strip()
     
     # 기본 정리
-    ai_response = re.sub(r'\n{3,}', '\n\n', ai_response)
-    ai_response = ai_response.strip()
+    ai_response = EXCESS_NEWLINES.sub('\n\n', ai_response)
     
     # 일반화된 할루시네이션 검증
-    ai_response = detect_general_hallucinations(ai_response)
+    ai_response = detect_general_hallucinations(ai_response, findings)
     
     return ai_response
 
-def detect_general_hallucinations(response: str) -> str:
-    """일반화된 할루시네이션 패턴 감지"""
-    
-    # 일반적인 위험 패턴들
-    dangerous_patterns = [
-#        (r'최근에?\s*(발표|공개|출시|발견)', '최신 정보'),
-#        (r'2025년.*이후', '미래 정보'),
-#        (r'공식.*발표.*했습니다', '공식 발표'),
-#        (r'연구.*결과.*보여줍니다', '연구 결과'),
-#        (r'전문가.*말했습니다', '전문가 인용'),
-#        (r'확실한?\s*정보.*있습니다', '확실성 과장'),
-#        (r'새로운?\s*(기술|제품|서비스)', '신기술 정보')
-    ]
-    
-    found_issues = []
-    for pattern, issue_type in dangerous_patterns:
-        if re.search(pattern, response, re.IGNORECASE):
-            found_issues.append(issue_type)
-    
-    if found_issues:
+def detect_general_hallucinations(response: str, findings: Optional[List[FilterRule]] = None) -> str:
+    """일반화된 할루시네이션 패턴 감지 (규칙은 filter_rules.json, 단일 정규식으로 한 번에 검사)"""
+    if findings is None:
+        findings = response_filter.scan(response)
+    
+    if findings:
+        logger.info(f"⚠️ 필터 규칙 감지: {', '.join(rule.rule_id for rule in findings)}")
         warning = f"⚠️ **정확성 주의**: 이 답변에는 불확실한 정보가 포함될 수 있습니다.\n\n"
         response = warning + response + "\n\n💡 **권장**: 중요한 정보는 공식 소스에서 재확인해주세요."
     
     return response
 
-async def fallback_chat(message: str, conversation_history: List[Dict] = None) -> str:
-    """백업 모델로 안전한 전환"""
-    try:
-        logger.info(f"백업 모델 {FALLBACK_MODEL} 사용")
-        
-        safe_prompt = f"""정확한 정보만 제공하세요. 확실하지 않으면 "잘 모르겠습니다"라고 답변하세요.
+def build_fallback_payload(message: str, stream: bool = False,
+                           num_predict: Optional[int] = None) -> Dict[str, Any]:
+    """백업 모델용 페이로드 (num_predict는 주 요청의 응답 길이 상한, 없으면 OLLAMA_NUM_PREDICT)"""
+    safe_prompt = f"""정확한 정보만 제공하세요. 확실하지 않으면 "잘 모르겠습니다"라고 답변하세요.
 
 질문: {message}
 
 답변:"""
-        
-        payload = {
-            "model": FALLBACK_MODEL,
-            "messages": [{"role": "user", "content": safe_prompt}],
-            "stream": False,
-            "options": {
-                "temperature": 0.05,
-                "num_predict": 2000,
-            }
+    
+    return {
+        "model": FALLBACK_MODEL,
+        "messages": [{"role": "user", "content": safe_prompt}],
+        "stream": stream,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {
+            "temperature": 0.05,
+            "num_predict": num_predict or OLLAMA_NUM_PREDICT,
         }
+    }
+
+async def request_fallback_chat(message: str, timeout: float,
+                                num_predict: Optional[int] = None) -> Dict[str, Any]:
+    """백업 모델 헤지 요청 (백업 모델 스케줄러 슬롯 사용)"""
+    async with gpu_scheduler.slot(FALLBACK_MODEL):
+        return await request_ollama_chat(build_fallback_payload(message, num_predict=num_predict), timeout)
+
+async def stream_fallback_chat(message: str, timeout: float,
+                               num_predict: Optional[int] = None) -> AsyncIterator[str]:
+    """백업 모델 헤지 스트림 (백업 모델 스케줄러 슬롯 사용)"""
+    async with gpu_scheduler.slot(FALLBACK_MODEL):
+        payload = build_fallback_payload(message, stream=True, num_predict=num_predict)
+        async for content in stream_ollama_chat(payload, timeout):
+            yield content
+
+async def fallback_chat(message: str, conversation_history: List[Dict] = None,
+                        timeout: float = FALLBACK_TIMEOUT,
+                        num_predict: Optional[int] = None) -> str:
+    """백업 모델로 안전한 전환 (실패 시 GenerationFailed)"""
+    try:
+        logger.info(f"백업 모델 {FALLBACK_MODEL} 사용")
+        
+        if timeout <= 0:
+            raise asyncio.TimeoutError("요청 시간 예산 소진")
         
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(f"{OLLAMA_BASE_URL}/api/chat", json=payload)
-            if response.status_code == 200:
-                data = response.json()
-                return data.get("message", {}).get("content", "백업 응답 실패").strip()
+        data = await request_ollama_chat(build_fallback_payload(message, num_predict=num_predict),
+                                         min(timeout, FALLBACK_TIMEOUT))
+        return extract_and_validate_response(data, message)
             
     except Exception as e:
         logger.error(f"백업 모델 실패: {str(e)}")
     
-    return "죄송합니다. 현재 AI 서비스에 문제가 있습니다. 잠시 후 다시 시도해주세요."
+    raise GenerationFailed(FALLBACK_FAILED_MESSAGE)
 
 def get_model_status() -> Dict[str, Any]:
     """모델 상태 정보"""
@@ -175,7 +596,12 @@ def get_model_status() -> Dict[str, Any]:
         "fallback_model": FALLBACK_MODEL,
         "anti_hallucination": True,
         "general_safety": True,
-        "fact_check": ENABLE_FACT_CHECK
+        "fact_check": ENABLE_FACT_CHECK,
+        "streaming": ENABLE_STREAMING,
+        "hedging": ENABLE_HEDGING,
+        "request_deadline": REQUEST_DEADLINE,
+        "context_budget": min(CONTEXT_WINDOW, OLLAMA_NUM_CTX) - OLLAMA_NUM_PREDICT,
+        "prompt_layout": PROMPT_LAYOUT
     }
 
 logger.info("🛡️ Gemma3-Tools 4B 일반화된 안전 Chat Handler 로드 완료")
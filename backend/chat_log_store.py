@@ -0,0 +1,368 @@
+# Dec207Hub Backend Chat Log Store
+# 구조화된 채팅 로그 (JSONL 세그먼트) - 크기/시간 기준 회전, 닫힌 세그먼트 gzip 압축, 스트리밍 읽기, 기존 .txt 변환
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import shutil
+import logging
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterator, Iterable, BinaryIO, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 세그먼트 파일명: 날짜.작성자.순번.jsonl[.gz] (작성자 = 프로세스별 ID → 여러 프로세스가 같은 파일에 쓰지 않음)
+SEGMENT_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})\.([A-Za-z0-9_-]+)\.(\d{4})\.jsonl(\.gz)?$")
+TEXT_LOG_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})_(.+)\.txt$")
+TEXT_ENTRY_PATTERN = re.compile(r"^\[(\d{2}:\d{2}:\d{2})\] (사용자|AI|시스템): ?(.*)$")
+TEXT_RESPONSE_TIME_PATTERN = re.compile(r"^    \(응답시간: ([\d.]+)초\)$")
+TEXT_MODEL_PATTERN = re.compile(r"^    \(모델: (.+)\)$")
+
+ROLE_DISPLAY = {"user": "사용자", "assistant": "AI", "system": "시스템"}
+DISPLAY_ROLE = {display: role for role, display in ROLE_DISPLAY.items()}
+
+def make_record(when: datetime, user_ip: str, role: str, content: str,
+                response_time: Optional[float] = None, model: Optional[str] = None) -> Dict[str, Any]:
+    """로그 레코드 1건 (값이 없는 필드는 생략)"""
+    record = {"ts": when.isoformat(timespec="seconds"), "ip": user_ip, "role": role, "content": content}
+    if response_time:
+        record["response_time"] = round(response_time, 3)
+    if model and role == "assistant":
+        record["model"] = model
+    return record
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+def format_text_record(record: Dict[str, Any]) -> str:
+    """기존 사람이 읽는 형식으로 변환 ([HH:MM:SS] 사용자: 내용 + 응답시간/모델)"""
+    role = record.get("role", "system")
+    lines = [f"[{record['ts'][11:19]}] {ROLE_DISPLAY.get(role, '시스템')}: {record.get('content', '')}\n"]
+    if record.get("response_time"):
+        lines.append(f"    (응답시간: {record['response_time']:.2f}초)\n")
+    if record.get("model") and role == "assistant":
+        lines.append(f"    (모델: {record['model']})\n")
+    lines.append("\n")
+    return "".join(lines)
+
+def format_text_header(date_str: str, user_ip: str) -> str:
+    return (f"=== Dec207Hub 채팅 로그 ===\n"
+            f"날짜: {date_str}\n"
+            f"사용자 IP: {user_ip}\n"
+            f"서버: Dec207Hub API v1.0\n"
+            + "=" * 50 + "\n\n")
+
+class ChatLogStore:
+    """JSONL 세그먼트 기록기 (ChatLogger 기록 스레드에서만 사용)
+
+    날짜가 바뀌거나 크기/보존 시간 상한을 넘으면 세그먼트를 닫고 새 순번으로 열며,
+    닫힌 세그먼트는 별도 스레드에서 gzip 압축 (압축 중에도 기록은 계속됨)
+    """
+
+    def __init__(self, log_dir: str, rotate_bytes: int, rotate_seconds: float,
+                 compress: bool, writer_id: Optional[str] = None,
+                 on_close: Optional[Callable[[str], None]] = None):
+        self.log_dir = log_dir
+        self.on_close = on_close  # 세그먼트가 닫힐 때 세그먼트 이름으로 호출 (검색 색인 완료 표시)
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.writer_id = writer_id or f"p{os.getpid()}"
+        self._segment: Optional[BinaryIO] = None
+        self._segment_path: Optional[str] = None
+        self._segment_date: Optional[str] = None
+        self._segment_opened = 0.0
+        self._segment_size = 0
+        self._compressor: Optional[ThreadPoolExecutor] = None
+        self.records = 0
+        self.bytes_written = 0
+        self.rotations = 0
+        self.compressed = 0
+        self.compress_errors = 0
+        self.bytes_saved = 0
+        os.makedirs(self.log_dir, exist_ok=True)
+
+    def write(self, records: Iterable[Dict[str, Any]]) -> List[Tuple[str, int, int, Dict[str, Any]]]:
+        """레코드 기록 (날짜별로 세그먼트 선택, 버퍼링 후 flush 시 디스크 반영)
+
+        기록 위치 (세그먼트 이름, 시작 바이트, 끝 바이트, 레코드) 목록 반환
+        """
+        written = []
+        for record in records:
+            date_str = record["ts"][:10]
+            if self._segment is None or date_str != self._segment_date:
+                self._rotate(date_str)
+            data = encode_record(record)
+            self._segment.write(data)
+            written.append((os.path.basename(self._segment_path), self._segment_size,
+                            self._segment_size + len(data), record))
+            self._segment_size += len(data)
+            self.records += 1
+            self.bytes_written += len(data)
+            if self._segment_size >= self.rotate_bytes:
+                self._rotate(date_str)
+        return written
+
+    def flush(self, fsync: bool = False):
+        """버퍼 flush - 날짜가 지났거나 오래된 세그먼트는 닫고 압축"""
+        if self._segment is None:
+            return
+        if (self._segment_date != datetime.now().strftime("%Y-%m-%d")
+                or time.monotonic() - self._segment_opened >= self.rotate_seconds):
+            self._close_segment()
+            return
+        self._segment.flush()
+        if fsync:
+            os.fsync(self._segment.fileno())
+
+    def close(self):
+        """현재 세그먼트를 닫고 진행 중인 압축이 끝날 때까지 대기"""
+        self._close_segment()
+        if self._compressor is not None:
+            self._compressor.shutdown(wait=True)
+            self._compressor = None
+
+    def compress_stale(self):
+        """지난 날짜의 압축 안 된 세그먼트 압축 (이전 실행/다른 프로세스가 남긴 닫힌 세그먼트)"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        for name in sorted(os.listdir(self.log_dir)):
+            match = SEGMENT_PATTERN.match(name)
+            if match and not match.group(4) and match.group(1) < today:
+                self._submit_compress(os.path.join(self.log_dir, name))
+
+    def _rotate(self, date_str: str):
+        if self._segment is not None:
+            self._close_segment()
+            self.rotations += 1
+        seq = self._next_sequence(date_str)
+        self._segment_path = os.path.join(self.log_dir, f"{date_str}.{self.writer_id}.{seq:04d}.jsonl")
+        self._segment = open(self._segment_path, "ab")
+        self._segment_date = date_str
+        self._segment_opened = time.monotonic()
+        self._segment_size = self._segment.tell()
+
+    def _next_sequence(self, date_str: str) -> int:
+        seqs = [int(m.group(3)) for m in map(SEGMENT_PATTERN.match, os.listdir(self.log_dir))
+                if m and m.group(1) == date_str and m.group(2) == self.writer_id]
+        return max(seqs) + 1 if seqs else 0
+
+    def _close_segment(self):
+        if self._segment is None:
+            return
+        self._segment.close()
+        path, self._segment, self._segment_path = self._segment_path, None, None
+        if os.path.getsize(path) == 0:
+            os.remove(path)
+            return
+        if self.on_close is not None:
+            try:
+                self.on_close(os.path.basename(path))
+            except Exception as e:
+                logger.error(f"❌ 세그먼트 닫힘 처리 실패 ({path}): {e}")
+        self._submit_compress(path)
+
+    def _submit_compress(self, path: str):
+        if not self.compress:
+            return
+        if self._compressor is None:
+            self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-log-compress")
+        self._compressor.submit(self._compress, path)
+
+    def _compress(self, path: str):
+        """세그먼트 gzip 압축 (임시 파일에 쓴 뒤 교체 → 읽는 쪽은 항상 완전한 파일만 봄)"""
+        tmp_path = f"{path}.gz.{os.getpid()}.tmp"
+        try:
+            with open(path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp_path, f"{path}.gz")
+            self.bytes_saved += os.path.getsize(path) - os.path.getsize(f"{path}.gz")
+            os.remove(path)
+            self.compressed += 1
+        except Exception as e:
+            self.compress_errors += 1
+            logger.error(f"❌ 로그 세그먼트 압축 실패 ({path}): {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "segment": os.path.basename(self._segment_path) if self._segment_path else None,
+            "segment_bytes": self._segment_size if self._segment is not None else 0,
+            "records": self.records,
+            "bytes_written": self.bytes_written,
+            "rotations": self.rotations,
+            "compressed": self.compressed,
+            "compress_errors": self.compress_errors,
+            "bytes_saved": self.bytes_saved
+        }
+
+def iter_segments(log_dir: str, start_date: Optional[str] = None,
+                  end_date: Optional[str] = None) -> Iterator[str]:
+    """날짜 범위의 세그먼트 경로 (날짜/작성자/순번 순, 같은 세그먼트가 압축 전후로 둘 다 있으면 압축본)"""
+    if not os.path.isdir(log_dir):
+        return
+    segments = {}
+    for name in os.listdir(log_dir):
+        match = SEGMENT_PATTERN.match(name)
+        if not match:
+            continue
+        date_str = match.group(1)
+        if (start_date and date_str < start_date) or (end_date and date_str > end_date):
+            continue
+        key = match.group(1, 2, 3)
+        if key not in segments or match.group(4):
+            segments[key] = name
+    for key in sorted(segments):
+        yield os.path.join(log_dir, segments[key])
+
+def segment_key(path: str) -> str:
+    """압축 전후 공통 세그먼트 이름 (날짜.작성자.순번.jsonl)"""
+    name = os.path.basename(path)
+    return name[:-3] if name.endswith(".gz") else name
+
+def read_segment_entries(path: str, start_offset: int = 0) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+    """(시작 바이트, 끝 바이트, 레코드) 스트리밍 - start_offset부터 읽음 (바이트 위치는 압축 전 기준)
+
+    아직 줄바꿈까지 쓰이지 않은 마지막 줄은 읽지 않고, 깨진 줄은 건너뜀
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        if start_offset:
+            f.seek(start_offset)
+        offset = start_offset
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            end = offset + len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if record is not None:
+                yield offset, end, record
+            offset = end
+
+def read_segment(path: str) -> Iterator[Dict[str, Any]]:
+    """세그먼트 스트리밍 읽기 (.gz는 읽으면서 압축 해제, 비정상 종료로 잘린 줄은 건너뜀)"""
+    try:
+        for _, _, record in read_segment_entries(path):
+            yield record
+    except FileNotFoundError:
+        # 읽는 사이 압축이 끝나 원본이 지워진 경우
+        if not path.endswith(".gz") and os.path.exists(f"{path}.gz"):
+            yield from read_segment(f"{path}.gz")
+
+def iter_records(log_dir: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                 user_ip: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """기간/IP 조건에 맞는 레코드 스트리밍"""
+    for path in iter_segments(log_dir, start_date, end_date):
+        for record in read_segment(path):
+            if user_ip is None or record.get("ip") == user_ip:
+                yield record
+
+def parse_text_log(path: str) -> Iterator[Dict[str, Any]]:
+    """기존 .txt 로그 파싱 (여러 줄 응답 포함, 헤더의 날짜/IP 사용)"""
+    match = TEXT_LOG_PATTERN.match(os.path.basename(path))
+    date_str = match.group(1) if match else "1970-01-01"
+    user_ip = match.group(2).replace("_", ".") if match else "unknown"
+    entry = None
+
+    def finish(entry):
+        lines = entry["lines"]
+        while lines and not lines[-1].strip():
+            lines.pop()
+        response_time = model = None
+        while lines:
+            time_match = TEXT_RESPONSE_TIME_PATTERN.match(lines[-1])
+            model_match = TEXT_MODEL_PATTERN.match(lines[-1])
+            if time_match:
+                response_time = float(time_match.group(1))
+            elif model_match:
+                model = model_match.group(1)
+            else:
+                break
+            lines.pop()
+        when = datetime.fromisoformat(f"{date_str}T{entry['time']}")
+        return make_record(when, user_ip, entry["role"], "\n".join(lines), response_time, model)
+
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if entry is None and line.startswith("사용자 IP: "):
+                user_ip = line[len("사용자 IP: "):].strip() or user_ip
+                continue
+            entry_match = TEXT_ENTRY_PATTERN.match(line)
+            if entry_match:
+                if entry is not None:
+                    yield finish(entry)
+                entry = {"time": entry_match.group(1), "role": DISPLAY_ROLE[entry_match.group(2)],
+                         "lines": [entry_match.group(3)]}
+            elif entry is not None:
+                entry["lines"].append(line)
+    if entry is not None:
+        yield finish(entry)
+
+def convert_text_logs(src_dir: str, dest_dir: str, delete: bool = False) -> Dict[str, int]:
+    """기존 .txt 로그를 압축 세그먼트로 변환 (파일별 1개 세그먼트, 이미 변환된 파일은 건너뜀)"""
+    os.makedirs(dest_dir, exist_ok=True)
+    stats = {"files": 0, "skipped": 0, "records": 0}
+    for name in sorted(os.listdir(src_dir)):
+        match = TEXT_LOG_PATTERN.match(name)
+        if not match:
+            continue
+        src_path = os.path.join(src_dir, name)
+        writer_id = "txt-" + re.sub(r"[^A-Za-z0-9_-]", "_", match.group(2))
+        dest_path = os.path.join(dest_dir, f"{match.group(1)}.{writer_id}.0000.jsonl.gz")
+        if os.path.exists(dest_path):
+            stats["skipped"] += 1
+            continue
+        tmp_path = f"{dest_path}.tmp"
+        with gzip.open(tmp_path, "wb") as dst:
+            for record in parse_text_log(src_path):
+                dst.write(encode_record(record))
+                stats["records"] += 1
+        os.replace(tmp_path, dest_path)
+        stats["files"] += 1
+        if delete:
+            os.remove(src_path)
+    return stats
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """명령줄 도구 - 기존 로그 변환(convert) / 레코드 출력(cat)"""
+    with contextlib.redirect_stdout(sys.stderr):  # 설정 로드 메시지가 출력 레코드에 섞이지 않게
+        from config import CHAT_LOG_DIR, CHAT_LOG_SEGMENT_DIR
+
+    parser = argparse.ArgumentParser(description="Dec207Hub 채팅 로그 도구")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="기존 .txt 로그를 JSONL 세그먼트로 변환")
+    convert.add_argument("--src", default=CHAT_LOG_DIR)
+    convert.add_argument("--dest", default=CHAT_LOG_SEGMENT_DIR)
+    convert.add_argument("--delete", action="store_true", help="변환 후 원본 .txt 삭제")
+    cat = sub.add_parser("cat", help="레코드 출력 (압축 세그먼트도 바로 읽음)")
+    cat.add_argument("--dir", default=CHAT_LOG_SEGMENT_DIR)
+    cat.add_argument("--from", dest="start_date")
+    cat.add_argument("--to", dest="end_date")
+    cat.add_argument("--ip")
+    cat.add_argument("--text", action="store_true", help="기존 사람이 읽는 형식으로 출력")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        stats = convert_text_logs(args.src, args.dest, delete=args.delete)
+        print(f"✅ 변환 완료: {stats['files']}개 파일, {stats['records']}건 (이미 변환됨 {stats['skipped']}개)")
+        return 0
+
+    for record in iter_records(args.dir, args.start_date, args.end_date, args.ip):
+        if args.text:
+            sys.stdout.write(format_text_record(record))
+        else:
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
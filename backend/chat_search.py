@@ -0,0 +1,333 @@
+# Dec207Hub Backend Chat Search
+# 채팅 로그 전문 검색 (SQLite FTS5) - 기록 스레드가 쓰는 즉시 색인, 지난 세그먼트는 이어서 색인
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+from config import ENABLE_CHAT_SEARCH, CHAT_SEARCH_DB_PATH, CHAT_SEARCH_BACKFILL_BATCH, CHAT_LOG_SEGMENT_DIR
+from chat_log_store import iter_segments, read_segment_entries, segment_key
+
+logger = logging.getLogger(__name__)
+
+QUERY_TERM_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+SEARCH_ROLES = ("user", "assistant", "system")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    ts TEXT NOT NULL,
+    ip TEXT NOT NULL,
+    role TEXT NOT NULL,
+    model TEXT,
+    response_time REAL,
+    content TEXT NOT NULL,
+    UNIQUE (segment, offset)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (ts);
+CREATE INDEX IF NOT EXISTS idx_messages_ip_ts ON messages (ip, ts);
+CREATE INDEX IF NOT EXISTS idx_messages_model_ts ON messages (model, ts);
+CREATE TABLE IF NOT EXISTS segments (
+    name TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL DEFAULT 0,
+    complete INTEGER NOT NULL DEFAULT 0
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_words USING fts5(
+    content, content='messages', content_rowid='id', tokenize='unicode61', prefix='1 2'
+);
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    INSERT INTO messages_words (rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+class SearchQueryError(ValueError):
+    """잘못된 검색 조건"""
+
+class ChatSearchIndex:
+    """채팅 로그 FTS5 색인
+
+    메시지는 (세그먼트, 바이트 위치)로 식별 → 실시간 색인과 세그먼트 재색인이 겹쳐도 중복 없음.
+    세그먼트별 색인 위치를 저장해서 재시작 후에는 새로 쓰인 부분만 읽고, 닫힌 세그먼트는 다시 읽지 않음.
+    3자 이상 검색어는 trigram 색인으로 부분 문자열 검색, 더 짧은 검색어는 단어 색인에서 접두어 검색
+    (한국어 조사가 뒤에 붙으므로 "오류"로 "오류가", "오류를"도 찾음)
+    """
+
+    def __init__(self, path: str, backfill_batch: int):
+        self.path = path
+        self.backfill_batch = backfill_batch
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._write_conn = self._connect()
+        self._read_conn = self._connect()
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._backfill_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        with self._write_lock:
+            self._write_conn.executescript(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+                "content, content='messages', content_rowid='id', tokenize='trigram');"
+                + SCHEMA
+            )
+            self._write_conn.commit()
+        self.indexed = 0
+        self.backfilled = 0
+        self.index_errors = 0
+        self.queries = 0
+        self.last_query_ms: Optional[float] = None
+        self.backfill_running = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")    # 색인 중에도 검색 가능
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def add(self, entries: Iterable[Tuple[str, int, int, Dict[str, Any]]]) -> int:
+        """(세그먼트 이름, 시작 바이트, 끝 바이트, 레코드) 색인 - 새로 추가된 건수 반환"""
+        rows = []
+        progress: Dict[str, int] = {}
+        for segment, offset, end, record in entries:
+            rows.append((segment, offset, record.get("ts", ""), record.get("ip", "unknown"),
+                         record.get("role", "system"), record.get("model"),
+                         record.get("response_time"), record.get("content", "")))
+            progress[segment] = max(progress.get(segment, 0), end)
+        if not rows:
+            return 0
+        with self._write_lock:
+            added = self._write_conn.executemany(
+                "INSERT OR IGNORE INTO messages "
+                "(segment, offset, ts, ip, role, model, response_time, content) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            ).rowcount
+            self._write_conn.executemany(
+                "INSERT INTO segments (name, offset) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET offset = MAX(offset, excluded.offset)",
+                list(progress.items())
+            )
+            self._write_conn.commit()
+        self.indexed += added
+        return added
+
+    def mark_complete(self, segment: str):
+        """닫힌 세그먼트 표시 (이후 재색인 대상에서 제외)"""
+        with self._write_lock:
+            self._write_conn.execute(
+                "INSERT INTO segments (name, complete) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET complete = 1", (segment,)
+            )
+            self._write_conn.commit()
+
+    def backfill(self, segment_dir: str) -> int:
+        """색인되지 않은 세그먼트 부분 색인 (저장된 위치부터 이어서 읽음)"""
+        with self._read_lock:
+            state = {name: (offset, complete) for name, offset, complete in
+                     self._read_conn.execute("SELECT name, offset, complete FROM segments")}
+        total = 0
+        for path in iter_segments(segment_dir):
+            if self._stop.is_set():
+                break
+            name = segment_key(path)
+            offset, complete = state.get(name, (0, 0))
+            if complete:
+                continue
+            if not path.endswith(".gz") and os.path.getsize(path) <= offset:
+                continue
+            batch = []
+            try:
+                for entry in read_segment_entries(path, offset):
+                    batch.append((name,) + entry)
+                    if len(batch) >= self.backfill_batch:
+                        total += self.add(batch)
+                        batch = []
+                        if self._stop.is_set():
+                            break
+                total += self.add(batch)
+            except FileNotFoundError:
+                continue  # 읽는 사이 압축되어 이름이 바뀜 → 다음 실행 때 .gz로 이어서 색인
+            if path.endswith(".gz") and not self._stop.is_set():
+                self.mark_complete(name)
+        self.backfilled += total
+        return total
+
+    def start_backfill(self, segment_dir: str):
+        """별도 스레드에서 재색인 (기록 스레드와 검색을 막지 않음)"""
+        if self._backfill_thread is not None and self._backfill_thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            self.backfill_running = True
+            started = time.monotonic()
+            try:
+                count = self.backfill(segment_dir)
+                if count:
+                    logger.info(f"🔎 채팅 로그 색인 보충: {count}건 ({time.monotonic() - started:.1f}초)")
+            except Exception as e:
+                self.index_errors += 1
+                logger.error(f"❌ 채팅 로그 재색인 실패: {e}")
+            finally:
+                self.backfill_running = False
+
+        self._backfill_thread = threading.Thread(target=run, name="chat-search-backfill", daemon=True)
+        self._backfill_thread.start()
+
+    def stop_backfill(self):
+        self._stop.set()
+        if self._backfill_thread is not None:
+            self._backfill_thread.join()
+            self._backfill_thread = None
+
+    def search(self, query: Optional[str] = None, ip: Optional[str] = None,
+               start: Optional[str] = None, end: Optional[str] = None,
+               model: Optional[str] = None, role: Optional[str] = None,
+               min_response_time: Optional[float] = None, max_response_time: Optional[float] = None,
+               limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """조건 검색 (최신순) - {"total", "results"} 반환
+
+        query: 공백으로 구분한 검색어 AND ("..."로 묶으면 구문), start/end: 날짜 또는 ISO 시각 (end 날짜는 그날 포함)
+        """
+        if role is not None and role not in SEARCH_ROLES:
+            raise SearchQueryError(f"role은 {', '.join(SEARCH_ROLES)} 중 하나여야 합니다")
+
+        started = time.perf_counter()
+        where: List[str] = []
+        params: List[Any] = []
+        trigram_terms, word_terms = [], []
+        for phrase, word in QUERY_TERM_PATTERN.findall(query or ""):
+            term = (phrase or word).strip().replace('"', '""')
+            if len(term) >= 3:
+                trigram_terms.append(f'"{term}"')
+            elif term:
+                word_terms.append(f'"{term}"*')
+        # FTS 결과를 먼저 구해 두고 필터 적용 (조인으로 쓰면 다른 색인을 탈 때 행마다 MATCH를 다시 실행)
+        if trigram_terms:
+            where.append("m.id IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)")
+            params.append(" AND ".join(trigram_terms))
+        if word_terms:
+            where.append("m.id IN (SELECT rowid FROM messages_words WHERE messages_words MATCH ?)")
+            params.append(" AND ".join(word_terms))
+        for column, value in (("m.ip", ip), ("m.model", model), ("m.role", role)):
+            if value:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if start:
+            where.append("m.ts >= ?")
+            params.append(start)
+        if end:
+            where.append("m.ts <= ?")
+            params.append(f"{end}T99" if len(end) == 10 else end)
+        if min_response_time is not None:
+            where.append("m.response_time >= ?")
+            params.append(min_response_time)
+        if max_response_time is not None:
+            where.append("m.response_time <= ?")
+            params.append(max_response_time)
+
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        with self._read_lock:
+            total = self._read_conn.execute(f"SELECT COUNT(*) FROM messages m{clause}", params).fetchone()[0]
+            # 페이지의 ID만 정렬해서 고른 뒤 본문/발췌는 그 행들만 조회
+            ids = [row[0] for row in self._read_conn.execute(
+                f"SELECT m.id FROM messages m{clause} ORDER BY m.ts DESC, m.id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            )]
+            placeholders = ",".join("?" * len(ids))
+            rows = {row[0]: row for row in self._read_conn.execute(
+                "SELECT id, ts, ip, role, model, response_time, content FROM messages "
+                f"WHERE id IN ({placeholders})", ids
+            )} if ids else {}
+            snippets = {}
+            if ids and (trigram_terms or word_terms):
+                table, terms = ("messages_fts", trigram_terms) if trigram_terms else ("messages_words", word_terms)
+                snippets = dict(self._read_conn.execute(
+                    f"SELECT rowid, snippet({table}, 0, '[', ']', '…', 24) FROM {table} "
+                    f"WHERE {table} MATCH ? AND rowid IN ({placeholders})",
+                    [" AND ".join(terms)] + ids
+                ))
+
+        self.queries += 1
+        self.last_query_ms = round((time.perf_counter() - started) * 1000, 2)
+        return {
+            "total": total,
+            "took_ms": self.last_query_ms,
+            "results": [
+                {"id": row[0], "ts": row[1], "ip": row[2], "role": row[3], "model": row[4],
+                 "response_time": row[5], "content": row[6], "snippet": snippets.get(row[0])}
+                for row in (rows[i] for i in ids)
+            ]
+        }
+
+    def close(self):
+        self.stop_backfill()
+        with self._write_lock, self._read_lock:
+            self._write_conn.close()
+            self._read_conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "indexed": self.indexed,
+            "backfilled": self.backfilled,
+            "backfill_running": self.backfill_running,
+            "index_errors": self.index_errors,
+            "queries": self.queries,
+            "last_query_ms": self.last_query_ms
+        }
+
+def create_search_index() -> Optional[ChatSearchIndex]:
+    """설정에 따라 색인 생성 (SQLite에 FTS5/trigram이 없으면 검색 비활성화)"""
+    if not ENABLE_CHAT_SEARCH:
+        return None
+    try:
+        return ChatSearchIndex(CHAT_SEARCH_DB_PATH, CHAT_SEARCH_BACKFILL_BATCH)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"⚠️ 채팅 로그 검색 비활성화 - SQLite FTS5(trigram) 사용 불가: {e}")
+        return None
+
+# 전역 채팅 로그 검색 색인 인스턴스 (사용할 수 없으면 None)
+chat_search_index = create_search_index()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """명령줄 도구 - 세그먼트 색인(index) / 검색(search)"""
+    parser = argparse.ArgumentParser(description="Dec207Hub 채팅 로그 검색")
+    sub = parser.add_subparsers(dest="command", required=True)
+    index = sub.add_parser("index", help="색인되지 않은 세그먼트 색인")
+    index.add_argument("--dir", default=CHAT_LOG_SEGMENT_DIR)
+    search = sub.add_parser("search", help="검색 (최신순)")
+    search.add_argument("query", nargs="?")
+    search.add_argument("--ip")
+    search.add_argument("--from", dest="start")
+    search.add_argument("--to", dest="end")
+    search.add_argument("--model")
+    search.add_argument("--role", choices=SEARCH_ROLES)
+    search.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if chat_search_index is None:
+        print("❌ 채팅 로그 검색을 사용할 수 없습니다", file=sys.stderr)
+        return 1
+    if args.command == "index":
+        started = time.monotonic()
+        count = chat_search_index.backfill(args.dir)
+        print(f"✅ 색인 완료: {count}건 ({time.monotonic() - started:.1f}초)")
+        return 0
+
+    result = chat_search_index.search(args.query, ip=args.ip, start=args.start, end=args.end,
+                                      model=args.model, role=args.role, limit=args.limit)
+    print(f"🔎 {result['total']}건 ({result['took_ms']}ms)")
+    for item in result["results"]:
+        text = (item["snippet"] or item["content"]).replace("\n", " ")
+        print(f"[{item['ts']}] {item['ip']} {item['role']}: {text[:200]}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# Dec207Hub Backend Circuit Breaker
+# Ollama 엔드포인트/모델별 서킷 브레이커 (closed / open / half-open) 및 공유 헬스 상태
+
+import time
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+from config import (
+    OLLAMA_BASE_URL, CIRCUIT_WINDOW_SECONDS, CIRCUIT_MIN_REQUESTS, CIRCUIT_ERROR_RATE,
+    CIRCUIT_SLOW_CALL_SECONDS, CIRCUIT_SLOW_CALL_RATE, CIRCUIT_OPEN_SECONDS,
+    CIRCUIT_HALF_OPEN_MAX_CALLS, HEALTH_CHECK_TIMEOUT, HEALTH_PROBE_CACHE_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """서킷이 열려 있어 요청을 즉시 거절"""
+
+class CircuitBreaker:
+    """오류율/지연 기반 서킷 브레이커"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = STATE_CLOSED
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self._outcomes: deque = deque()  # (시각, 성공 여부, 느린 호출 여부)
+        self.rejected = 0
+        self.trips = 0
+        self.last_error: Optional[str] = None
+
+    def _prune(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - CIRCUIT_WINDOW_SECONDS:
+            self._outcomes.popleft()
+
+    def current_state(self) -> str:
+        """open 상태에서 대기 시간이 지나면 half-open으로 전환"""
+        if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= CIRCUIT_OPEN_SECONDS:
+            self.state = STATE_HALF_OPEN
+            self.half_open_calls = 0
+            logger.info(f"🟡 서킷 half-open: {self.name}")
+        return self.state
+
+    def allow_request(self) -> bool:
+        """요청 허용 여부 (half-open에서는 제한된 수의 시험 요청만 허용)"""
+        state = self.current_state()
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_HALF_OPEN and self.half_open_calls < CIRCUIT_HALF_OPEN_MAX_CALLS:
+            self.half_open_calls += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record_cancelled(self, latency: float):
+        """결과 없이 취소된 요청 - half-open 시험 슬롯 반환, 이미 느렸다면 느린 호출로 기록"""
+        if self.state == STATE_HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+        elif self.state == STATE_CLOSED and latency >= CIRCUIT_SLOW_CALL_SECONDS:
+            now = time.monotonic()
+            self._outcomes.append((now, True, True))
+            self._evaluate(now)
+
+    def record_success(self, latency: float):
+        now = time.monotonic()
+        if self.state == STATE_HALF_OPEN:
+            logger.info(f"🟢 서킷 closed (복구): {self.name}")
+            self.state = STATE_CLOSED
+            self._outcomes.clear()
+        self._outcomes.append((now, True, latency >= CIRCUIT_SLOW_CALL_SECONDS))
+        self._evaluate(now)
+
+    def record_failure(self, error: str):
+        now = time.monotonic()
+        self.last_error = error
+        if self.state == STATE_HALF_OPEN:
+            self._trip(now)
+            return
+        self._outcomes.append((now, False, False))
+        self._evaluate(now)
+
+    def _evaluate(self, now: float):
+        self._prune(now)
+        total = len(self._outcomes)
+        if self.state != STATE_CLOSED or total < CIRCUIT_MIN_REQUESTS:
+            return
+        failures = sum(1 for _, ok, _ in self._outcomes if not ok)
+        slow = sum(1 for _, _, is_slow in self._outcomes if is_slow)
+        if failures / total >= CIRCUIT_ERROR_RATE or slow / total >= CIRCUIT_SLOW_CALL_RATE:
+            self._trip(now)
+
+    def _trip(self, now: float):
+        self.state = STATE_OPEN
+        self.opened_at = now
+        self.half_open_calls = 0
+        self.trips += 1
+        self._outcomes.clear()
+        logger.warning(f"🔴 서킷 open: {self.name} ({CIRCUIT_OPEN_SECONDS}초간 즉시 거절)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._prune(now)
+        total = len(self._outcomes)
+        failures = sum(1 for _, ok, _ in self._outcomes if not ok)
+        return {
+            "state": self.current_state(),
+            "window_requests": total,
+            "error_rate": round(failures / total, 3) if total else 0.0,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "last_error": self.last_error
+        }
+
+class CircuitBreakerRegistry:
+    """(엔드포인트, 모델)별 서킷 브레이커 레지스트리"""
+
+    def __init__(self):
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+    def get(self, model: str, endpoint: str = OLLAMA_BASE_URL) -> CircuitBreaker:
+        key = (endpoint, model)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(f"{endpoint}#{model}")
+            self._breakers[key] = breaker
+        return breaker
+
+    def is_open(self, model: str, endpoint: str = OLLAMA_BASE_URL) -> bool:
+        """요청을 소모하지 않고 열림 여부만 확인"""
+        breaker = self._breakers.get((endpoint, model))
+        return breaker is not None and breaker.current_state() == STATE_OPEN
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {breaker.name: breaker.get_stats() for breaker in self._breakers.values()}
+
+class HealthMonitor:
+    """Ollama 헬스 프로브 결과 캐시 (매 /health 호출마다 실시간 프로브하지 않음)"""
+
+    def __init__(self):
+        self._status: Dict[str, Tuple[float, str]] = {}
+
+    async def ollama_status(self, client, endpoint: str = OLLAMA_BASE_URL) -> str:
+        cached = self._status.get(endpoint)
+        if cached and time.monotonic() - cached[0] < HEALTH_PROBE_CACHE_SECONDS:
+            return cached[1]
+        try:
+            response = await client.get("/api/tags", timeout=HEALTH_CHECK_TIMEOUT)
+            status = "connected" if response.status_code == 200 else "disconnected"
+        except Exception as e:
+            status = f"error: {str(e)}"
+        self.record(endpoint, status)
+        return status
+
+    def record(self, endpoint: str, status: str):
+        self._status[endpoint] = (time.monotonic(), status)
+
+# 전역 서킷 브레이커 / 헬스 모니터 인스턴스
+circuit_breakers = CircuitBreakerRegistry()
+health_monitor = HealthMonitor()
@@ -5,6 +5,7 @@ import os
 
 # ===== Ollama 설정 =====
 OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_ENDPOINTS = [OLLAMA_BASE_URL]             # Ollama 노드 목록 (GPU 서버 추가 시 URL 추가)
 DEFAULT_MODEL = "orieg/gemma3-tools:4b-it-qat"   # 메인 모델 - 툴 기능 지원
 FALLBACK_MODEL = "gemma3:4b"                     # 보조 모델 - 기본 응답용
 
@@ -33,21 +34,144 @@ MAX_CONVERSATION_HISTORY = 8    # 4B 모델에 적합한 크기
 MAX_CONTEXT_MESSAGES = 4        # 컨텍스트 메시지 적정 수준
 MAX_MESSAGE_LENGTH = 500        # 메시지 길이 적당히
 CONTEXT_WINDOW = 8192           # 4B 모델 컨텍스트
+OLLAMA_NUM_CTX = 4096           # 요청별 num_ctx (CONTEXT_WINDOW 이하)
+OLLAMA_NUM_PREDICT = 2000       # 생성 예약 토큰 (컨텍스트 예산에서 제외)
+CONTEXT_TOKEN_CACHE_SIZE = 4096 # 메시지별 토큰 추정치 캐시 크기
+CONTEXT_DROP_BLOCK = 4          # 오래된 히스토리는 이 개수 단위로 제외 (매 턴 prefix가 바뀌지 않도록)
+PROMPT_LAYOUT = "chat"          # "chat": system + 역할별 메시지 (KV 캐시 prefix 재사용), "legacy": 단일 user 메시지
+OLLAMA_KEEP_ALIVE = "30m"       # 요청 후 모델/KV 캐시 유지 시간
+
+# ===== 서버 측 대화 세션 =====
+SESSION_MAX_MESSAGES = 20       # 세션별 히스토리 링 버퍼 크기
+SESSION_MAX_BYTES = 256 * 1024  # 세션별 메모리 상한 (초과 시 오래된 메시지 제거)
+SESSION_IDLE_TIMEOUT = 1800.0   # 유휴 세션 만료 시간 (초)
+SESSION_MAX_SESSIONS = 1000     # 전체 세션 수 상한
+SESSION_SWEEP_INTERVAL = 60.0   # 만료 세션 정리 주기 (초)
+
+# ===== 대화 누적 요약 (GPU 유휴 시 백그라운드) =====
+ENABLE_SUMMARIZATION = True
+SUMMARY_MODEL = FALLBACK_MODEL  # 요약용 저비용 모델
+SUMMARY_KEEP_RECENT = 4         # 요약하지 않고 원문으로 유지할 최근 메시지 수
+SUMMARY_MIN_NEW_MESSAGES = 4    # 요약 대상이 이만큼 쌓이면 요약 (KEEP_RECENT + 이 값 < SESSION_MAX_MESSAGES,
+                                # MAX_CONVERSATION_HISTORY 이하면 요약 갱신 전까지 히스토리 앞부분이 고정됨)
+SUMMARY_MAX_TOKENS = 300        # 요약 길이 상한 (프롬프트 토큰을 일정하게 유지)
+SUMMARY_TIMEOUT = 60.0
+SUMMARY_IDLE_POLL = 1.0         # GPU 사용 중일 때 재확인 주기 (초)
 
 # ===== 로그 설정 =====
 LOG_LEVEL = "INFO"
+SERVER_LOG_FILE = "logs/backend.log"    # 백엔드 자체 로그 파일 (MCP get_service_logs에서 조회, 비우면 콘솔만)
+SERVER_LOG_MAX_BYTES = 50 * 1024 * 1024
+SERVER_LOG_BACKUPS = 5
 CHAT_LOG_DIR = "chat_logs"
+CHAT_LOG_QUEUE_MAX = 10000      # 기록 대기열 상한 (초과 시 버리고 dropped 집계)
+CHAT_LOG_BATCH_SIZE = 256       # 기록 스레드가 한 번에 꺼내 쓰는 최대 건수
+CHAT_LOG_FLUSH_INTERVAL = 1.0   # 버퍼 flush 주기 (초)
+CHAT_LOG_FSYNC = False          # flush 때 fsync까지 수행 (전원 장애 대비, 디스크 부하 증가)
+CHAT_LOG_MAX_OPEN_FILES = 64    # 열어 둘 (날짜, IP)별 로그 파일 수 (LRU)
+CHAT_LOG_FORMAT = "jsonl"       # jsonl(구조화 세그먼트) | text(기존 IP별 일자 .txt) | both
+CHAT_LOG_SEGMENT_DIR = "chat_logs/segments"  # JSONL 세그먼트 위치
+CHAT_LOG_ROTATE_BYTES = 64 * 1024 * 1024     # 세그먼트 크기 상한 (넘으면 새 세그먼트)
+CHAT_LOG_ROTATE_SECONDS = 86400.0            # 세그먼트 보존 시간 상한 (날짜가 바뀌어도 회전)
+CHAT_LOG_COMPRESS = True        # 닫힌 세그먼트 gzip 압축 (백그라운드)
+
+# ===== 채팅 로그 검색 (SQLite FTS5) =====
+ENABLE_CHAT_SEARCH = True       # JSONL 세그먼트 기록 시 실시간 색인 (CHAT_LOG_FORMAT이 jsonl/both일 때)
+CHAT_SEARCH_DB_PATH = "cache/chat_search.sqlite3"
+CHAT_SEARCH_BACKFILL_BATCH = 1000   # 재색인 시 트랜잭션당 레코드 수
+CHAT_SEARCH_PAGE_SIZE = 50          # 검색 API 기본 페이지 크기
+CHAT_SEARCH_MAX_PAGE_SIZE = 500
+
+# ===== 관리자 API =====
+ADMIN_TOKEN = os.environ.get("DEC207HUB_ADMIN_TOKEN", "")  # X-Admin-Token 헤더 값 (비어 있으면 로컬 접속만 허용)
 
 # ===== 네트워크 설정 (고속화) =====
 WEBSOCKET_TIMEOUT = 25.0    # 단축
 HTTP_TIMEOUT = 25.0         # 단축
 
+# ===== Ollama 커넥션 풀 =====
+OLLAMA_MAX_CONNECTIONS = 20     # 동시 연결 상한
+OLLAMA_MAX_KEEPALIVE = 10       # 유지할 keep-alive 연결 수
+OLLAMA_KEEPALIVE_EXPIRY = 30.0  # 유휴 연결 유지 시간 (초)
+OLLAMA_CONNECT_TIMEOUT = 5.0    # 연결 수립 시간 제한
+HEALTH_CHECK_TIMEOUT = 5.0      # /health 프로브 시간 제한
+MODELS_LIST_TIMEOUT = 10.0      # /models 조회 시간 제한
+FALLBACK_TIMEOUT = 15.0         # 백업 모델 응답 시간 제한
+
+# ===== Ollama 노드 풀 =====
+POOL_HEALTH_INTERVAL = 10.0     # 노드 헬스체크 주기 (초)
+POOL_EJECT_FAILURES = 3         # 연속 연결 실패 시 노드 제외
+POOL_EJECT_SECONDS = 30.0       # 제외 후 최소 대기 시간 (이후 헬스체크 통과 시 복귀)
+POOL_AFFINITY_WEIGHT = 2.0      # 모델 미상주 노드 패널티 (진행 중 요청 수 단위)
+
+# ===== 모델 상주 관리 (웜업 / keep_alive 갱신) =====
+ENABLE_MODEL_RESIDENCY = True
+RESIDENCY_MODELS = [DEFAULT_MODEL, FALLBACK_MODEL]  # 우선순위 순 (예산 부족 시 뒤쪽부터 제외)
+GPU_VRAM_TOTAL_GB = float(os.environ.get("DEC207HUB_GPU_VRAM_GB", "8.0"))  # 노드 GPU 실제 VRAM (RTX 3070 = 8GB)
+RESIDENCY_VRAM_RESERVE_GB = 1.0     # 상주 모델 외에 남겨 둘 VRAM (디스플레이/CUDA 컨텍스트)
+RESIDENCY_VRAM_BUDGET_GB = GPU_VRAM_TOTAL_GB - RESIDENCY_VRAM_RESERVE_GB  # 노드당 상주 모델 예산
+RESIDENCY_CONTEXT_OVERHEAD_GB = 0.6 # /api/tags 파일 크기로 추정할 때 더하는 KV 캐시/그래프 메모리 (num_ctx 4096 기준)
+RESIDENCY_REFRESH_INTERVAL = 300.0  # keep_alive 갱신 / 상주 상태 조회 주기 (초, OLLAMA_KEEP_ALIVE보다 짧게)
+RESIDENCY_LOAD_TIMEOUT = 120.0      # 콜드 로드 시간 제한
+
 # ===== 성능 최적화 (고속 응답) =====
 BATCH_SIZE = 1              
 CACHE_SIZE_MB = 256         # 4B 모델용 캐시
 ENABLE_MODEL_CACHE = True   
+CACHE_TTL_SECONDS = 3600    # 응답 캐시 유효 시간
+ENABLE_DISK_CACHE = False   # 재시작 후에도 유지되는 디스크 캐시 계층
+CACHE_DISK_PATH = "cache/response_cache.sqlite3"
+
+# ===== 의미 유사 캐시 (임베딩 기반) =====
+ENABLE_SEMANTIC_CACHE = False      # 단독 질문마다 임베딩 호출이 추가되므로 기본 비활성화
+SEMANTIC_CACHE_EMBED_MODEL = "nomic-embed-text"  # Ollama 임베딩 모델
+SEMANTIC_CACHE_THRESHOLD = 0.96     # 코사인 유사도 임계값 (숫자/이름만 다른 질문 오적중 방지를 위해 높게)
+SEMANTIC_CACHE_MAX_ENTRIES = 100000 # 모델별 최대 항목 수
+SEMANTIC_CACHE_TTL_SECONDS = 3600
+SEMANTIC_CACHE_QUANTIZE = True      # int8 양자화로 메모리 1/4
+SEMANTIC_CACHE_EMBED_TIMEOUT = 1.0  # 임베딩이 늦으면 캐시 없이 바로 생성
 FAST_RESPONSE_MODE = True   # 고속 응답 모드
 
+# ===== GPU 스케줄러 (동시 생성 제한 / 공정 큐잉) =====
+SCHEDULER_MODEL_CONCURRENCY = {     # 모델별 동시 생성 수 (8GB VRAM 기준)
+    DEFAULT_MODEL: 1,
+    FALLBACK_MODEL: 1,
+}
+SCHEDULER_DEFAULT_CONCURRENCY = 1
+SCHEDULER_MAX_QUEUE = 32            # 전체 대기열 상한 (초과 시 즉시 거절)
+SCHEDULER_MAX_BATCH_QUEUE = 8       # 배치 레인 대기열 상한 (나머지는 대화형 요청 몫)
+SCHEDULER_CLIENT_WEIGHTS = {}       # IP별 가중치 (기본 1.0)
+SCHEDULER_INITIAL_SERVICE_TIME = 5.0  # 예상 대기 시간 계산용 초기 처리 시간 (초)
+
+# ===== 멱등성 키 (재시도 시 중복 생성 방지, REST/WebSocket 공용) =====
+IDEMPOTENCY_TTL_SECONDS = 600.0     # 완료된 결과 보관 시간 (초)
+IDEMPOTENCY_MAX_ENTRIES = 10000     # 최대 보관 키 수 (초과 시 오래된 키부터 제거)
+IDEMPOTENCY_DETACH_GRACE_SECONDS = 60.0  # 연결이 끊겨도 재연결을 기다리며 생성을 이어가는 시간 (초)
+
+# ===== 모델 라우터 (복잡도 / 부하 기반 모델 선택) =====
+ENABLE_MODEL_ROUTER = True
+ROUTER_SIMPLE_MAX_TOKENS = 16       # 이 토큰 수 이하의 짧은 질문은 보조 모델로
+ROUTER_SIMPLE_MAX_HISTORY = 2       # 단순 질문으로 볼 최대 히스토리 메시지 수
+ROUTER_TOOL_KEYWORDS = [            # 툴 호출이 필요해 보이는 질문 (항상 메인 모델)
+    "검색", "찾아", "최신", "오늘", "날씨", "뉴스", "계산", "환율", "주가", "시간", "날짜",
+    "파일", "코드", "실행", "search", "weather", "news", "calculate", "price", "today", "latest",
+]
+ROUTER_DEGRADE_QUEUE_DEPTH = 4      # 메인 모델 대기열이 이 이상이면 부하 모드
+ROUTER_DEGRADE_WAIT_SECONDS = 10.0  # 메인 모델 예상 대기 시간이 이 이상이면 부하 모드
+ROUTER_RECOVER_QUEUE_DEPTH = 1      # 대기열/예상 대기가 이 이하로 내려가면 정상 복귀
+ROUTER_RECOVER_WAIT_SECONDS = 3.0
+ROUTER_MIN_DEGRADED_SECONDS = 15.0  # 부하 모드 최소 유지 시간 (모드 전환 반복 방지)
+ROUTER_DEGRADED_NUM_PREDICT = 512   # 부하 모드 응답 길이 상한
+
+# ===== 배치 채팅 (/chat/batch) =====
+BATCH_DEFAULT_CONCURRENCY = 2       # 배치당 동시 실행 수
+BATCH_MAX_CONCURRENCY = 4           # 요청으로 지정 가능한 최대 동시 실행 수
+BATCH_MAX_ITEMS = 10000             # 배치당 최대 항목 수
+BATCH_STORE_MAX_BATCHES = 20        # 재개용으로 결과를 보관할 배치 수
+BATCH_RESULT_TTL = 86400.0          # 재개용 결과 보관 시간 (초)
+BATCH_QUEUE_RETRY_DELAY = 1.0       # 스케줄러 대기열 가득 참 시 재시도 간격 (초)
+BATCH_QUEUE_MAX_RETRIES = 60
+
 # ===== ABAP 특화 설정 =====
 ABAP_SYNTAX_CHECK = True    
 ABAP_BEST_PRACTICES = True  
@@ -57,12 +181,34 @@ SAP_VERSION_SUPPORT = ["ECC", "S4HANA", "BTP"]
 ENABLE_FACT_CHECK = True    
 UNCERTAINTY_THRESHOLD = 0.5 # 4B 모델용 임계값
 SAFETY_MODE = "balanced"    # 속도와 안전성 균형
+FILTER_RULES_PATH = "filter_rules.json"  # 응답 필터 규칙 파일 (backend 기준 상대 경로, 수정 시 자동 반영)
+FILTER_RELOAD_CHECK_INTERVAL = 2.0       # 규칙 파일 변경 확인 주기 (초)
 
 # ===== 응답 속도 최적화 =====
-ENABLE_STREAMING = False    # 스트리밍 비활성화로 안정성 확보
+ENABLE_STREAMING = True     # 토큰 스트리밍 (WebSocket chat_response_delta 전송)
+WS_PIPELINE_MAX_PENDING = 4 # WebSocket 연결별 미처리 요청 상한 (진행 중 포함, 초과 시 queue_full 오류)
 PARALLEL_PROCESSING = True  # 병렬 처리 활성화
 RESPONSE_TIMEOUT = 20.0     # 응답 시간 제한
 
+# ===== 서킷 브레이커 (Ollama 장애 시 즉시 실패) =====
+CIRCUIT_WINDOW_SECONDS = 60.0   # 오류율 계산 구간
+CIRCUIT_MIN_REQUESTS = 5        # 판단에 필요한 최소 요청 수
+CIRCUIT_ERROR_RATE = 0.5        # 이 오류율 이상이면 open
+CIRCUIT_SLOW_CALL_SECONDS = 15.0  # 느린 호출 기준 (스트리밍은 첫 토큰)
+CIRCUIT_SLOW_CALL_RATE = 0.8    # 느린 호출 비율이 이 이상이면 open
+CIRCUIT_OPEN_SECONDS = 15.0     # open 유지 후 half-open 전환
+CIRCUIT_HALF_OPEN_MAX_CALLS = 1 # half-open 시험 요청 수
+HEALTH_PROBE_CACHE_SECONDS = 5.0  # /health Ollama 프로브 결과 재사용 시간
+
+# ===== 데드라인 예산 & 헤지 요청 =====
+REQUEST_DEADLINE = 25.0     # 주 모델 + 백업 모델 시도가 공유하는 요청 예산 (스트리밍은 마지막 토큰까지)
+ENABLE_HEDGING = True       # 주 모델 지연 시 백업 모델에 헤지 요청
+HEDGE_PERCENTILE = 0.95     # 이 백분위 지연을 넘으면 헤지 시작
+HEDGE_MIN_SAMPLES = 20      # 표본이 모이기 전에는 기본 지연 사용
+HEDGE_DEFAULT_DELAY = 6.0   # 초
+HEDGE_MIN_DELAY = 1.0       # 초
+HEDGE_WINDOW = 200          # 백분위 계산용 최근 표본 수
+
 print("⚡ Gemma3-Tools 4B + Gemma3 4B 고속 최적화 설정 로드됨")
 print(f"🚀 메인 모델: {DEFAULT_MODEL} (툴 기능 지원)")
 print(f"🔧 보조 모델: {FALLBACK_MODEL} (기본 응답)")
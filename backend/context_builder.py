@@ -0,0 +1,84 @@
+# Dec207Hub Backend Context Builder
+# 토큰 예산 기반 대화 히스토리 패킹 (메시지 단위로만 자르고 중간 절단 없음)
+
+import math
+import logging
+from functools import lru_cache
+from typing import List, Dict, Any
+from config import MAX_CONVERSATION_HISTORY, CONTEXT_TOKEN_CACHE_SIZE, CONTEXT_DROP_BLOCK
+
+logger = logging.getLogger(__name__)
+
+# 토크나이저 근사치: ASCII는 약 4자당 1토큰, 한글 등 비ASCII는 글자당 약 0.75토큰
+ASCII_CHARS_PER_TOKEN = 4.0
+NON_ASCII_TOKENS_PER_CHAR = 0.75
+MESSAGE_OVERHEAD_TOKENS = 4  # 역할 태그/줄바꿈
+
+@lru_cache(maxsize=CONTEXT_TOKEN_CACHE_SIZE)
+def estimate_tokens(text: str) -> int:
+    """빠른 토큰 수 근사 (메시지별 결과 캐시)"""
+    if not text:
+        return 0
+    non_ascii = len(text.encode("utf-8")) - len(text)
+    # UTF-8에서 한글은 3바이트 → 추가 바이트 2개당 글자 1개
+    non_ascii_chars = non_ascii // 2
+    ascii_chars = len(text) - non_ascii_chars
+    return math.ceil(ascii_chars / ASCII_CHARS_PER_TOKEN + non_ascii_chars * NON_ASCII_TOKENS_PER_CHAR)
+
+class ContextPlan:
+    """컨텍스트 패킹 결과 (포함된 메시지와 토큰 사용 내역)"""
+    __slots__ = ("messages", "history_tokens", "fixed_tokens", "budget", "dropped", "reason")
+
+    def __init__(self, messages: List[Dict], history_tokens: int, fixed_tokens: int,
+                 budget: int, dropped: int, reason: str):
+        self.messages = messages
+        self.history_tokens = history_tokens
+        self.fixed_tokens = fixed_tokens
+        self.budget = budget
+        self.dropped = dropped
+        self.reason = reason
+
+    @property
+    def prompt_tokens(self) -> int:
+        """고정 프롬프트 + 포함된 히스토리의 추정 토큰 수"""
+        return self.fixed_tokens + self.history_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "messages": len(self.messages),
+            "history_tokens": self.history_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "budget": self.budget,
+            "dropped": self.dropped,
+            "reason": self.reason
+        }
+
+def plan_context(conversation_history: List[Dict], num_ctx: int, reserved_tokens: int,
+                 fixed_tokens: int, max_messages: int = MAX_CONVERSATION_HISTORY,
+                 drop_block: int = CONTEXT_DROP_BLOCK) -> ContextPlan:
+    """예산(num_ctx - 생성 예약 - 고정 프롬프트)과 메시지 수 상한 안에서 최근 히스토리를 통째로 포함
+
+    오래된 메시지는 히스토리 시작 기준 drop_block개 단위로만 제외 → 한 턴씩 밀어내는 방식과 달리
+    블록 경계를 넘기 전까지 포함 시작 위치가 그대로라 연속 턴의 프롬프트 prefix(KV 캐시)가 유지됨.
+    히스토리는 요약되지 않은 메시지이므로 시작 기준은 요약이 갱신될 때만 바뀜.
+    reason: "all"(전부 포함) / "token_budget"(예산 소진) / "max_messages"(메시지 수 상한)
+    """
+    history = conversation_history or []
+    budget = max(0, num_ctx - reserved_tokens - fixed_tokens)
+    block = max(1, min(drop_block, max_messages))
+    costs = [estimate_tokens(msg.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for msg in history]
+    start = 0
+    reason = "all"
+
+    if len(history) > max_messages:
+        start = math.ceil((len(history) - max_messages) / block) * block
+        reason = "max_messages"
+    used = sum(costs[start:])
+    while used > budget:
+        end = min(len(history), start + block)
+        used -= sum(costs[start:end])
+        start = end
+        reason = "token_budget"
+
+    selected = history[start:]
+    return ContextPlan(selected, used, fixed_tokens, budget, start, reason)
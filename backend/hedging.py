@@ -0,0 +1,178 @@
+# Dec207Hub Backend Hedged Requests
+# 요청 단위 데드라인 예산 + 주 모델 지연 시 백업 모델 헤지 요청
+
+import time
+import asyncio
+import logging
+from collections import deque, defaultdict
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple, AsyncIterator, TypeVar
+from config import (
+    HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES, HEDGE_DEFAULT_DELAY,
+    HEDGE_MIN_DELAY, HEDGE_WINDOW
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class RequestDeadline:
+    """요청 전체에 걸친 시간 예산 (주 모델 + 백업 시도가 공유)"""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.expires_at = self.started + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+class LatencyTracker:
+    """모델/지표별 최근 지연 시간 분포 (헤지 시점 계산용)"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], deque] = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, model: str, metric: str, seconds: float):
+        self._samples[(model, metric)].append(seconds)
+
+    def percentile(self, model: str, metric: str, p: float) -> Optional[float]:
+        samples = self._samples.get((model, metric))
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(p * len(ordered)))
+        return ordered[index]
+
+    def hedge_delay(self, model: str, metric: str) -> float:
+        """헤지 요청을 보낼 시점 (설정된 백분위, 표본 부족 시 기본값)"""
+        samples = self._samples.get((model, metric))
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, self.percentile(model, metric, HEDGE_PERCENTILE))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            f"{model}:{metric}": {
+                "samples": len(samples),
+                "p50": round(self.percentile(model, metric, 0.5), 3),
+                "p95": round(self.percentile(model, metric, 0.95), 3)
+            }
+            for (model, metric), samples in self._samples.items() if samples
+        }
+
+class HedgeStats:
+    """헤지 요청 통계"""
+
+    def __init__(self):
+        self.requests = 0
+        self.hedges_started = 0
+        self.primary_wins = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+latency_tracker = LatencyTracker(HEDGE_WINDOW)
+hedge_stats = HedgeStats()
+
+async def hedged_call(primary: Callable[[], Awaitable[T]],
+                      hedge: Optional[Callable[[], Awaitable[T]]],
+                      hedge_delay: float,
+                      deadline: RequestDeadline,
+                      hedge_allowed: Callable[[], bool] = lambda: True) -> Tuple[str, T]:
+    """주 요청을 실행하고 hedge_delay 안에 끝나지 않으면 헤지 요청을 병행
+
+    먼저 성공한 쪽의 ("primary" | "hedge", 결과)를 반환하고 나머지는 취소.
+    주 요청이 먼저 실패하면 헤지를 즉시 시작 (hedge_allowed와 무관).
+    둘 다 실패하면 마지막 예외, 예산 소진 시 asyncio.TimeoutError 발생.
+    """
+    hedge_stats.requests += 1
+    tasks: Dict[asyncio.Task, str] = {asyncio.create_task(primary()): "primary"}
+    hedge_started = False
+    last_error: Optional[BaseException] = None
+
+    def start_hedge(reason: str):
+        nonlocal hedge_started
+        hedge_started = True
+        hedge_stats.hedges_started += 1
+        logger.info(f"🔀 헤지 요청 시작 ({reason}, {deadline.elapsed():.2f}초 경과)")
+        tasks[asyncio.create_task(hedge())] = "hedge"
+
+    try:
+        while tasks:
+            timeout = deadline.remaining()
+            waiting_for_hedge = hedge is not None and not hedge_started
+            if waiting_for_hedge:
+                timeout = min(timeout, max(0.0, hedge_delay - deadline.elapsed()))
+
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                if deadline.expired():
+                    hedge_stats.deadline_exceeded += 1
+                    raise asyncio.TimeoutError("요청 시간 예산 초과")
+                if waiting_for_hedge:
+                    if hedge_allowed():
+                        start_hedge("주 모델 지연")
+                    else:
+                        # 백업 모델 여유가 없으면 헤지 없이 주 모델만 기다림
+                        hedge = None
+                continue
+
+            for task in done:
+                label = tasks.pop(task)
+                if task.exception() is None:
+                    if label == "primary":
+                        hedge_stats.primary_wins += 1
+                    else:
+                        hedge_stats.hedge_wins += 1
+                    return label, task.result()
+                last_error = task.exception()
+                logger.warning(f"{label} 요청 실패: {last_error}")
+                if label == "primary" and hedge is not None and not hedge_started:
+                    start_hedge("주 모델 실패")
+
+        raise last_error if last_error else RuntimeError("헤지 요청 실패")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def hedged_stream(primary: Callable[[], AsyncIterator[T]],
+                        hedge: Optional[Callable[[], AsyncIterator[T]]],
+                        hedge_delay: float,
+                        deadline: RequestDeadline,
+                        hedge_allowed: Callable[[], bool] = lambda: True) -> Tuple[str, T, AsyncIterator[T]]:
+    """첫 항목(첫 토큰)을 먼저 낸 스트림을 선택 - (라벨, 첫 항목, 이어서 읽을 스트림) 반환"""
+    streams: Dict[str, AsyncIterator[T]] = {}
+
+    def first_item(label: str, factory: Callable[[], AsyncIterator[T]]):
+        async def run() -> T:
+            stream = factory()
+            streams[label] = stream
+            return await stream.__anext__()
+        return run
+
+    winner = None
+    try:
+        winner, item = await hedged_call(
+            first_item("primary", primary),
+            first_item("hedge", hedge) if hedge is not None else None,
+            hedge_delay, deadline, hedge_allowed
+        )
+        return winner, item, streams[winner]
+    finally:
+        # 진 쪽 스트림 정리 (업스트림 HTTP 연결 종료)
+        for label, stream in streams.items():
+            if label != winner:
+                try:
+                    await stream.aclose()
+                except Exception:
+                    pass
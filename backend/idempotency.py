@@ -0,0 +1,197 @@
+# Dec207Hub Backend Idempotency Cache
+# 멱등성 키별 진행 중/완료 결과 보관 - 재시도는 새로 생성하지 않고 원래 결과를 받거나 진행 중인 생성에 합류
+
+import re
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+from config import IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_DETACH_GRACE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_.:-]{8,128}$")
+
+class IdempotencyKeyError(ValueError):
+    """잘못된 멱등성 키"""
+
+class IdempotencyConflict(Exception):
+    """같은 키로 다른 요청 내용이 들어옴"""
+
+def validate_idempotency_key(key: str) -> str:
+    if not IDEMPOTENCY_KEY_PATTERN.match(key):
+        raise IdempotencyKeyError("멱등성 키는 영문/숫자/_.:- 8~128자여야 합니다")
+    return key
+
+def make_fingerprint(message: str, model: Optional[str]) -> str:
+    """요청 내용 지문 - 같은 키로 다른 질문을 보내면 충돌로 처리"""
+    return hashlib.sha256(f"{model or ''}\x00{message}".encode("utf-8")).hexdigest()
+
+class IdempotencyEntry:
+    """키 1개의 상태 (future가 끝나기 전까지 진행 중)"""
+    __slots__ = ("key", "fingerprint", "future", "task", "subscribers", "grace_handle",
+                 "created_at", "completed_at")
+
+    def __init__(self, key: str, fingerprint: str):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+        self.grace_handle: Optional[asyncio.TimerHandle] = None
+        self.created_at = time.monotonic()
+        self.completed_at: Optional[float] = None
+
+class IdempotencyCache:
+    """멱등성 키 캐시 (REST /chat과 WebSocket 공용, 개수 상한 + TTL)
+
+    생성은 요청(연결)과 분리된 태스크에서 실행되어 클라이언트 연결이 끊겨도 계속되고,
+    구독자가 모두 떠나면 grace 시간 동안 재연결을 기다린 뒤에만 중단함.
+    완료된 결과는 TTL 동안 그대로 재전달. 생성이 실패하면 항목을 지워서 재시도가 새로 생성하도록 함
+    """
+
+    def __init__(self, ttl: float, max_entries: int, detach_grace: float):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.detach_grace = detach_grace
+        self._entries: "OrderedDict[str, IdempotencyEntry]" = OrderedDict()
+        self._completed: deque = deque()  # 완료 순서 = 만료 순서 (삽입 순서와 다름)
+        self.started = 0
+        self.joined = 0
+        self.replayed = 0
+        self.conflicts = 0
+        self.failed = 0
+        self.detached = 0
+        self.abandoned = 0
+
+    async def run(self, key: str, fingerprint: str,
+                  factory: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], str]:
+        """키로 결과 조회 또는 생성 - (결과, "new" | "joined" | "replayed") 반환
+
+        호출자가 취소되면(연결 종료 등) 구독만 해제하고 생성은 계속됨
+        """
+        while True:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._start(key, fingerprint, factory)
+                status = "new"
+            elif entry.fingerprint != fingerprint:
+                self.conflicts += 1
+                raise IdempotencyConflict("같은 멱등성 키로 다른 요청이 이미 처리되었습니다")
+            elif entry.future.done() and not entry.future.cancelled():
+                self.replayed += 1
+                logger.info(f"♻️ 멱등성 키 재요청 - 저장된 결과 반환: {key[:16]}")
+                return entry.future.result(), "replayed"
+            else:
+                self.joined += 1
+                status = "joined"
+                logger.info(f"♻️ 멱등성 키 재요청 - 진행 중인 생성에 합류: {key[:16]}")
+
+            self._attach(entry)
+            try:
+                return await asyncio.shield(entry.future), status
+            except asyncio.CancelledError:
+                if not entry.future.cancelled():
+                    raise  # 호출자 취소 → 구독만 해제 (finally)
+                # 구독자 없이 grace가 지나 중단된 생성 → 다시 확인 후 새로 생성
+                continue
+            finally:
+                self._detach(entry)
+
+    def abort(self, key: str) -> bool:
+        """사용자가 명시적으로 취소한 생성 중단 - 다른 구독자가 없을 때만 (grace 대기 없이)"""
+        entry = self._entries.get(key)
+        if entry is None or entry.future.done() or entry.subscribers:
+            return False
+        self._abandon(entry)
+        return True
+
+    def _start(self, key: str, fingerprint: str,
+               factory: Callable[[], Awaitable[Dict[str, Any]]]) -> IdempotencyEntry:
+        entry = IdempotencyEntry(key, fingerprint)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.started += 1
+        entry.task = asyncio.create_task(self._produce(entry, factory))
+        return entry
+
+    async def _produce(self, entry: IdempotencyEntry,
+                       factory: Callable[[], Awaitable[Dict[str, Any]]]):
+        """연결과 분리된 생성 태스크 - 결과/실패를 future로 전달"""
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            self._discard(entry)
+            entry.future.cancel()
+            raise
+        except Exception as e:
+            self.failed += 1
+            self._discard(entry)
+            entry.future.set_exception(e)
+            entry.future.exception()  # 구독자가 없어도 미처리 예외 경고를 남기지 않음
+            return
+        entry.completed_at = time.monotonic()
+        self._completed.append(entry)
+        entry.future.set_result(result)
+
+    def _attach(self, entry: IdempotencyEntry):
+        entry.subscribers += 1
+        if entry.grace_handle is not None:
+            entry.grace_handle.cancel()
+            entry.grace_handle = None
+
+    def _detach(self, entry: IdempotencyEntry):
+        """구독 해제 - 마지막 구독자가 떠나면 grace 시간 후 생성 중단"""
+        entry.subscribers -= 1
+        if entry.subscribers or entry.future.done():
+            return
+        self.detached += 1
+        logger.info(f"⏳ 멱등성 키 구독자 없음 - {self.detach_grace:.0f}초 동안 재연결 대기: {entry.key[:16]}")
+        entry.grace_handle = asyncio.get_running_loop().call_later(
+            self.detach_grace, self._abandon, entry
+        )
+
+    def _abandon(self, entry: IdempotencyEntry):
+        """재연결 없이 grace가 지났거나 사용자가 취소 → 생성 중단 (이후 같은 키는 새로 생성)"""
+        entry.grace_handle = None
+        if entry.subscribers or entry.future.done():
+            return
+        self.abandoned += 1
+        self._discard(entry)
+        if entry.task is not None:
+            entry.task.cancel()
+        logger.info(f"🛑 멱등성 키 생성 중단 (구독자 없음): {entry.key[:16]}")
+
+    def _discard(self, entry: IdempotencyEntry):
+        if self._entries.get(entry.key) is entry:
+            del self._entries[entry.key]
+
+    def _expire(self):
+        """완료 후 TTL이 지난 항목 정리 (진행 중인 항목은 유지)"""
+        now = time.monotonic()
+        while self._completed and now - self._completed[0].completed_at > self.ttl:
+            self._discard(self._completed.popleft())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "in_progress": sum(1 for e in self._entries.values() if not e.future.done()),
+            "started": self.started,
+            "joined": self.joined,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+            "failed": self.failed,
+            "detached": self.detached,
+            "abandoned": self.abandoned
+        }
+
+# 전역 멱등성 키 캐시 인스턴스
+idempotency_cache = IdempotencyCache(
+    ttl=IDEMPOTENCY_TTL_SECONDS,
+    max_entries=IDEMPOTENCY_MAX_ENTRIES,
+    detach_grace=IDEMPOTENCY_DETACH_GRACE_SECONDS
+)
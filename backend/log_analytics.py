@@ -0,0 +1,264 @@
+# Dec207Hub Backend Log Analytics
+# 채팅 로그 스트리밍 집계 - 모델/일자별 응답시간 백분위, 시간당 요청 수, IP별 사용량 (JSON / CSV 보고서)
+
+import io
+import os
+import sys
+import csv
+import json
+import math
+import argparse
+import contextlib
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+from chat_log_store import (
+    SEGMENT_PATTERN, TEXT_LOG_PATTERN, iter_segments, read_segment, parse_text_log
+)
+
+REPORT_TABLES = ("models", "days", "hours", "ips")
+
+class LatencySketch:
+    """응답시간 분포 (로그 스케일 버킷, 상대 오차 1%) - 표본 수와 무관하게 메모리 일정, 병합 가능"""
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Counter = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, value: float):
+        self.buckets[math.ceil(math.log(max(value, 1e-6)) / self._log_gamma)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencySketch"):
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3),
+            "p50": round(self.quantile(0.5), 3),
+            "p95": round(self.quantile(0.95), 3),
+            "p99": round(self.quantile(0.99), 3),
+            "max": round(self.max, 3)
+        }
+
+class LogStats:
+    """로그 집계 결과 (파일별로 따로 집계한 뒤 merge로 합침)"""
+
+    def __init__(self):
+        self.files = 0
+        self.records = 0
+        self.roles: Counter = Counter()
+        self.latency = LatencySketch()
+        self.models: Dict[str, LatencySketch] = defaultdict(LatencySketch)
+        self.day_models: Dict[Tuple[str, str], LatencySketch] = defaultdict(LatencySketch)
+        self.day_requests: Counter = Counter()
+        self.hour_requests: Counter = Counter()   # "YYYY-MM-DDTHH" → 사용자 요청 수
+        self.ip_requests: Counter = Counter()
+        self.ip_responses: Counter = Counter()
+
+    def add(self, record: Dict[str, Any]):
+        self.records += 1
+        role = record.get("role", "system")
+        self.roles[role] += 1
+        ts = record.get("ts", "")
+        ip = record.get("ip", "unknown")
+        if role == "user":
+            self.day_requests[ts[:10]] += 1
+            self.hour_requests[ts[:13]] += 1
+            self.ip_requests[ip] += 1
+        elif role == "assistant":
+            self.ip_responses[ip] += 1
+            response_time = record.get("response_time")
+            if response_time:
+                model = record.get("model") or "unknown"
+                self.latency.add(response_time)
+                self.models[model].add(response_time)
+                self.day_models[(ts[:10], model)].add(response_time)
+
+    def merge(self, other: "LogStats"):
+        self.files += other.files
+        self.records += other.records
+        self.roles.update(other.roles)
+        self.latency.merge(other.latency)
+        for model, sketch in other.models.items():
+            self.models[model].merge(sketch)
+        for key, sketch in other.day_models.items():
+            self.day_models[key].merge(sketch)
+        self.day_requests.update(other.day_requests)
+        self.hour_requests.update(other.hour_requests)
+        self.ip_requests.update(other.ip_requests)
+        self.ip_responses.update(other.ip_responses)
+
+    def report(self, top_ips: int = 20) -> Dict[str, Any]:
+        """보고서 (JSON 직렬화 가능)"""
+        hours = sorted(self.hour_requests)
+        peak_hour = max(hours, key=lambda h: self.hour_requests[h]) if hours else None
+        hour_of_day = [0] * 24
+        for hour, count in self.hour_requests.items():
+            hour_of_day[int(hour[11:13])] += count
+        days = sorted(set(self.day_requests) | {day for day, _ in self.day_models})
+        ips = sorted(set(self.ip_requests) | set(self.ip_responses),
+                     key=lambda ip: (-self.ip_requests[ip], ip))
+        return {
+            "range": {"from": days[0] if days else None, "to": days[-1] if days else None},
+            "files": self.files,
+            "records": self.records,
+            "totals": {
+                "requests": self.roles["user"],
+                "responses": self.roles["assistant"],
+                "system_events": self.roles["system"],
+                "ips": len(ips)
+            },
+            "latency": self.latency.to_dict(),
+            "models": {
+                model: {**sketch.to_dict(), "share": round(sketch.count / self.latency.count, 3)}
+                for model, sketch in sorted(self.models.items())
+            },
+            "days": {
+                day: {
+                    "requests": self.day_requests[day],
+                    "models": {model: sketch.to_dict() for (d, model), sketch in sorted(self.day_models.items())
+                               if d == day}
+                }
+                for day in days
+            },
+            "hours": {
+                "active_hours": len(hours),
+                "average_requests": round(sum(self.hour_requests.values()) / len(hours), 2) if hours else 0,
+                "peak": {"hour": peak_hour, "requests": self.hour_requests[peak_hour]} if peak_hour else None,
+                "hour_of_day": hour_of_day,
+                "series": {hour: self.hour_requests[hour] for hour in hours}
+            },
+            "ips": [
+                {"ip": ip, "requests": self.ip_requests[ip], "responses": self.ip_responses[ip]}
+                for ip in ips[:top_ips]
+            ]
+        }
+
+def file_date(path: str) -> Optional[str]:
+    name = os.path.basename(path)
+    match = SEGMENT_PATTERN.match(name) or TEXT_LOG_PATTERN.match(name)
+    return match.group(1) if match else None
+
+def iter_log_files(paths: List[str], start_date: Optional[str] = None,
+                   end_date: Optional[str] = None) -> Iterator[str]:
+    """분석할 파일 목록 - 디렉터리는 안의 .txt 로그와 JSONL 세그먼트 (파일명 날짜로 기간 필터)"""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        yield from iter_segments(path, start_date, end_date)
+        for name in sorted(os.listdir(path)):
+            match = TEXT_LOG_PATTERN.match(name)
+            if match and not ((start_date and match.group(1) < start_date)
+                              or (end_date and match.group(1) > end_date)):
+                yield os.path.join(path, name)
+
+def analyze_file(path: str, start: Optional[str] = None, end: Optional[str] = None) -> LogStats:
+    """파일 1개 스트리밍 집계 (.txt는 기존 형식 파싱, 세그먼트는 .gz도 읽으면서 압축 해제)"""
+    stats = LogStats()
+    stats.files = 1
+    records = parse_text_log(path) if path.endswith(".txt") else read_segment(path)
+    end_bound = f"{end}T99" if end and len(end) == 10 else end
+    for record in records:
+        ts = record.get("ts", "")
+        if (start and ts < start) or (end_bound and ts > end_bound):
+            continue
+        stats.add(record)
+    return stats
+
+def analyze(paths: List[str], start: Optional[str] = None, end: Optional[str] = None,
+            workers: int = 1) -> LogStats:
+    """여러 파일 집계 - workers > 1이면 프로세스 풀에서 파일별로 병렬 처리"""
+    files = list(iter_log_files(paths, start and start[:10], end and end[:10]))
+    total = LogStats()
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for stats in pool.map(analyze_file, files, [start] * len(files), [end] * len(files),
+                                  chunksize=max(1, len(files) // (workers * 4))):
+                total.merge(stats)
+    else:
+        for path in files:
+            total.merge(analyze_file(path, start, end))
+    return total
+
+def write_csv(report: Dict[str, Any], table: str, out: io.TextIOBase):
+    """보고서의 표 하나를 CSV로 출력 (models | days | hours | ips)"""
+    latency_columns = ["count", "mean", "p50", "p95", "p99", "max"]
+    writer = csv.writer(out)
+    if table == "models":
+        writer.writerow(["model"] + latency_columns + ["share"])
+        for model, row in report["models"].items():
+            writer.writerow([model] + [row.get(c) for c in latency_columns] + [row["share"]])
+    elif table == "days":
+        writer.writerow(["day", "requests", "model"] + latency_columns)
+        for day, row in report["days"].items():
+            for model, latency in (row["models"] or {"": {}}).items():
+                writer.writerow([day, row["requests"], model] + [latency.get(c) for c in latency_columns])
+    elif table == "hours":
+        writer.writerow(["hour", "requests"])
+        for hour, count in report["hours"]["series"].items():
+            writer.writerow([hour, count])
+    elif table == "ips":
+        writer.writerow(["ip", "requests", "responses"])
+        for row in report["ips"]:
+            writer.writerow([row["ip"], row["requests"], row["responses"]])
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """명령줄 도구 - python log_analytics.py [경로...] [--from/--to] [--workers N] [--format json|csv]"""
+    with contextlib.redirect_stdout(sys.stderr):  # 설정 로드 메시지가 보고서에 섞이지 않게
+        from config import CHAT_LOG_DIR, CHAT_LOG_SEGMENT_DIR, CHAT_LOG_FORMAT
+
+    parser = argparse.ArgumentParser(description="Dec207Hub 채팅 로그 분석")
+    parser.add_argument("paths", nargs="*",
+                        help="로그 파일/디렉터리 (기본: 기록 형식에 맞는 로그 디렉터리, 기존 .txt는 chat_logs 지정)")
+    parser.add_argument("--from", dest="start", help="시작 날짜 또는 ISO 시각")
+    parser.add_argument("--to", dest="end", help="끝 날짜(포함) 또는 ISO 시각")
+    parser.add_argument("--workers", type=int, default=1, help="병렬 처리 프로세스 수")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--table", choices=REPORT_TABLES, default="models", help="CSV로 출력할 표")
+    parser.add_argument("--top-ips", type=int, default=20)
+    parser.add_argument("--output", help="출력 파일 (기본: 표준 출력)")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or [CHAT_LOG_DIR if CHAT_LOG_FORMAT == "text" else CHAT_LOG_SEGMENT_DIR]
+    report = analyze(paths, args.start, args.end, max(1, args.workers)).report(args.top_ips)
+
+    with (open(args.output, "w", encoding="utf-8", newline="") if args.output
+          else contextlib.nullcontext(sys.stdout)) as out:
+        if args.format == "csv":
+            write_csv(report, args.table, out)
+        else:
+            json.dump(report, out, ensure_ascii=False, indent=2)
+            out.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
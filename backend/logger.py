@@ -1,22 +1,96 @@
 # Dec207Hub Backend Logging System
-# 채팅 로거 및 세션 관리
+# 채팅 로거 및 세션 관리 (기록은 대기열에 넣고 별도 스레드가 모아서 JSONL 세그먼트 / .txt 파일에 씀)
 
 import os
+import time
+import queue
+import atexit
 import logging
+import threading
+import logging.handlers
+from collections import OrderedDict
 from datetime import datetime
-from typing import Union
+from typing import Union, Dict, Any, Optional, TextIO
 from fastapi import WebSocket, Request
+from config import (
+    CHAT_LOG_DIR, CHAT_LOG_QUEUE_MAX, CHAT_LOG_BATCH_SIZE, CHAT_LOG_FLUSH_INTERVAL,
+    CHAT_LOG_FSYNC, CHAT_LOG_MAX_OPEN_FILES, CHAT_LOG_FORMAT, CHAT_LOG_SEGMENT_DIR,
+    CHAT_LOG_ROTATE_BYTES, CHAT_LOG_ROTATE_SECONDS, CHAT_LOG_COMPRESS,
+    SERVER_LOG_MAX_BYTES, SERVER_LOG_BACKUPS
+)
+from chat_log_store import ChatLogStore, make_record, format_text_record, format_text_header
+from chat_search import chat_search_index
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def setup_server_log_file(path: str) -> logging.handlers.QueueListener:
+    """백엔드 로그 파일 추가 (앱 시작 시 호출) - 파일 쓰기는 QueueListener 스레드에서 (이벤트 루프에서 디스크 I/O 없음)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=SERVER_LOG_MAX_BYTES, backupCount=SERVER_LOG_BACKUPS, encoding="utf-8"
+    )
+    file_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    logging.getLogger().addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+def close_server_log_file(listener: logging.handlers.QueueListener):
+    """백엔드 로그 파일 종료 (앱 종료 시 호출) - 루트 로거에서 QueueHandler 제거 후 남은 로그 기록"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler) and handler.queue is listener.queue:
+            root.removeHandler(handler)
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
 class ChatLogger:
-    """채팅 로그 관리 클래스"""
+    """채팅 로그 관리 클래스
+
+    log_message는 기록을 대기열에 넣기만 하고 바로 반환 (이벤트 루프에서 디스크 I/O 없음).
+    기록 스레드가 모아서 쓰고, (날짜, IP)별 파일 핸들은 LRU로 열어 둔 채 주기적으로 flush.
+    log_format: jsonl(ChatLogStore 세그먼트) | text(기존 IP별 일자 .txt) | both
+    대기열이 가득 차면 버리고 dropped로 집계, stop() 시 남은 기록은 모두 쓴 뒤 종료
+    """
     
-    def __init__(self, log_dir: str = "chat_logs"):
+    def __init__(self, log_dir: str = CHAT_LOG_DIR, queue_max: int = CHAT_LOG_QUEUE_MAX,
+                 batch_size: int = CHAT_LOG_BATCH_SIZE, flush_interval: float = CHAT_LOG_FLUSH_INTERVAL,
+                 fsync: bool = CHAT_LOG_FSYNC, max_open_files: int = CHAT_LOG_MAX_OPEN_FILES,
+                 log_format: str = CHAT_LOG_FORMAT, segment_dir: str = CHAT_LOG_SEGMENT_DIR):
         self.log_dir = log_dir
+        self.log_format = log_format
+        self.segment_dir = segment_dir
+        self.text_enabled = log_format in ("text", "both")
+        # 검색 색인은 세그먼트 위치로 레코드를 식별하므로 JSONL 기록 시에만 사용
+        self.search_index = chat_search_index if log_format in ("jsonl", "both") else None
+        self.store = ChatLogStore(
+            segment_dir, rotate_bytes=CHAT_LOG_ROTATE_BYTES,
+            rotate_seconds=CHAT_LOG_ROTATE_SECONDS, compress=CHAT_LOG_COMPRESS,
+            on_close=self.search_index.mark_complete if self.search_index is not None else None
+        ) if log_format in ("jsonl", "both") else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_open_files = max_open_files
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_max)
+        self._files: "OrderedDict[tuple, TextIO]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.batches = 0
+        self.flushes = 0
+        self.max_queue_depth = 0
         self.ensure_log_directory()
+        atexit.register(self.stop)  # lifespan 밖에서 쓰인 경우에도 종료 시 남은 기록 기록
     
     def ensure_log_directory(self):
         """로그 디렉토리 생성"""
@@ -46,46 +120,187 @@ class ChatLogger:
             logger.error(f"IP 주소 추출 중 오류 발생: {e}")
             return "unknown"
     
-    def get_log_filename(self, user_ip: str) -> str:
+    def get_log_filename(self, user_ip: str, date_str: Optional[str] = None) -> str:
         """로그 파일명 생성: YYYY-MM-DD_IP.txt"""
-        date_str = datetime.now().strftime("%Y-%m-%d")
+        date_str = date_str or datetime.now().strftime("%Y-%m-%d")
         ip_clean = user_ip.replace(".", "_").replace(":", "_")
         return f"{date_str}_{ip_clean}.txt"
     
     def log_message(self, user_ip: str, role: str, content: str, 
                    response_time: float = None, model: str = None):
-        """메시지 로깅"""
-        filename = self.get_log_filename(user_ip)
-        filepath = os.path.join(self.log_dir, filename)
-        
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        role_display = "사용자" if role == "user" else "AI" if role == "assistant" else "시스템"
-        
+        """메시지 로깅 (대기열에 넣고 바로 반환, 시각은 호출 시점 기준)"""
+        self.start()
         try:
-            # 파일이 없으면 헤더 추가
-            write_header = not os.path.exists(filepath)
-            
-            with open(filepath, 'a', encoding='utf-8') as f:
-                if write_header:
-                    f.write(f"=== Dec207Hub 채팅 로그 ===\n")
-                    f.write(f"날짜: {datetime.now().strftime('%Y-%m-%d')}\n")
-                    f.write(f"사용자 IP: {user_ip}\n")
-                    f.write(f"서버: Dec207Hub API v1.0\n")
-                    f.write("=" * 50 + "\n\n")
-                
-                f.write(f"[{timestamp}] {role_display}: {content}\n")
-                if response_time:
-                    f.write(f"    (응답시간: {response_time:.2f}초)\n")
-                if model and role == "assistant":
-                    f.write(f"    (모델: {model})\n")
-                f.write("\n")
-                
-        except Exception as e:
-            logger.error(f"❌ 로그 저장 실패: {e}")
+            self._queue.put_nowait((datetime.now(), user_ip, role, content, response_time, model))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"⚠️ 채팅 로그 대기열 가득 참 - 기록 버림 (누적 {self.dropped}건)")
+            return
+        self.enqueued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
     
     def log_session_event(self, user_ip: str, event: str):
         """세션 이벤트 로깅 (연결/해제 등)"""
         self.log_message(user_ip, "system", event)
+    
+    def start(self):
+        """기록 스레드 시작 (첫 기록 시 자동 시작)"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chat-log-writer", daemon=True)
+                self._thread.start()
+    
+    def stop(self):
+        """대기열에 남은 기록을 모두 쓰고 파일을 닫은 뒤 기록 스레드 종료"""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)  # 종료 표시 (대기열이 가득 차 있으면 자리가 날 때까지 대기)
+            self._thread.join()
+            self._thread = None
+        logger.info(f"📝 채팅 로그 기록 종료 - {self.written}건 기록, {self.dropped}건 버림")
+    
+    def _run(self):
+        """기록 스레드 - 모아서 쓰고 flush 주기마다 버퍼를 비움"""
+        last_flush = time.monotonic()
+        running = True
+        if self.store is not None:
+            self.store.compress_stale()
+        if self.search_index is not None:
+            self.search_index.start_backfill(self.segment_dir)
+        while running:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if None in batch:
+                batch = [record for record in batch if record is not None]
+                running = False
+            if batch:
+                self._write_batch(batch)
+            if not running or time.monotonic() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = time.monotonic()
+        # 종료 표시 이후에 들어온 기록까지 모두 기록
+        remaining = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not None:
+                remaining.append(record)
+        if remaining:
+            self._write_batch(remaining)
+        self._flush()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        if self.store is not None:
+            self.store.close()
+        if self.search_index is not None:
+            self.search_index.stop_backfill()
+    
+    def _write_batch(self, batch: list):
+        self.batches += 1
+        records = [make_record(*entry) for entry in batch]
+        if self.store is not None:
+            try:
+                written = self.store.write(records)
+            except Exception as e:
+                written = []
+                self.write_errors += 1
+                logger.error(f"❌ 로그 세그먼트 기록 실패: {e}")
+            if self.search_index is not None and written:
+                try:
+                    self.search_index.add(written)
+                except Exception as e:
+                    self.search_index.index_errors += 1
+                    logger.error(f"❌ 채팅 로그 색인 실패: {e}")
+        if self.text_enabled:
+            for record in records:
+                try:
+                    self._get_file(record["ts"][:10], record["ip"]).write(format_text_record(record))
+                except Exception as e:
+                    self.write_errors += 1
+                    logger.error(f"❌ 로그 저장 실패: {e}")
+        self.written += len(records)
+    
+    def _get_file(self, date_str: str, user_ip: str) -> TextIO:
+        """(날짜, IP)별 파일 핸들 - LRU로 열어 두고 새 파일이면 헤더 기록"""
+        key = (date_str, user_ip)
+        f = self._files.get(key)
+        if f is not None:
+            self._files.move_to_end(key)
+            return f
+        
+        while len(self._files) >= self.max_open_files:
+            _, old = self._files.popitem(last=False)
+            self._close(old)
+        
+        filepath = os.path.join(self.log_dir, self.get_log_filename(user_ip, date_str))
+        f = open(filepath, 'a', encoding='utf-8')
+        if f.tell() == 0:
+            f.write(format_text_header(date_str, user_ip))
+        self._files[key] = f
+        return f
+    
+    def _flush(self):
+        """열린 파일 flush (설정 시 fsync), 지난 날짜 파일은 닫음"""
+        if self.store is not None:
+            try:
+                self.store.flush(self.fsync)
+            except Exception as e:
+                self.write_errors += 1
+                logger.error(f"❌ 로그 세그먼트 flush 실패: {e}")
+        today = datetime.now().strftime("%Y-%m-%d")
+        for key in list(self._files):
+            f = self._files[key]
+            if key[0] != today:
+                del self._files[key]
+                self._close(f)
+                continue
+            try:
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            except Exception as e:
+                self.write_errors += 1
+                logger.error(f"❌ 로그 flush 실패: {e}")
+        self.flushes += 1
+    
+    def _close(self, f: TextIO):
+        try:
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            f.close()
+        except Exception as e:
+            self.write_errors += 1
+            logger.error(f"❌ 로그 파일 닫기 실패: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._thread is not None,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "queue_capacity": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors,
+            "batches": self.batches,
+            "flushes": self.flushes,
+            "open_files": len(self._files),
+            "format": self.log_format,
+            "store": self.store.get_stats() if self.store is not None else None
+        }
 
 # 전역 로거 인스턴스
 chat_logger = ChatLogger()
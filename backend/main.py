@@ -2,25 +2,78 @@
 # FastAPI 메인 앱 및 엔드포인트
 
 import os
-import httpx
+import hmac
+import json
+import math
+import asyncio
 import uvicorn
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, Any
-from fastapi import FastAPI, Request
+from typing import Dict, Any, Optional
+from fastapi import FastAPI, Request, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 # 로컬 모듈 임포트
 from config import (
-    OLLAMA_BASE_URL, DEFAULT_MODEL, SERVER_HOST, SERVER_PORT, LOG_LEVEL
+    DEFAULT_MODEL, SERVER_HOST, SERVER_PORT, LOG_LEVEL,
+    ENABLE_MODEL_RESIDENCY, ENABLE_SUMMARIZATION, ADMIN_TOKEN,
+    CHAT_SEARCH_PAGE_SIZE, CHAT_SEARCH_MAX_PAGE_SIZE, SERVER_LOG_FILE
 )
-from models import ChatRequest, ChatResponse, HealthResponse, ModelsResponse
-from logger import chat_logger
-from chat_handler import chat_with_ollama
+from models import (
+    ChatRequest, ChatResponse, HealthResponse, ModelsResponse,
+    ChatLogSearchResponse, ChatLogSearchResult
+)
+from logger import chat_logger, setup_server_log_file, close_server_log_file
+from chat_handler import chat_with_ollama, GenerationFailed
 from websocket_handler import websocket_endpoint, manager
+from ollama_client import ollama_clients
+from ollama_pool import ollama_pool
+from model_router import model_router
+from idempotency import (
+    idempotency_cache, validate_idempotency_key, make_fingerprint,
+    IdempotencyKeyError, IdempotencyConflict
+)
+from response_cache import response_cache, get_cache_stats
+from semantic_cache import get_semantic_cache_stats
+from request_coalescer import request_coalescer
+from scheduler import gpu_scheduler, SchedulerQueueFull, PRIORITY_BATCH
+from hedging import hedge_stats, latency_tracker
+from circuit_breaker import circuit_breakers
+from session_store import session_store
+from prompt_metrics import prompt_eval_stats
+from model_residency import residency_manager
+from summarizer import conversation_summarizer
+from response_filter import response_filter
+from batch_runner import run_batch, parse_batch_items, validate_batch_options, batch_store
+from chat_search import chat_search_index, SearchQueryError
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """앱 수명주기 - 백엔드 로그 파일, 채팅 로그 기록 스레드, 공유 Ollama 클라이언트 생성 및 종료, 노드 헬스체크, 모델 웜업, 대화 요약, 캐시 정리"""
+    server_log_listener = setup_server_log_file(SERVER_LOG_FILE) if SERVER_LOG_FILE else None
+    chat_logger.start()
+    await ollama_clients.startup()
+    await ollama_pool.start()
+    if ENABLE_MODEL_RESIDENCY:
+        await residency_manager.start()
+    if ENABLE_SUMMARIZATION:
+        await conversation_summarizer.start()
+    yield
+    await conversation_summarizer.stop()
+    await residency_manager.stop()
+    await ollama_pool.stop()
+    await ollama_clients.close()
+    if response_cache is not None:
+        response_cache.close()
+    # 대기 중인 채팅 로그를 모두 기록 (블로킹 I/O라 스레드에서 대기)
+    await asyncio.to_thread(chat_logger.stop)
+    if server_log_listener is not None:
+        close_server_log_file(server_log_listener)
 
 # FastAPI 앱 생성
-app = FastAPI(title="Dec207Hub API", version="1.0.0")
+app = FastAPI(title="Dec207Hub API", version="1.0.0", lifespan=lifespan)
 
 # CORS 미들웨어 설정
 app.add_middleware(
@@ -34,44 +87,56 @@ app.add_middleware(
 # WebSocket 엔드포인트 등록 (정적 파일보다 먼저)
 app.websocket("/ws")(websocket_endpoint)
 
-# frontend 디렉토리를 정적 파일로 서빙
-frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
-app.mount("/", StaticFiles(directory=frontend_path, html=True), name="static")
-
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """서버 상태 확인"""
-    try:
-        # Ollama 서버 연결 테스트
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5.0)
-            ollama_status = "connected" if response.status_code == 200 else "disconnected"
-    except Exception as e:
-        ollama_status = f"error: {str(e)}"
-    
+    # Ollama 노드 풀 상태 (백그라운드 헬스체크 결과 기준, 주 모델 서킷이 모든 노드에서 열려 있으면 circuit_open)
     return HealthResponse(
         server="running",
-        ollama=ollama_status,
+        ollama=ollama_pool.status(DEFAULT_MODEL),
         timestamp=datetime.now().isoformat(),
-        active_connections=len(manager.active_connections)
+        active_connections=len(manager.active_connections),
+        cache=get_cache_stats(),
+        semantic_cache=get_semantic_cache_stats(),
+        coalescer=request_coalescer.get_stats(),
+        scheduler=gpu_scheduler.get_stats(),
+        hedging={**hedge_stats.get_stats(), "latency": latency_tracker.get_stats()},
+        circuits=circuit_breakers.get_stats(),
+        sessions=session_store.get_stats(),
+        prompt_eval=prompt_eval_stats.get_stats(),
+        residency=residency_manager.get_status() if ENABLE_MODEL_RESIDENCY else None,
+        summarizer=conversation_summarizer.get_stats() if ENABLE_SUMMARIZATION else None,
+        response_filter=response_filter.get_stats(),
+        batch=batch_store.get_stats(),
+        pool=ollama_pool.get_stats(),
+        router=model_router.get_stats(),
+        cancellations=manager.get_cancellation_stats(),
+        pipeline=manager.get_pipeline_stats(),
+        idempotency=idempotency_cache.get_stats(),
+        chat_log=chat_logger.get_stats(),
+        chat_search=chat_search_index.get_stats() if chat_search_index is not None else None
     )
 
 @app.get("/models", response_model=ModelsResponse)
 async def get_available_models():
-    """사용 가능한 Ollama 모델 목록"""
+    """사용 가능한 Ollama 모델 목록 (정상 노드들의 모델 합집합)"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=10.0)
-            if response.status_code == 200:
-                data = response.json()
-                models = [model["name"] for model in data.get("models", [])]
-                return ModelsResponse(models=models, default=DEFAULT_MODEL)
-            else:
-                return ModelsResponse(
-                    models=[], 
-                    default=DEFAULT_MODEL,
-                    error="Ollama 서버에 연결할 수 없습니다"
-                )
+        models = ollama_pool.list_models()
+        if not models:
+            await ollama_pool.check_all()
+            models = ollama_pool.list_models()
+        if not models:
+            return ModelsResponse(
+                models=[], 
+                default=DEFAULT_MODEL,
+                error="Ollama 서버에 연결할 수 없습니다"
+            )
+        return ModelsResponse(
+            models=models,
+            default=DEFAULT_MODEL,
+            resident=[m for m in models if residency_manager.is_resident(m)]
+                     if ENABLE_MODEL_RESIDENCY else None
+        )
     except Exception as e:
         return ModelsResponse(
             models=[], 
@@ -84,7 +149,6 @@ async def chat_endpoint(request_body: ChatRequest, request: Request):
     """REST API를 통한 채팅"""
     message = request_body.message
     model = request_body.model or DEFAULT_MODEL
-    conversation_history = request_body.conversation_history or []
     
     if not message:
         return ChatResponse(
@@ -98,25 +162,173 @@ async def chat_endpoint(request_body: ChatRequest, request: Request):
     # 클라이언트 IP 추출
     user_ip = chat_logger.get_client_ip(request)
     
-    # 사용자 메시지 로깅
-    chat_logger.log_message(user_ip, "user", message)
+    async def generate() -> Dict[str, Any]:
+        # 서버 측 세션 히스토리 (요청에 전체 히스토리가 있으면 그것을 우선 사용)
+        # 세션 ID가 없으면 등록하지 않는 임시 세션 → 일회성 요청이 WebSocket 세션을 밀어내지 않음
+        session = (session_store.get_or_create(request_body.session_id) if request_body.session_id
+                   else session_store.temporary())
+        conversation_history = session_store.resolve_history(
+            session, [msg.model_dump() for msg in request_body.conversation_history or []]
+        )
+        
+        # 사용자 메시지 로깅
+        chat_logger.log_message(user_ip, "user", message)
+        
+        # 질문 복잡도 / 현재 부하로 모델 선택
+        route = model_router.route(message, conversation_history, request_body.model)
+        
+        # AI 응답 생성 (대화 히스토리 포함)
+        # 생성 실패는 예외로 전달 → 멱등성 키 항목이 지워지고 세션 히스토리에도 남지 않음
+        start_time = datetime.now()
+        ai_response = await chat_with_ollama(
+            message, route.model, conversation_history,
+            client_id=user_ip, priority=PRIORITY_BATCH, summary=session.summary,
+            num_predict=route.num_predict, raise_on_failure=True
+        )
+        response_time = (datetime.now() - start_time).total_seconds()
+        session_store.record_turn(session, message, ai_response)
+        if ENABLE_SUMMARIZATION:
+            conversation_summarizer.maybe_schedule(session)
+        
+        # AI 응답 로깅
+        chat_logger.log_message(user_ip, "assistant", ai_response, response_time, route.model)
+        return {
+            "ai_response": ai_response,
+            "model": route.model,
+            "route": route.to_dict(),
+            "response_time": response_time,
+            "session_id": None if session.temporary else session.session_id
+        }
     
-    # AI 응답 생성 (대화 히스토리 포함)
+    # 멱등성 키가 있으면 재시도는 원래 결과를 받거나 진행 중인 생성에 합류
+    idempotency_key = request.headers.get("Idempotency-Key") or request_body.idempotency_key
+    status = None
     start_time = datetime.now()
-    ai_response = await chat_with_ollama(message, model, conversation_history)
-    response_time = (datetime.now() - start_time).total_seconds()
-    
-    # AI 응답 로깅
-    chat_logger.log_message(user_ip, "assistant", ai_response, response_time, model)
+    try:
+        if idempotency_key:
+            result, status = await idempotency_cache.run(
+                validate_idempotency_key(idempotency_key),
+                make_fingerprint(message, request_body.model), generate
+            )
+        else:
+            result = await generate()
+    except IdempotencyKeyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except SchedulerQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except GenerationFailed as e:
+        # 안내 문구만 응답 (재시도는 같은 키로도 새로 생성)
+        return ChatResponse(
+            user_message=message,
+            ai_response=str(e),
+            model=model,
+            response_time=(datetime.now() - start_time).total_seconds(),
+            timestamp=datetime.now().isoformat(),
+            session_id=request_body.session_id,
+            idempotency=status
+        )
     
     return ChatResponse(
         user_message=message,
-        ai_response=ai_response,
-        model=model,
-        response_time=response_time,
-        timestamp=datetime.now().isoformat()
+        ai_response=result["ai_response"],
+        model=result["model"],
+        response_time=result["response_time"],
+        timestamp=datetime.now().isoformat(),
+        session_id=result["session_id"],
+        route=result["route"],
+        idempotency=status
+    )
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(request: Request, batch_id: Optional[str] = None,
+                              concurrency: Optional[int] = None, emit_completed: bool = True):
+    """배치 채팅 - 결과를 완료 순서대로 NDJSON 스트리밍
+    
+    입력: {"items": [{"id", "message", "model"}], "batch_id", "concurrency", "model"}
+          또는 NDJSON (한 줄에 항목 하나, 옵션은 쿼리 파라미터)
+    같은 batch_id로 다시 보내면 완료된 항목은 실행하지 않음 (재개)
+    """
+    body = await request.body()
+    default_model = None
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            raw_items = [json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip()]
+        else:
+            data = json.loads(body or b"{}")
+            raw_items = data.get("items", [])
+            batch_id = data.get("batch_id", batch_id)
+            concurrency = data.get("concurrency", concurrency)
+            emit_completed = data.get("emit_completed", emit_completed)
+            default_model = data.get("model")
+        validate_batch_options(batch_id, concurrency)
+        items = parse_batch_items(raw_items, default_model)
+        if batch_id:
+            batch_store.validate_resume(batch_id, items)
+    except (ValueError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"잘못된 배치 요청: {str(e)}")
+    
+    user_ip = chat_logger.get_client_ip(request)
+    # 항목별 대화 로그 대신 배치 단위로 한 번만 기록
+    chat_logger.log_session_event(user_ip, f"배치 요청 - {len(items)}건 (batch_id={batch_id or '신규'})")
+    
+    async def ndjson():
+        async for event in run_batch(items, batch_id, concurrency, user_ip, emit_completed):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+def require_admin(request: Request):
+    """관리자 API 접근 확인 - ADMIN_TOKEN 설정 시 X-Admin-Token 헤더, 미설정 시 로컬 접속만 허용"""
+    if ADMIN_TOKEN:
+        if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+            raise HTTPException(status_code=401, detail="관리자 토큰이 올바르지 않습니다")
+    elif not request.client or request.client.host not in ("127.0.0.1", "::1"):
+        raise HTTPException(status_code=403, detail="관리자 API는 로컬에서만 사용할 수 있습니다 (DEC207HUB_ADMIN_TOKEN 설정 시 원격 허용)")
+
+@app.get("/admin/chat-logs/search", response_model=ChatLogSearchResponse)
+async def search_chat_logs(
+    request: Request,
+    q: Optional[str] = None,
+    ip: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    model: Optional[str] = None,
+    role: Optional[str] = None,
+    min_response_time: Optional[float] = None,
+    max_response_time: Optional[float] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(CHAT_SEARCH_PAGE_SIZE, ge=1, le=CHAT_SEARCH_MAX_PAGE_SIZE)
+):
+    """채팅 로그 검색 (최신순, 페이지 단위)
+    
+    q: 검색어 (공백 = AND, "..." = 구문), start/end: 날짜(YYYY-MM-DD) 또는 ISO 시각
+    """
+    require_admin(request)
+    if chat_search_index is None:
+        raise HTTPException(status_code=503, detail="채팅 로그 검색을 사용할 수 없습니다")
+    try:
+        result = await asyncio.to_thread(
+            chat_search_index.search, q, ip=ip, start=start, end=end, model=model, role=role,
+            min_response_time=min_response_time, max_response_time=max_response_time,
+            limit=page_size, offset=(page - 1) * page_size
+        )
+    except SearchQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ChatLogSearchResponse(
+        total=result["total"],
+        page=page,
+        page_size=page_size,
+        pages=math.ceil(result["total"] / page_size),
+        took_ms=result["took_ms"],
+        results=[ChatLogSearchResult(**item) for item in result["results"]]
     )
 
+# frontend 디렉토리를 정적 파일로 서빙 (API 라우트 뒤에 마운트해야 /health 등이 가려지지 않음)
+frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
+app.mount("/", StaticFiles(directory=frontend_path, html=True), name="static")
+
 if __name__ == "__main__":
     print("🚀 Dec207Hub API 서버 시작 중...")
     print("📍 URL: http://192.168.0.7:8000")
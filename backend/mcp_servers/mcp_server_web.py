@@ -7,7 +7,9 @@ import logging
 import json
 import psutil
 import os
-from typing import List, Dict, Any, Optional
+import re
+import mmap
+from typing import List, Dict, Any, Optional, Callable, Tuple
 from datetime import datetime
 
 # 로깅 설정
@@ -56,6 +58,132 @@ web_services = {
     }
 }
 
+# ===== 서비스 로그 조회 (실제 로그 파일 tail) =====
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHAT_LOG_DIR = os.path.join(BACKEND_DIR, "chat_logs")
+MAX_LOG_LINES = 1000                # 한 번에 돌려줄 최대 줄 수
+MAX_LINE_BYTES = 4096               # 줄이 이보다 길면 앞부분 생략
+MAX_SCAN_BYTES = 256 * 1024 * 1024  # 레벨 필터로 거슬러 올라갈 최대 범위 (거대한 파일 전체 스캔 방지)
+TAIL_CHUNK_BYTES = 1024 * 1024      # 역방향 스캔 단위
+MAX_FOLLOW_SECONDS = 30.0
+FOLLOW_POLL_INTERVAL = 0.5
+
+# 레벨별 매처 (바이트 단위로 미리 컴파일 → 줄을 디코딩하지 않고 판별)
+# 백엔드 파일 로그 "[ERROR]", 콘솔 형식 "ERROR:name:", Ollama "level=ERROR"
+LOG_LEVEL_MATCHERS = {
+    "error": re.compile(rb"(?:\[|^|level=)(?:ERROR|CRITICAL)\b|" + "❌".encode(), re.MULTILINE),
+    "warning": re.compile(rb"(?:\[|^|level=)(?:WARNING|WARN)\b|" + "⚠️".encode(), re.MULTILINE),
+    "info": re.compile(rb"(?:\[|^|level=)INFO\b", re.MULTILINE),
+}
+# 매처를 돌릴 줄을 고르는 키워드 (bytes.find로 청크를 빠르게 훑고 걸린 줄만 매처로 확인)
+LOG_LEVEL_KEYWORDS = {
+    "error": (b"ERROR", b"CRITICAL", "❌".encode()),
+    "warning": (b"WARN", "⚠️".encode()),
+    "info": (b"INFO",),
+}
+
+def latest_chat_log() -> Optional[str]:
+    """가장 최근에 기록된 채팅 로그 (기록 중인 JSONL 세그먼트 또는 기존 .txt, 압축된 세그먼트는 제외)"""
+    candidates = []
+    for directory, suffix in ((os.path.join(CHAT_LOG_DIR, "segments"), ".jsonl"), (CHAT_LOG_DIR, ".txt")):
+        if os.path.isdir(directory):
+            candidates += [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(suffix)]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+def ollama_log_path() -> str:
+    local_appdata = os.environ.get("LOCALAPPDATA")
+    if local_appdata:
+        return os.path.join(local_appdata, "Ollama", "server.log")
+    return os.path.expanduser("~/.ollama/logs/server.log")
+
+# 서비스별 로그 파일 (프론트엔드는 백엔드가 정적 파일로 서빙하므로 백엔드 로그)
+LOG_SOURCES: Dict[str, Callable[[], Optional[str]]] = {
+    "Dec207Hub-Backend": lambda: os.path.join(BACKEND_DIR, "logs", "backend.log"),
+    "Dec207Hub-Frontend": lambda: os.path.join(BACKEND_DIR, "logs", "backend.log"),
+    "Dec207Hub-Chat": latest_chat_log,
+    "Ollama-Service": ollama_log_path,
+}
+
+def chunk_log_lines(chunk: bytes, level: str = "all") -> List[bytes]:
+    """청크(완전한 줄들) 안에서 레벨에 맞는 줄 - 키워드가 있는 줄만 매처로 확인"""
+    if level == "all":
+        return [line[-MAX_LINE_BYTES:] for line in chunk.split(b"\n") if line]
+    matcher = LOG_LEVEL_MATCHERS[level]
+    spans = set()
+    for keyword in LOG_LEVEL_KEYWORDS[level]:
+        position = chunk.find(keyword)
+        while position >= 0:
+            line_start = chunk.rfind(b"\n", 0, position) + 1
+            line_end = chunk.find(b"\n", position)
+            line_end = len(chunk) if line_end < 0 else line_end
+            spans.add((line_start, line_end))
+            position = chunk.find(keyword, line_end)
+    return [chunk[max(start, end - MAX_LINE_BYTES):end] for start, end in sorted(spans)
+            if matcher.search(chunk, start, end)]
+
+def tail_log_lines(path: str, count: int, level: str = "all") -> Tuple[List[bytes], int, bool]:
+    """파일 끝에서부터 청크 단위로 거꾸로 탐색 (mmap) - (최근 줄 목록, 파일 크기, 스캔 한도 도달 여부)
+
+    청크 복사본(최대 TAIL_CHUNK_BYTES)만 메모리에 두고 다 본 페이지는 바로 해제하므로
+    파일 크기와 무관하게 메모리 사용이 일정함
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return [], 0, False
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            lines: List[bytes] = []
+            scan_floor = max(0, size - MAX_SCAN_BYTES)
+            high = size
+            while high > scan_floor and len(lines) < count:
+                low = max(scan_floor, high - TAIL_CHUNK_BYTES)
+                if low > 0:
+                    # 청크 첫 줄은 잘렸을 수 있으므로 다음 청크에서 처리
+                    cut = mm.find(b"\n", low, high)
+                    if cut < 0:
+                        # 청크보다 긴 줄 → 줄 시작까지 건너뛰고 뒷부분만 사용
+                        low = mm.rfind(b"\n", scan_floor, low) + 1
+                        if low == 0 and scan_floor > 0:
+                            break
+                        chunk = mm[max(low, high - MAX_LINE_BYTES):high]
+                        found = chunk_log_lines(chunk.replace(b"\n", b" "), level)
+                    else:
+                        low = cut + 1
+                        found = chunk_log_lines(mm[low:high], level)
+                else:
+                    found = chunk_log_lines(mm[low:high], level)
+                if found:
+                    lines = found[-(count - len(lines)):] + lines
+                if hasattr(mmap, "MADV_DONTNEED"):
+                    page_start = low - low % mmap.PAGESIZE
+                    mm.madvise(mmap.MADV_DONTNEED, page_start, high - page_start)
+                high = low
+            return lines, size, scan_floor > 0 and high <= scan_floor and len(lines) < count
+
+def read_new_lines(path: str, offset: int, level: str = "all") -> Tuple[List[bytes], int]:
+    """offset 이후 새로 추가된 완전한 줄 (파일이 줄었으면 회전된 것으로 보고 처음부터)"""
+    size = os.path.getsize(path)
+    if size < offset:
+        offset = 0
+    if size == offset:
+        return [], offset
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(min(size - offset, MAX_SCAN_BYTES))
+    complete = data.rfind(b"\n") + 1
+    return chunk_log_lines(data[:complete], level), offset + complete
+
+def render_log_line(line: bytes) -> str:
+    """JSONL 채팅 로그는 사람이 읽는 한 줄로, 나머지는 그대로"""
+    text = line.decode("utf-8", errors="replace").rstrip("\r")
+    if text.startswith("{"):
+        try:
+            record = json.loads(text)
+            return f"[{record.get('ts', '')}] {record.get('ip', '')} {record.get('role', '')}: {record.get('content', '')}"
+        except ValueError:
+            pass
+    return text
+
 @mcp.tool()
 async def get_web_server_status() -> str:
     """
@@ -151,54 +279,62 @@ async def restart_web_service(service_name: str) -> str:
 async def get_service_logs(
     service_name: str,
     lines: int = 50,
-    log_level: str = "all"
+    log_level: str = "all",
+    follow_seconds: float = 0.0
 ) -> str:
     """
     지정된 서비스의 로그를 조회합니다.
     
     Args:
-        service_name: 조회할 서비스 이름
-        lines: 조회할 로그 라인 수
+        service_name: 조회할 서비스 이름 (Dec207Hub-Backend, Dec207Hub-Chat, Ollama-Service 등)
+        lines: 조회할 로그 라인 수 (최대 1000)
         log_level: 로그 레벨 (error, warning, info, all)
+        follow_seconds: 0보다 크면 그 시간(최대 30초) 동안 새로 추가되는 줄도 이어서 수집
     """
     try:
         print(f"\n[DEBUG] Web MCP: get_service_logs called - {service_name}\n")
         
-        if service_name not in web_services:
-            available_services = list(web_services.keys())
+        if service_name not in LOG_SOURCES:
+            available_services = list(LOG_SOURCES.keys())
             result = f"❌ 서비스 '{service_name}'을 찾을 수 없습니다.\n"
             result += f"📋 사용 가능한 서비스: {', '.join(available_services)}"
             return result
         
-        # 가상의 로그 생성 (실제로는 로그 파일 읽기)
-        sample_logs = [
-            f"[INFO] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {service_name} started successfully",
-            f"[INFO] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Listening on port {web_services[service_name]['port']}",
-            f"[INFO] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Request processed: GET /api/health",
-            f"[INFO] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - WebSocket connection established",
-            f"[WARNING] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - High CPU usage detected: 85%",
-            f"[INFO] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Request processed: POST /api/chat",
-            f"[ERROR] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Failed to connect to external API",
-            f"[INFO] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Cache cleared successfully",
-            f"[INFO] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Health check passed"
-        ]
-        
-        # 로그 레벨 필터링
-        if log_level != "all":
-            filtered_logs = [log for log in sample_logs if f"[{log_level.upper()}]" in log]
-        else:
-            filtered_logs = sample_logs
-        
-        # 라인 수 제한
-        recent_logs = filtered_logs[-lines:]
+        level = log_level.lower()
+        if level != "all" and level not in LOG_LEVEL_MATCHERS:
+            return f"❌ 지원하지 않는 로그 레벨: {log_level} (error, warning, info, all)"
+        
+        log_path = LOG_SOURCES[service_name]()
+        if not log_path or not os.path.exists(log_path):
+            return f"❌ {service_name} 로그 파일이 없습니다: {log_path or '기록된 채팅 로그 없음'}"
+        
+        # 파일 끝에서부터 역방향 스캔 (디스크 I/O는 스레드에서)
+        count = max(1, min(lines, MAX_LOG_LINES))
+        recent_logs, offset, truncated = await asyncio.to_thread(tail_log_lines, log_path, count, level)
+        
+        # 팔로우: 새로 추가되는 줄 수집 (최근 count줄만 유지)
+        followed = 0
+        follow_seconds = max(0.0, min(follow_seconds, MAX_FOLLOW_SECONDS))
+        if follow_seconds:
+            deadline = asyncio.get_running_loop().time() + follow_seconds
+            while asyncio.get_running_loop().time() < deadline:
+                await asyncio.sleep(FOLLOW_POLL_INTERVAL)
+                new_lines, offset = await asyncio.to_thread(read_new_lines, log_path, offset, level)
+                followed += len(new_lines)
+                recent_logs = (recent_logs + new_lines)[-count:]
         
         result = f"📋 {service_name} 서비스 로그 (최근 {len(recent_logs)}줄)\n"
+        result += f"📁 파일: {log_path}\n"
         result += f"🔍 필터: {log_level}\n"
+        if follow_seconds:
+            result += f"👀 팔로우: {follow_seconds:.0f}초 동안 새 로그 {followed}줄\n"
+        if truncated:
+            result += f"⚠️ 마지막 {MAX_SCAN_BYTES // (1024 * 1024)}MB 안에서 찾은 줄만 표시\n"
         result += f"🕐 조회 시간: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
         result += "=" * 60 + "\n"
         
         for log_line in recent_logs:
-            result += f"{log_line}\n"
+            result += f"{render_log_line(log_line)}\n"
             
         result += "=" * 60
         
@@ -0,0 +1,160 @@
+# Dec207Hub Backend Model Residency Manager
+# 메인/보조 모델 노드별 사전 로드(웜업) + keep_alive 주기 갱신 + /api/ps 기반 상주 상태 추적
+
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from config import (
+    OLLAMA_KEEP_ALIVE, RESIDENCY_MODELS, RESIDENCY_VRAM_BUDGET_GB, RESIDENCY_CONTEXT_OVERHEAD_GB,
+    RESIDENCY_REFRESH_INTERVAL, RESIDENCY_LOAD_TIMEOUT
+)
+from ollama_pool import ollama_pool, OllamaNode
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+class ModelResidencyManager:
+    """우선순위 순으로 VRAM 예산에 들어가는 모델만 상주시키고 주기적으로 keep_alive 갱신"""
+
+    def __init__(self, models: List[str], vram_budget_gb: float, refresh_interval: float,
+                 context_overhead_gb: float = 0.0):
+        self.models = models
+        self.vram_budget_gb = vram_budget_gb
+        self.context_overhead_gb = context_overhead_gb
+        self.refresh_interval = refresh_interval
+        self.pinned: List[str] = []
+        self.skipped: List[str] = []
+        self.resident: Dict[str, Dict[str, Any]] = {}
+        self.model_sizes_gb: Dict[str, float] = {}
+        self.last_refresh: Optional[str] = None
+        self.last_load_seconds: Dict[str, float] = {}
+        self.loads = 0
+        self.load_failures = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """백그라운드 웜업/갱신 작업 시작 (요청 처리 경로와 분리)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"모델 상주 갱신 실패: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def refresh(self):
+        """노드별 상주 상태 조회 → VRAM 예산 계획 → 고정 대상 모델 로드/keep_alive 갱신"""
+        await ollama_pool.check_all()
+        self.update_from_pool()
+        self.plan()
+        for node in ollama_pool.usable_nodes():
+            for model in self.pinned:
+                if node.has_model(model):
+                    await self.preload(model, node)
+        await ollama_pool.check_all()
+        self.update_from_pool()
+        self.last_refresh = datetime.now().isoformat()
+
+    def update_from_pool(self):
+        """노드 헬스체크 결과(/api/tags, /api/ps)로 모델 크기와 상주 노드 갱신
+
+        /api/tags는 파일 크기라 KV 캐시 여유분을 더해 추정하고, /api/ps의 실제 적재 크기가 있으면 그것을 사용
+        """
+        resident: Dict[str, Dict[str, Any]] = {}
+        for node in ollama_pool.usable_nodes():
+            for name, size in node.model_sizes.items():
+                if size:
+                    self.model_sizes_gb.setdefault(name, size / GB + self.context_overhead_gb)
+            for name, model in node.resident_models.items():
+                entry = resident.setdefault(name, {
+                    "size_vram_gb": round(model.get("size_vram", 0) / GB, 2),
+                    "expires_at": model.get("expires_at"),
+                    "nodes": []
+                })
+                entry["nodes"].append(node.base_url)
+                if model.get("size_vram"):
+                    # 실제 적재 크기가 있으면 추정치 대신 사용
+                    self.model_sizes_gb[name] = model["size_vram"] / GB
+        self.resident = resident
+
+    def plan(self):
+        """우선순위 순으로 노드당 VRAM 예산에 들어가는 모델 선택 (크기를 아직 모르는 모델은 제외)"""
+        used = 0.0
+        pinned, skipped = [], []
+        for model in self.models:
+            size = self.model_sizes_gb.get(model)
+            if size is not None and used + size <= self.vram_budget_gb:
+                pinned.append(model)
+                used += size
+            else:
+                skipped.append(model)
+        if skipped and skipped != self.skipped:
+            logger.warning(f"⚠️ VRAM 예산 {self.vram_budget_gb:.1f}GB 초과 또는 크기 미확인으로 상주 제외: {', '.join(skipped)}")
+        self.pinned, self.skipped = pinned, skipped
+
+    async def preload(self, model: str, node: OllamaNode) -> bool:
+        """빈 generate 요청으로 노드에 모델 로드 및 keep_alive 갱신 (이미 상주 중이면 즉시 반환)"""
+        started = time.monotonic()
+        cold = model not in node.resident_models
+        try:
+            response = await node.client.post(
+                "/api/generate",
+                json={"model": model, "keep_alive": OLLAMA_KEEP_ALIVE},
+                timeout=RESIDENCY_LOAD_TIMEOUT
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+        except Exception as e:
+            self.load_failures += 1
+            logger.warning(f"모델 사전 로드 실패 ({model} @ {node.base_url}): {e}")
+            return False
+
+        if cold:
+            elapsed = time.monotonic() - started
+            self.loads += 1
+            self.last_load_seconds[model] = round(elapsed, 2)
+            logger.info(f"🔥 모델 웜업 완료: {model} @ {node.base_url} ({elapsed:.1f}초)")
+        return True
+
+    def is_resident(self, model: str) -> bool:
+        return model in self.resident
+
+    def get_status(self) -> Dict[str, Any]:
+        """상주 상태 (헬스체크 / 모델 목록용)"""
+        return {
+            "vram_budget_gb": self.vram_budget_gb,
+            "model_sizes_gb": {m: round(self.model_sizes_gb[m], 2) for m in self.models if m in self.model_sizes_gb},
+            "pinned": self.pinned,
+            "skipped": self.skipped,
+            "resident": self.resident,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "last_refresh": self.last_refresh,
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+            "last_load_seconds": self.last_load_seconds
+        }
+
+# 전역 모델 상주 관리자 인스턴스
+residency_manager = ModelResidencyManager(
+    models=RESIDENCY_MODELS,
+    vram_budget_gb=RESIDENCY_VRAM_BUDGET_GB,
+    refresh_interval=RESIDENCY_REFRESH_INTERVAL,
+    context_overhead_gb=RESIDENCY_CONTEXT_OVERHEAD_GB
+)
@@ -0,0 +1,117 @@
+# Dec207Hub Backend Model Router
+# 질문 복잡도 + GPU 대기열/지연 기반 메인/보조 모델 선택 (부하 시 보조 모델 + 짧은 응답으로 강등)
+
+import re
+import time
+import logging
+from collections import Counter
+from typing import Dict, Any, List, Optional
+from config import (
+    DEFAULT_MODEL, FALLBACK_MODEL, OLLAMA_NUM_PREDICT, ENABLE_MODEL_ROUTER,
+    ROUTER_SIMPLE_MAX_TOKENS, ROUTER_SIMPLE_MAX_HISTORY, ROUTER_TOOL_KEYWORDS,
+    ROUTER_DEGRADE_QUEUE_DEPTH, ROUTER_DEGRADE_WAIT_SECONDS, ROUTER_RECOVER_QUEUE_DEPTH,
+    ROUTER_RECOVER_WAIT_SECONDS, ROUTER_MIN_DEGRADED_SECONDS, ROUTER_DEGRADED_NUM_PREDICT
+)
+from context_builder import estimate_tokens
+from scheduler import gpu_scheduler
+
+logger = logging.getLogger(__name__)
+
+class RouteDecision:
+    """요청 1건의 모델 선택 결과"""
+    __slots__ = ("model", "reason", "num_predict", "degraded")
+
+    def __init__(self, model: str, reason: str, num_predict: int, degraded: bool):
+        self.model = model
+        self.reason = reason
+        self.num_predict = num_predict
+        self.degraded = degraded
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "reason": self.reason,
+            "num_predict": self.num_predict,
+            "degraded": self.degraded
+        }
+
+class ModelRouter:
+    """요청별 모델 선택기
+
+    사유: requested(클라이언트가 다른 모델 지정), tools(툴 필요 추정 → 메인),
+    simple(짧은 단독 질문 → 보조), load(부하 모드 → 보조 + 짧은 응답), default(메인)
+    부하 모드는 진입/복귀 임계값을 따로 두고 최소 유지 시간을 둬서 모드가 요동치지 않게 함
+    """
+
+    def __init__(self, primary: str, secondary: str, tool_keywords: List[str]):
+        self.primary = primary
+        self.secondary = secondary
+        self.tool_pattern = re.compile("|".join(re.escape(k) for k in tool_keywords), re.IGNORECASE)
+        self.degraded = False
+        self.degraded_since = 0.0
+        self.transitions = 0
+        self.decisions: Counter = Counter()
+
+    def estimated_wait(self, model: str) -> float:
+        """대기열 길이 × 평균 처리 시간 / 동시 생성 수"""
+        return (gpu_scheduler.queue_depth(model) * gpu_scheduler.average_service_time(model)
+                / gpu_scheduler.concurrency(model))
+
+    def update_load_state(self) -> bool:
+        """메인 모델 대기열/예상 대기 시간으로 부하 모드 진입/복귀 판단"""
+        depth = gpu_scheduler.queue_depth(self.primary)
+        wait = self.estimated_wait(self.primary)
+        now = time.monotonic()
+        if not self.degraded:
+            if depth >= ROUTER_DEGRADE_QUEUE_DEPTH or wait >= ROUTER_DEGRADE_WAIT_SECONDS:
+                self.degraded = True
+                self.degraded_since = now
+                self.transitions += 1
+                logger.warning(f"⚠️ 부하 모드 진입 - 대기열 {depth}건, 예상 대기 {wait:.1f}초 → {self.secondary} 우선")
+        elif (now - self.degraded_since >= ROUTER_MIN_DEGRADED_SECONDS
+              and depth <= ROUTER_RECOVER_QUEUE_DEPTH and wait <= ROUTER_RECOVER_WAIT_SECONDS):
+            self.degraded = False
+            self.transitions += 1
+            logger.info(f"✅ 부하 모드 해제 - 대기열 {depth}건, 예상 대기 {wait:.1f}초")
+        return self.degraded
+
+    def needs_tools(self, message: str) -> bool:
+        return bool(self.tool_pattern.search(message))
+
+    def route(self, message: str, conversation_history: Optional[List[Dict]] = None,
+              requested_model: Optional[str] = None) -> RouteDecision:
+        """질문/히스토리/현재 부하로 모델과 응답 길이 선택"""
+        degraded = self.update_load_state()
+        if requested_model and requested_model != self.primary:
+            decision = RouteDecision(requested_model, "requested", OLLAMA_NUM_PREDICT, degraded)
+        elif not ENABLE_MODEL_ROUTER:
+            decision = RouteDecision(self.primary, "default", OLLAMA_NUM_PREDICT, degraded)
+        elif self.needs_tools(message):
+            decision = RouteDecision(self.primary, "tools", OLLAMA_NUM_PREDICT, degraded)
+        elif degraded and self.estimated_wait(self.secondary) < self.estimated_wait(self.primary):
+            decision = RouteDecision(self.secondary, "load", ROUTER_DEGRADED_NUM_PREDICT, degraded)
+        elif (estimate_tokens(message) <= ROUTER_SIMPLE_MAX_TOKENS
+              and len(conversation_history or []) <= ROUTER_SIMPLE_MAX_HISTORY):
+            decision = RouteDecision(self.secondary, "simple", OLLAMA_NUM_PREDICT, degraded)
+        else:
+            decision = RouteDecision(self.primary, "default", OLLAMA_NUM_PREDICT, degraded)
+
+        self.decisions[f"{decision.model}:{decision.reason}"] += 1
+        logger.info(f"🧭 모델 라우팅: {decision.model} (사유: {decision.reason}, num_predict {decision.num_predict})")
+        return decision
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": ENABLE_MODEL_ROUTER,
+            "degraded": self.degraded,
+            "transitions": self.transitions,
+            "primary_estimated_wait": round(self.estimated_wait(self.primary), 2),
+            "decisions": dict(self.decisions)
+        }
+
+# 전역 모델 라우터 인스턴스
+model_router = ModelRouter(
+    primary=DEFAULT_MODEL,
+    secondary=FALLBACK_MODEL,
+    tool_keywords=ROUTER_TOOL_KEYWORDS
+)
@@ -15,6 +15,8 @@ class ChatRequest(BaseModel):
     """채팅 요청 모델"""
     message: str
     model: Optional[str] = None
+    session_id: Optional[str] = None  # 서버 측 세션 사용 시 히스토리 생략 가능 (클라이언트가 정한 ID도 가능, 없으면 세션 미생성)
+    idempotency_key: Optional[str] = None  # Idempotency-Key 헤더 대신 사용 가능
     conversation_history: Optional[List[ChatMessage]] = []
 
 class ChatResponse(BaseModel):
@@ -24,12 +26,18 @@ class ChatResponse(BaseModel):
     model: str
     response_time: float
     timestamp: str
+    session_id: Optional[str] = None
+    route: Optional[Dict[str, Any]] = None  # 모델 라우터 선택 결과 (model, reason, num_predict, degraded)
+    idempotency: Optional[str] = None  # 멱등성 키 사용 시 new | joined | replayed
 
 class WebSocketMessage(BaseModel):
     """WebSocket 메시지 모델"""
-    type: str  # 'chat', 'system', 'error'
+    type: str  # 'chat', 'cancel', 'system', 'error'
     message: str
     model: Optional[str] = None
+    session_id: Optional[str] = None
+    request_id: Optional[str] = None  # 클라이언트 요청 ID (응답 프레임에 그대로 태그, cancel 대상 지정)
+    idempotency_key: Optional[str] = None  # 재연결 후 재전송 시 같은 키 → 원래 결과 재사용
     conversation_history: Optional[List[Dict[str, Any]]] = []
     timestamp: Optional[str] = None
 
@@ -39,9 +47,49 @@ class HealthResponse(BaseModel):
     ollama: str
     timestamp: str
     active_connections: int
+    cache: Optional[Dict[str, Any]] = None
+    semantic_cache: Optional[Dict[str, Any]] = None
+    coalescer: Optional[Dict[str, Any]] = None
+    scheduler: Optional[Dict[str, Any]] = None
+    hedging: Optional[Dict[str, Any]] = None
+    circuits: Optional[Dict[str, Any]] = None
+    sessions: Optional[Dict[str, Any]] = None
+    prompt_eval: Optional[Dict[str, Any]] = None
+    residency: Optional[Dict[str, Any]] = None
+    summarizer: Optional[Dict[str, Any]] = None
+    response_filter: Optional[Dict[str, Any]] = None
+    batch: Optional[Dict[str, Any]] = None
+    pool: Optional[Dict[str, Any]] = None
+    router: Optional[Dict[str, Any]] = None
+    cancellations: Optional[Dict[str, Any]] = None
+    pipeline: Optional[Dict[str, Any]] = None
+    idempotency: Optional[Dict[str, Any]] = None
+    chat_log: Optional[Dict[str, Any]] = None
+    chat_search: Optional[Dict[str, Any]] = None
 
 class ModelsResponse(BaseModel):
     """모델 목록 응답 모델"""
     models: List[str]
     default: str
+    resident: Optional[List[str]] = None  # 현재 메모리에 올라간 모델
     error: Optional[str] = None
+
+class ChatLogSearchResult(BaseModel):
+    """채팅 로그 검색 결과 1건"""
+    id: int
+    ts: str
+    ip: str
+    role: str  # 'user', 'assistant', 'system'
+    model: Optional[str] = None
+    response_time: Optional[float] = None
+    content: str
+    snippet: Optional[str] = None  # 검색어 주변 발췌 ([ ]로 강조, 3자 이상 검색어가 있을 때)
+
+class ChatLogSearchResponse(BaseModel):
+    """채팅 로그 검색 응답 모델"""
+    total: int
+    page: int
+    page_size: int
+    pages: int
+    took_ms: float
+    results: List[ChatLogSearchResult]
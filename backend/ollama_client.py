@@ -0,0 +1,59 @@
+# Dec207Hub Backend Ollama HTTP Client
+# Ollama 서버별 공유 커넥션 풀 (keep-alive 재사용)
+
+import logging
+from typing import Dict
+import httpx
+from config import (
+    OLLAMA_BASE_URL, OLLAMA_ENDPOINTS, HTTP_TIMEOUT, OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_MAX_CONNECTIONS, OLLAMA_MAX_KEEPALIVE, OLLAMA_KEEPALIVE_EXPIRY
+)
+
+logger = logging.getLogger(__name__)
+
+class OllamaClientRegistry:
+    """Ollama base URL별 장수명 httpx.AsyncClient 관리 클래스"""
+    
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+    
+    def _create_client(self, base_url: str) -> httpx.AsyncClient:
+        """커넥션 풀 설정이 적용된 클라이언트 생성"""
+        limits = httpx.Limits(
+            max_connections=OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_MAX_KEEPALIVE,
+            keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY
+        )
+        timeout = httpx.Timeout(HTTP_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT)
+        logger.info(f"🔌 Ollama 클라이언트 생성: {base_url} (최대 연결 {OLLAMA_MAX_CONNECTIONS})")
+        return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout)
+    
+    def get(self, base_url: str = OLLAMA_BASE_URL) -> httpx.AsyncClient:
+        """공유 클라이언트 반환 (없거나 닫혔으면 생성)"""
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = self._create_client(base_url)
+            self._clients[base_url] = client
+        return client
+    
+    async def startup(self):
+        """설정된 모든 Ollama 노드 클라이언트 미리 생성"""
+        for base_url in OLLAMA_ENDPOINTS:
+            self.get(base_url)
+    
+    async def close(self):
+        """모든 클라이언트 종료"""
+        for base_url, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+                logger.info(f"🔌 Ollama 클라이언트 종료: {base_url}")
+            except Exception as e:
+                logger.error(f"Ollama 클라이언트 종료 실패 ({base_url}): {e}")
+        self._clients.clear()
+
+# 전역 클라이언트 레지스트리 인스턴스
+ollama_clients = OllamaClientRegistry()
+
+def get_ollama_client(base_url: str = OLLAMA_BASE_URL) -> httpx.AsyncClient:
+    """공유 Ollama 클라이언트 반환 (외부 사용용)"""
+    return ollama_clients.get(base_url)
@@ -0,0 +1,242 @@
+# Dec207Hub Backend Ollama Pool
+# 여러 Ollama 노드 헬스체크 + 최소 진행 요청 수 / 모델 상주 우선 라우팅 + 장애 노드 자동 제외/복귀
+
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Set, Iterable
+import httpx
+from config import (
+    OLLAMA_ENDPOINTS, POOL_HEALTH_INTERVAL, POOL_EJECT_FAILURES, POOL_EJECT_SECONDS,
+    POOL_AFFINITY_WEIGHT, HEALTH_CHECK_TIMEOUT
+)
+from ollama_client import get_ollama_client
+from circuit_breaker import circuit_breakers, health_monitor, CircuitOpenError
+from scheduler import gpu_scheduler
+
+logger = logging.getLogger(__name__)
+
+class OllamaPoolUnavailable(Exception):
+    """사용 가능한 Ollama 노드가 없음"""
+
+class OllamaNode:
+    """Ollama 노드 1대의 상태"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.outstanding = 0
+        self.healthy = True  # 첫 헬스체크 전에는 사용 가능으로 간주
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.available_models: Optional[Set[str]] = None  # /api/tags (모르면 None)
+        self.resident_models: Dict[str, Dict[str, Any]] = {}  # /api/ps
+        self.model_sizes: Dict[str, int] = {}
+        self.requests = 0
+        self.failures = 0
+        self.last_check: Optional[float] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return get_ollama_client(self.base_url)
+
+    def usable(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def has_model(self, model: str) -> bool:
+        """태그 없는 이름은 :latest로 간주 (Ollama 기본 태그)"""
+        if self.available_models is None:
+            return True
+        return model in self.available_models or f"{model}:latest" in self.available_models
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "ejected": time.monotonic() < self.ejected_until,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "models": sorted(self.available_models) if self.available_models is not None else None,
+            "resident": sorted(self.resident_models)
+        }
+
+class OllamaPool:
+    """Ollama 노드 풀 - 요청별로 노드를 골라 주고 헬스체크로 제외/복귀 관리"""
+
+    def __init__(self, endpoints: List[str], health_interval: float, eject_failures: int,
+                 eject_seconds: float, affinity_weight: float):
+        self.nodes = [OllamaNode(url) for url in endpoints]
+        self.health_interval = health_interval
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.affinity_weight = affinity_weight
+        self._task: Optional[asyncio.Task] = None
+        self.ejections = 0
+        self.ejections_skipped = 0
+
+    def node(self, base_url: str) -> Optional[OllamaNode]:
+        for node in self.nodes:
+            if node.base_url == base_url:
+                return node
+        return None
+
+    def usable_nodes(self) -> List[OllamaNode]:
+        now = time.monotonic()
+        return [node for node in self.nodes if node.usable(now)]
+
+    def select(self, model: str, exclude: Iterable[OllamaNode] = ()) -> OllamaNode:
+        """노드 선택 - 진행 중 요청 수가 적고 모델이 이미 올라간 노드 우선
+
+        점수 = 진행 중 요청 수 + (모델 미상주 시 POOL_AFFINITY_WEIGHT), 모델이 없는 노드는 제외.
+        후보가 모두 서킷 open이면 CircuitOpenError, 후보가 없으면 OllamaPoolUnavailable
+        """
+        excluded = set(id(node) for node in exclude)
+        candidates = [node for node in self.usable_nodes()
+                      if id(node) not in excluded and node.has_model(model)]
+        if not candidates:
+            raise OllamaPoolUnavailable(f"{model} 모델을 처리할 수 있는 Ollama 노드가 없습니다")
+
+        allowed = [node for node in candidates if not circuit_breakers.is_open(model, node.base_url)]
+        if not allowed:
+            raise CircuitOpenError(f"{model} 서킷 open - 모든 노드에서 즉시 거절")
+
+        def score(node: OllamaNode) -> tuple:
+            affinity = 0.0 if model in node.resident_models else self.affinity_weight
+            return (node.outstanding + affinity, node.requests)
+        return min(allowed, key=score)
+
+    @asynccontextmanager
+    async def track(self, node: OllamaNode):
+        """노드 진행 중 요청 수 추적 - 연결 수준 오류는 노드 장애로 집계"""
+        node.outstanding += 1
+        node.requests += 1
+        try:
+            yield node
+        except httpx.TransportError as e:
+            self.record_failure(node, str(e) or type(e).__name__)
+            raise
+        else:
+            node.consecutive_failures = 0
+        finally:
+            node.outstanding -= 1
+
+    def record_failure(self, node: OllamaNode, reason: str):
+        """연속 실패가 임계값에 도달하면 노드 제외 (이후 헬스체크 통과 시 복귀)
+
+        마지막으로 남은 사용 가능 노드는 제외하지 않음 - 제외하면 백업 모델까지 모든 요청이
+        실패하므로, 이 경우 빠른 실패는 노드/모델별 서킷 브레이커에 맡김
+        """
+        node.failures += 1
+        node.consecutive_failures += 1
+        if node.consecutive_failures >= self.eject_failures and node.healthy:
+            now = time.monotonic()
+            if not any(other.usable(now) for other in self.nodes if other is not node):
+                if node.consecutive_failures == self.eject_failures:
+                    self.ejections_skipped += 1
+                    logger.warning(f"⚠️ 마지막 Ollama 노드라 제외하지 않음: {node.base_url} ({reason})")
+                return
+            node.healthy = False
+            node.ejected_until = now + self.eject_seconds
+            self.ejections += 1
+            logger.warning(f"🚫 Ollama 노드 제외: {node.base_url} ({reason})")
+            self._update_capacity()
+
+    async def check_node(self, node: OllamaNode) -> bool:
+        """노드 헬스체크 - 보유 모델(/api/tags)과 상주 모델(/api/ps) 갱신"""
+        node.last_check = time.monotonic()
+        try:
+            tags = await node.client.get("/api/tags", timeout=HEALTH_CHECK_TIMEOUT)
+            if tags.status_code != 200:
+                raise RuntimeError(f"HTTP {tags.status_code}")
+            models = tags.json().get("models", [])
+            node.available_models = {m["name"] for m in models}
+            node.model_sizes = {m["name"]: m.get("size", 0) for m in models}
+
+            ps = await node.client.get("/api/ps", timeout=HEALTH_CHECK_TIMEOUT)
+            if ps.status_code == 200:
+                node.resident_models = {
+                    (m.get("name") or m.get("model")): m for m in ps.json().get("models", [])
+                }
+        except Exception as e:
+            health_monitor.record(node.base_url, f"error: {str(e) or type(e).__name__}")
+            self.record_failure(node, f"헬스체크 실패: {e}")
+            return False
+
+        health_monitor.record(node.base_url, "connected")
+        node.consecutive_failures = 0
+        if not node.healthy and time.monotonic() >= node.ejected_until:
+            node.healthy = True
+            logger.info(f"✅ Ollama 노드 복귀: {node.base_url}")
+            self._update_capacity()
+        return True
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check_node(node) for node in self.nodes))
+
+    def _update_capacity(self):
+        """정상 노드 수만큼 모델별 동시 생성 슬롯 확장"""
+        gpu_scheduler.set_node_count(sum(1 for node in self.nodes if node.healthy))
+
+    async def start(self):
+        if self._task is None:
+            self._update_capacity()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check_all()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Ollama 노드 헬스체크 오류: {e}")
+            await asyncio.sleep(self.health_interval)
+
+    def list_models(self) -> List[str]:
+        """정상 노드들이 가진 모델 목록 (합집합, 처음 발견된 순서)"""
+        models: List[str] = []
+        for node in self.usable_nodes():
+            for name in node.model_sizes:
+                if name not in models:
+                    models.append(name)
+        return models
+
+    def resident_models(self) -> Set[str]:
+        return {name for node in self.usable_nodes() for name in node.resident_models}
+
+    def status(self, model: str) -> str:
+        """헬스체크 응답용 요약 상태"""
+        usable = self.usable_nodes()
+        if not usable:
+            return "disconnected"
+        if all(circuit_breakers.is_open(model, node.base_url) for node in usable):
+            return "circuit_open"
+        if len(usable) < len(self.nodes):
+            return f"degraded ({len(usable)}/{len(self.nodes)})"
+        return "connected"
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "ejections": self.ejections,
+            "ejections_skipped": self.ejections_skipped,
+            "nodes": {node.base_url: node.get_stats() for node in self.nodes}
+        }
+
+# 전역 Ollama 노드 풀 인스턴스
+ollama_pool = OllamaPool(
+    endpoints=OLLAMA_ENDPOINTS,
+    health_interval=POOL_HEALTH_INTERVAL,
+    eject_failures=POOL_EJECT_FAILURES,
+    eject_seconds=POOL_EJECT_SECONDS,
+    affinity_weight=POOL_AFFINITY_WEIGHT
+)
@@ -0,0 +1,55 @@
+# Dec207Hub Backend Prompt Eval Metrics
+# 턴별 prompt_eval_count / prompt_eval_duration 기록 (KV 캐시 prefix 재사용 효과 확인용)
+
+import logging
+from collections import deque, defaultdict
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+class PromptEvalStats:
+    """모델별 프롬프트 평가 토큰 수/시간 통계
+
+    Ollama는 KV 캐시로 재사용한 prefix를 prompt_eval_count에서 제외하므로,
+    대화가 길어져도 이 값이 작게 유지되면 prefix 캐시가 동작하는 것
+    """
+
+    def __init__(self, window: int = 200):
+        self._recent: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self.turns = 0
+
+    def record(self, model: str, data: Dict[str, Any], prompt_tokens: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Ollama 최종 응답(done)의 평가 지표 기록 - 턴 지표 반환 (지표가 없으면 None)"""
+        count = data.get("prompt_eval_count")
+        duration_ns = data.get("prompt_eval_duration")
+        if count is None and duration_ns is None:
+            return None
+
+        turn = {
+            "prompt_eval_count": count or 0,
+            "prompt_eval_ms": round((duration_ns or 0) / 1e6, 2),
+            "estimated_prompt_tokens": prompt_tokens
+        }
+        if prompt_tokens:
+            # 추정 프롬프트 크기 대비 실제 평가한 토큰 비율이 낮을수록 캐시 재사용이 많음
+            turn["reused_ratio"] = round(max(0.0, 1.0 - (count or 0) / prompt_tokens), 3)
+        self._recent[model].append(turn)
+        self.turns += 1
+        logger.info(f"📏 프롬프트 평가 ({model}): {turn['prompt_eval_count']} 토큰, {turn['prompt_eval_ms']}ms")
+        return turn
+
+    def get_stats(self) -> Dict[str, Any]:
+        models = {}
+        for model, turns in self._recent.items():
+            if not turns:
+                continue
+            models[model] = {
+                "turns": len(turns),
+                "avg_prompt_eval_count": round(sum(t["prompt_eval_count"] for t in turns) / len(turns), 1),
+                "avg_prompt_eval_ms": round(sum(t["prompt_eval_ms"] for t in turns) / len(turns), 2),
+                "last": turns[-1]
+            }
+        return {"turns": self.turns, "models": models}
+
+# 전역 프롬프트 평가 통계 인스턴스
+prompt_eval_stats = PromptEvalStats()
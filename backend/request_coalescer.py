@@ -0,0 +1,168 @@
+# Dec207Hub Backend Request Coalescer
+# 동일한 (모델, 프롬프트, 옵션) 요청을 하나의 진행 중 생성으로 합치는 single-flight 처리
+
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, AsyncIterator, Callable, Tuple
+from scheduler import gpu_scheduler, LANE_RANK, PRIORITY_BATCH, QueueUpdateCallback
+
+logger = logging.getLogger(__name__)
+
+def make_coalesce_key(cache_key: str, stream: bool) -> str:
+    """합치기 키 - 응답 캐시 키 + 스트리밍 여부 (단건 생성에는 delta 이벤트가 없어 스트리밍 요청과 합치지 않음)"""
+    return f"{cache_key}:{'stream' if stream else 'unary'}"
+
+class InFlightGeneration:
+    """진행 중인 생성 1건 - 이벤트를 기록하고 모든 구독자에게 재생
+
+    생성은 한 번만 스케줄러 슬롯을 받으므로, 슬롯 우선순위는 구독자 중 가장 높은 것을 쓰고
+    대기열 순번 알림은 모든 구독자에게 전달
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self.on_cancel: Optional[Callable[[], None]] = None
+        self._cond = asyncio.Condition()
+        # 구독자별 (우선순위, 대기열 알림 콜백)
+        self._listeners: Dict[int, Tuple[str, Optional[QueueUpdateCallback]]] = {}
+        self._next_listener = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._listeners)
+
+    @property
+    def priority(self) -> str:
+        """구독자 중 가장 높은 우선순위 (공유 슬롯의 레인)"""
+        if not self._listeners:
+            return PRIORITY_BATCH
+        return min((priority for priority, _ in self._listeners.values()),
+                   key=lambda priority: LANE_RANK.get(priority, LANE_RANK[PRIORITY_BATCH]))
+
+    async def notify_queue(self, position: int, eta: float):
+        """스케줄러 대기 순번을 모든 구독자에게 전달"""
+        callbacks = [callback for _, callback in self._listeners.values() if callback is not None]
+        await asyncio.gather(*(callback(position, eta) for callback in callbacks),
+                             return_exceptions=True)
+
+    def _attach(self, priority: str, on_queue_update: Optional[QueueUpdateCallback]) -> int:
+        listener = self._next_listener
+        self._next_listener += 1
+        self._listeners[listener] = (priority, on_queue_update)
+        if not self.done:
+            # 슬롯 대기 중이면 레인 상향 + 새 구독자에게 현재 순번 전달
+            gpu_scheduler.promote(self.key, self.priority)
+        return listener
+
+    async def _produce(self, source: AsyncIterator[Dict[str, Any]]):
+        """원본 이벤트 스트림을 소비하며 구독자에게 알림"""
+        try:
+            async for event in source:
+                self.events.append(event)
+                async with self._cond:
+                    self._cond.notify_all()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            # 취소 시 원본 제너레이터를 바로 닫아 GPU 슬롯/업스트림 연결 반납
+            await source.aclose()
+            self.done = True
+            async with self._cond:
+                self._cond.notify_all()
+
+    async def subscribe(self, priority: str = PRIORITY_BATCH,
+                        on_queue_update: Optional[QueueUpdateCallback] = None) -> AsyncIterator[Dict[str, Any]]:
+        """처음부터 이벤트를 재생하고 완료까지 따라감"""
+        listener = self._attach(priority, on_queue_update)
+        index = 0
+        try:
+            while True:
+                while index < len(self.events):
+                    yield self.events[index]
+                    index += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                async with self._cond:
+                    await self._cond.wait_for(lambda: len(self.events) > index or self.done)
+        finally:
+            del self._listeners[listener]
+            # 마지막 구독자가 떠나면 아무도 받지 않을 생성을 중단
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                logger.info(f"모든 구독자 이탈 - 생성 중단: {self.key[:12]}")
+                self.cancelled = True
+                self.task.cancel()
+                if self.on_cancel is not None:
+                    self.on_cancel()
+
+EventSourceFactory = Callable[[InFlightGeneration], AsyncIterator[Dict[str, Any]]]
+
+class RequestCoalescer:
+    """키별 진행 중 생성 레지스트리"""
+
+    def __init__(self):
+        self._inflight: Dict[str, InFlightGeneration] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    def _get_or_start(self, key: str, factory: EventSourceFactory) -> InFlightGeneration:
+        generation = self._inflight.get(key)
+        if generation is not None and not generation.done and not generation.cancelled:
+            self.coalesced += 1
+            logger.info(f"진행 중인 동일 요청에 합류: {key[:12]} (구독자 {generation.subscribers + 1})")
+            return generation
+
+        generation = InFlightGeneration(key)
+        generation.on_cancel = self._record_cancel
+        generation.task = asyncio.create_task(generation._produce(factory(generation)))
+        generation.task.add_done_callback(lambda _: self._release(generation))
+        self._inflight[key] = generation
+        self.started += 1
+        return generation
+
+    def _record_cancel(self):
+        self.cancelled += 1
+
+    def _release(self, generation: InFlightGeneration):
+        if self._inflight.get(generation.key) is generation:
+            del self._inflight[generation.key]
+
+    def stream(self, key: str, factory: EventSourceFactory, priority: str = PRIORITY_BATCH,
+               on_queue_update: Optional[QueueUpdateCallback] = None) -> AsyncIterator[Dict[str, Any]]:
+        """동일 키 요청을 합쳐 이벤트 스트림 구독
+
+        factory는 공유 생성(InFlightGeneration)을 받아 그 priority/notify_queue로 슬롯을 잡아야 함
+        """
+        return self._get_or_start(key, factory).subscribe(priority, on_queue_update)
+
+    async def run(self, key: str, factory: EventSourceFactory, priority: str = PRIORITY_BATCH,
+                  on_queue_update: Optional[QueueUpdateCallback] = None) -> Dict[str, Any]:
+        """동일 키 요청을 합쳐 최종 done 이벤트만 반환"""
+        result: Dict[str, Any] = {}
+        async for event in self.stream(key, factory, priority, on_queue_update):
+            if event.get("type") == "done":
+                result = event
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """합치기 통계"""
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+            "subscribers": sum(g.subscribers for g in self._inflight.values())
+        }
+
+# 전역 요청 합치기 인스턴스
+request_coalescer = RequestCoalescer()
@@ -0,0 +1,197 @@
+# Dec207Hub Backend Response Cache
+# 동일 (모델, 프롬프트, 옵션) 요청에 대한 LRU + TTL 응답 캐시 (선택적 디스크 계층)
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from config import (
+    ENABLE_MODEL_CACHE, CACHE_SIZE_MB, CACHE_TTL_SECONDS,
+    ENABLE_DISK_CACHE, CACHE_DISK_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+def normalize_prompt(prompt: str) -> str:
+    """캐시 키용 프롬프트 정규화 (앞뒤 공백 제거, 연속 공백 축소)"""
+    return " ".join(prompt.split())
+
+def make_cache_key(model: str, prompt: str, options: Dict[str, Any]) -> str:
+    """모델 + 정규화된 프롬프트 + 옵션으로 캐시 키 생성"""
+    raw = json.dumps(
+        {"model": model, "prompt": normalize_prompt(prompt), "options": options or {}},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class CacheEntry:
+    """캐시 항목"""
+    __slots__ = ("value", "expires_at", "size")
+
+    def __init__(self, value: str, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+class DiskCacheTier:
+    """SQLite 기반 영구 캐시 계층 (재시작 후에도 유지)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[tuple]:
+        """(값, 만료시각) 반환 - 만료된 항목은 삭제"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[1] < time.time():
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return row
+
+    def set(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """만료 항목 일괄 삭제"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ResponseCache:
+    """메모리 LRU 캐시 (용량/TTL 기반 제거) + 선택적 디스크 계층"""
+
+    def __init__(self, max_bytes: int, ttl: float, disk_path: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._disk = DiskCacheTier(disk_path) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        """캐시 조회 (메모리 → 디스크 순)"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at >= time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            self._remove(key)
+
+        if self._disk:
+            try:
+                row = await asyncio.to_thread(self._disk.get, key)
+            except Exception as e:
+                logger.error(f"디스크 캐시 조회 실패: {e}")
+                row = None
+            if row:
+                # 메모리 계층으로 승격
+                self._store(key, row[0], row[1])
+                self.hits += 1
+                self.disk_hits += 1
+                return row[0]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        """캐시 저장"""
+        expires_at = time.time() + self.ttl
+        self._store(key, value, expires_at)
+
+        if self._disk:
+            try:
+                await asyncio.to_thread(self._disk.set, key, value, expires_at)
+            except Exception as e:
+                logger.error(f"디스크 캐시 저장 실패: {e}")
+
+    def _store(self, key: str, value: str, expires_at: float):
+        size = len(key) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = CacheEntry(value, expires_at, size)
+        self._bytes += size
+
+        # 용량 초과 시 가장 오래 사용되지 않은 항목부터 제거
+        while self._bytes > self.max_bytes and self._entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def clear(self):
+        """메모리 계층 초기화"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def close(self):
+        """디스크 계층 종료"""
+        if self._disk:
+            self._disk.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """캐시 통계"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "entries": len(self._entries),
+            "size_bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "disk_tier": self._disk is not None
+        }
+
+# 전역 응답 캐시 인스턴스 (비활성화 시 None)
+response_cache = ResponseCache(
+    max_bytes=CACHE_SIZE_MB * 1024 * 1024,
+    ttl=CACHE_TTL_SECONDS,
+    disk_path=CACHE_DISK_PATH if ENABLE_DISK_CACHE else None
+) if ENABLE_MODEL_CACHE else None
+
+def get_cache_stats() -> Dict[str, Any]:
+    """응답 캐시 통계 반환 (외부 사용용)"""
+    if response_cache is None:
+        return {"enabled": False}
+    return response_cache.get_stats()
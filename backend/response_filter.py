@@ -0,0 +1,189 @@
+# Dec207Hub Backend Response Filter
+# 할루시네이션 패턴을 하나의 정규식으로 미리 컴파일하고 스트리밍 청크를 증분 검사 (규칙 파일 핫 리로드)
+
+import os
+import re
+import json
+import time
+import logging
+from collections import Counter
+from typing import Dict, Any, List, Optional
+from config import FILTER_RULES_PATH, FILTER_RELOAD_CHECK_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+class FilterRule:
+    """필터 규칙 1개"""
+    __slots__ = ("rule_id", "pattern", "label")
+
+    def __init__(self, rule_id: str, pattern: str, label: str):
+        self.rule_id = rule_id
+        self.pattern = pattern
+        self.label = label
+
+class CompiledRuleSet:
+    """모든 규칙을 하나의 비캡처 alternation으로 컴파일한 규칙 집합
+
+    이름 있는 그룹으로 묶으면 re의 첫 글자 집합 최적화가 꺼져 규칙별 검색보다 느려지므로,
+    결합 정규식으로는 규칙에 걸리는 줄인지만 판별하고 걸린 줄에서만 규칙별 정규식을 실행.
+    결합 정규식의 finditer는 겹치지 않는 가장 왼쪽 매치만 돌려주므로(예: ".*" 규칙이 같은 줄의
+    다른 규칙 매치를 삼킴) 어떤 규칙인지 판별하는 데 쓰지 않음
+    """
+
+    def __init__(self, rules: List[FilterRule], version: int):
+        self.rules = rules
+        self.version = version
+        self._rule_regexes = [re.compile(rule.pattern, re.IGNORECASE) for rule in rules]
+        if rules:
+            combined = "|".join(f"(?:{rule.pattern})" for rule in rules)
+            self.regex: Optional[re.Pattern] = re.compile(combined, re.IGNORECASE)
+        else:
+            self.regex = None
+
+    def scan_line(self, line: str, fired: Dict[str, FilterRule]):
+        """한 줄 검사 - 걸린 모든 규칙 기록 (모든 규칙이 이미 발견됐으면 건너뜀)"""
+        if self.regex is None or len(fired) == len(self.rules) or not self.regex.search(line):
+            return
+        for rule, rule_regex in zip(self.rules, self._rule_regexes):
+            if rule.rule_id not in fired and rule_regex.search(line):
+                fired[rule.rule_id] = rule
+
+class StreamScanner:
+    """스트리밍 청크 증분 검사기 - 완성된 줄만 한 번씩 검사하고 이전 텍스트는 다시 보지 않음
+
+    규칙은 줄 단위로 매칭되며 줄바꿈을 넘는 매치는 찾지 않음 ("."는 원래 줄바꿈과 맞지 않지만
+    "\\s*"처럼 줄바꿈과도 맞는 패턴은 전체 텍스트 검사보다 적게 찾을 수 있음)
+    """
+
+    def __init__(self, ruleset: CompiledRuleSet, engine: "ResponseFilterEngine"):
+        self.ruleset = ruleset
+        self.engine = engine
+        self.fired: Dict[str, FilterRule] = {}
+        self._partial = ""
+        self._elapsed = 0.0
+
+    def feed(self, chunk: str):
+        started = time.perf_counter()
+        text = self._partial + chunk
+        newline = text.rfind("\n")
+        if newline >= 0:
+            for line in text[:newline].split("\n"):
+                self.ruleset.scan_line(line, self.fired)
+            self._partial = text[newline + 1:]
+        else:
+            self._partial = text
+        self._elapsed += time.perf_counter() - started
+
+    def finish(self) -> List[FilterRule]:
+        """남은 줄 검사 후 발견된 규칙 반환"""
+        started = time.perf_counter()
+        if self._partial:
+            self.ruleset.scan_line(self._partial, self.fired)
+            self._partial = ""
+        self._elapsed += time.perf_counter() - started
+        findings = list(self.fired.values())
+        self.engine.record(findings, self._elapsed)
+        return findings
+
+class ResponseFilterEngine:
+    """규칙 파일을 로드/감시하며 검사기를 만들어 주는 엔진"""
+
+    def __init__(self, rules_path: str, reload_check_interval: float):
+        self.rules_path = rules_path
+        self.reload_check_interval = reload_check_interval
+        self._mtime: Optional[float] = None
+        self._last_check = 0.0
+        self.ruleset = CompiledRuleSet([], version=0)
+        self.reloads = 0
+        self.reload_errors = 0
+        self.scans = 0
+        self.scan_seconds = 0.0
+        self.rule_hits: Counter = Counter()
+        self.maybe_reload(force=True)
+
+    def maybe_reload(self, force: bool = False) -> bool:
+        """규칙 파일이 바뀌었으면 다시 컴파일 (확인은 reload_check_interval마다)"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.reload_check_interval:
+            return False
+        self._last_check = now
+        try:
+            mtime = os.path.getmtime(self.rules_path)
+        except OSError:
+            if self._mtime is not None or force:
+                logger.warning(f"필터 규칙 파일 없음: {self.rules_path}")
+            self._mtime = None
+            return False
+        if not force and mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        return self.reload()
+
+    def reload(self) -> bool:
+        """규칙 파일 로드 - 파일 전체가 잘못됐으면 기존 규칙 유지, 잘못된 규칙만 건너뜀"""
+        try:
+            with open(self.rules_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            self.reload_errors += 1
+            logger.error(f"필터 규칙 파일 로드 실패 (기존 규칙 유지): {e}")
+            return False
+
+        rules = []
+        for index, item in enumerate(data.get("rules", [])):
+            if not item.get("enabled", True):
+                continue
+            rule_id = item.get("id") or f"rule_{index}"
+            pattern = item.get("pattern", "")
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                self.reload_errors += 1
+                logger.error(f"잘못된 필터 규칙 건너뜀 ({rule_id}): {e}")
+                continue
+            rules.append(FilterRule(rule_id, pattern, item.get("label", rule_id)))
+
+        self.ruleset = CompiledRuleSet(rules, version=self.ruleset.version + 1)
+        self.reloads += 1
+        logger.info(f"🧰 필터 규칙 {len(rules)}개 로드 (v{self.ruleset.version})")
+        return True
+
+    def scanner(self) -> StreamScanner:
+        """새 응답용 증분 검사기 (생성 시점의 규칙 집합 고정)"""
+        self.maybe_reload()
+        return StreamScanner(self.ruleset, self)
+
+    def scan(self, text: str) -> List[FilterRule]:
+        """전체 텍스트 한 번에 검사"""
+        scanner = self.scanner()
+        scanner.feed(text)
+        return scanner.finish()
+
+    def record(self, findings: List[FilterRule], elapsed: float):
+        self.scans += 1
+        self.scan_seconds += elapsed
+        for rule in findings:
+            self.rule_hits[rule.rule_id] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "rules": len(self.ruleset.rules),
+            "version": self.ruleset.version,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "scans": self.scans,
+            "average_scan_ms": round(self.scan_seconds / self.scans * 1000, 3) if self.scans else 0.0,
+            "rule_hits": dict(self.rule_hits)
+        }
+
+def resolve_rules_path(path: str) -> str:
+    """상대 경로는 backend 디렉토리 기준"""
+    if os.path.isabs(path):
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+
+# 전역 응답 필터 엔진 인스턴스
+response_filter = ResponseFilterEngine(
+    rules_path=resolve_rules_path(FILTER_RULES_PATH),
+    reload_check_interval=FILTER_RELOAD_CHECK_INTERVAL
+)
@@ -0,0 +1,288 @@
+# Dec207Hub Backend GPU Scheduler
+# 모델별 동시 생성 제한 + 우선순위 레인 + 클라이언트 IP별 가중 공정 큐잉
+
+import time
+import math
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from config import (
+    SCHEDULER_MODEL_CONCURRENCY, SCHEDULER_DEFAULT_CONCURRENCY, SCHEDULER_MAX_QUEUE,
+    SCHEDULER_MAX_BATCH_QUEUE, SCHEDULER_CLIENT_WEIGHTS, SCHEDULER_INITIAL_SERVICE_TIME
+)
+
+logger = logging.getLogger(__name__)
+
+# 우선순위 레인 (숫자가 작을수록 먼저 처리)
+PRIORITY_INTERACTIVE = "interactive"   # WebSocket 대화
+PRIORITY_BATCH = "batch"               # REST / 배치 작업
+LANE_RANK = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 1}
+
+QueueUpdateCallback = Callable[[int, float], Awaitable[None]]
+
+class SchedulerQueueFull(Exception):
+    """대기열이 가득 차 요청을 받을 수 없음"""
+
+class _Waiter:
+    """대기 중인 요청"""
+    __slots__ = ("model", "client_id", "lane", "start_tag", "finish_tag", "seq",
+                 "future", "on_update", "group", "enqueued_at", "last_position")
+
+    def __init__(self, model: str, client_id: str, lane: int, start_tag: float,
+                 finish_tag: float, seq: int, future: asyncio.Future,
+                 on_update: Optional[QueueUpdateCallback], group: Optional[str]):
+        self.model = model
+        self.client_id = client_id
+        self.lane = lane
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.seq = seq
+        self.future = future
+        self.on_update = on_update
+        self.group = group
+        self.enqueued_at = time.monotonic()
+        self.last_position = None
+
+    def sort_key(self) -> tuple:
+        return (self.lane, self.finish_tag, self.seq)
+
+class GPUScheduler:
+    """GPU 생성 슬롯 스케줄러"""
+
+    def __init__(self, model_concurrency: Dict[str, int], default_concurrency: int,
+                 max_queue: int, max_batch_queue: int, client_weights: Dict[str, float],
+                 initial_service_time: float):
+        self.model_concurrency = model_concurrency
+        self.default_concurrency = default_concurrency
+        self.max_queue = max_queue
+        self.max_batch_queue = max_batch_queue
+        self.client_weights = client_weights
+        self.initial_service_time = initial_service_time
+        self._active: Dict[str, int] = defaultdict(int)
+        self._waiters: Dict[str, List[_Waiter]] = defaultdict(list)
+        # 가중 공정 큐잉 가상 시간: (모델, 레인) → 시간, (모델, 레인, 클라이언트) → 마지막 종료 태그
+        self._virtual_time: Dict[tuple, float] = defaultdict(float)
+        self._client_tags: Dict[tuple, float] = {}
+        self._service_time: Dict[str, float] = {}
+        self._seq = 0
+        self.node_count = 1
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.dispatched_from_queue = 0
+        self.cancelled_waiting = 0
+        self.cancelled_active = 0
+        self.promoted = 0
+
+    def concurrency(self, model: str) -> int:
+        """모델별 동시 생성 수 (노드당 설정값 × 정상 Ollama 노드 수)"""
+        return self.model_concurrency.get(model, self.default_concurrency) * self.node_count
+
+    def set_node_count(self, count: int):
+        """정상 노드 수 변경 반영 - 늘어난 슬롯만큼 대기 요청 배정"""
+        count = max(1, count)
+        if count == self.node_count:
+            return
+        self.node_count = count
+        logger.info(f"GPU 스케줄러 노드 수 변경: {count}대")
+        for model in list(self._waiters):
+            self._dispatch(model)
+
+    def queue_depth(self, model: Optional[str] = None) -> int:
+        """대기 중인 요청 수 (모델 지정 시 해당 모델만)"""
+        if model is not None:
+            return len(self._waiters.get(model, []))
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def lane_depth(self, lane: int) -> int:
+        """레인별 대기 중인 요청 수"""
+        return sum(1 for waiters in self._waiters.values() for w in waiters if w.lane == lane)
+
+    def active_count(self, model: Optional[str] = None) -> int:
+        """생성 중인 요청 수"""
+        if model is not None:
+            return self._active.get(model, 0)
+        return sum(self._active.values())
+
+    def has_capacity(self, model: str) -> bool:
+        """대기 없이 바로 생성할 수 있는지 여부 (헤지 요청 판단용)"""
+        return self._active.get(model, 0) < self.concurrency(model) and not self._waiters.get(model)
+
+    def average_service_time(self, model: str) -> float:
+        return self._service_time.get(model, self.initial_service_time)
+
+    async def acquire(self, model: str, client_id: str = "unknown",
+                      priority: str = PRIORITY_BATCH,
+                      on_update: Optional[QueueUpdateCallback] = None,
+                      group: Optional[str] = None):
+        """생성 슬롯 획득 (필요 시 대기)
+
+        group은 여러 요청이 공유하는 생성(요청 합치기 키) - promote()로 대기 중 레인 상향
+        """
+        if self._active[model] < self.concurrency(model) and not self._waiters[model]:
+            self._active[model] += 1
+            return
+
+        lane = LANE_RANK.get(priority, LANE_RANK[PRIORITY_BATCH])
+        # 배치 레인은 별도 상한 - 배치가 대기열을 채워 대화형 요청이 거절되지 않도록
+        if self.queue_depth() >= self.max_queue or (
+                lane == LANE_RANK[PRIORITY_BATCH] and self.lane_depth(lane) >= self.max_batch_queue):
+            self.rejected += 1
+            logger.warning(f"⚠️ 스케줄러 대기열 가득 참 - 요청 거절 ({client_id})")
+            raise SchedulerQueueFull("서버가 혼잡합니다. 잠시 후 다시 시도해주세요.")
+
+        start_tag, finish_tag = self._assign_tags(model, lane, client_id)
+        self._seq += 1
+        waiter = _Waiter(model, client_id, lane, start_tag, finish_tag, self._seq,
+                         asyncio.get_running_loop().create_future(), on_update, group)
+        self._waiters[model].append(waiter)
+        self._notify_positions(model)
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 슬롯을 받은 직후 취소된 경우 바로 반납
+                self.release(model)
+            elif waiter in self._waiters[model]:
+                self._waiters[model].remove(waiter)
+                self._notify_positions(model)
+            self.cancelled_waiting += 1
+            raise
+
+        self.total_wait += time.monotonic() - waiter.enqueued_at
+
+    def _assign_tags(self, model: str, lane: int, client_id: str) -> tuple:
+        """레인 안에서의 가중 공정 큐잉 (시작, 종료) 태그 계산"""
+        weight = self.client_weights.get(client_id, 1.0)
+        client_key = (model, lane, client_id)
+        start_tag = max(self._virtual_time[(model, lane)], self._client_tags.get(client_key, 0.0))
+        finish_tag = start_tag + 1.0 / weight
+        self._client_tags[client_key] = finish_tag
+        return start_tag, finish_tag
+
+    def promote(self, group: str, priority: str):
+        """공유 생성에 더 높은 우선순위 요청이 합류하면 대기 중인 레인을 올리고 순번을 다시 알림"""
+        lane = LANE_RANK.get(priority, LANE_RANK[PRIORITY_BATCH])
+        for model, waiters in self._waiters.items():
+            matched = [w for w in waiters if w.group == group]
+            for waiter in matched:
+                if lane < waiter.lane:
+                    waiter.lane = lane
+                    waiter.start_tag, waiter.finish_tag = self._assign_tags(model, lane, waiter.client_id)
+                    self.promoted += 1
+                # 새로 합류한 구독자도 현재 순번을 받도록 재전송
+                waiter.last_position = None
+            if matched:
+                self._notify_positions(model)
+
+    def release(self, model: str, service_time: Optional[float] = None):
+        """생성 슬롯 반납 후 다음 대기 요청에 배정"""
+        self._active[model] = max(0, self._active[model] - 1)
+        if service_time is not None:
+            previous = self._service_time.get(model, service_time)
+            self._service_time[model] = previous * 0.8 + service_time * 0.2
+            self.completed += 1
+        self._dispatch(model)
+
+    def _dispatch(self, model: str):
+        waiters = self._waiters[model]
+        while waiters and self._active[model] < self.concurrency(model):
+            waiter = min(waiters, key=_Waiter.sort_key)
+            waiters.remove(waiter)
+            if waiter.future.done():
+                continue
+            lane_key = (model, waiter.lane)
+            self._virtual_time[lane_key] = max(self._virtual_time[lane_key], waiter.start_tag)
+            self._active[model] += 1
+            self.dispatched_from_queue += 1
+            waiter.future.set_result(True)
+        self._prune_client_tags(model)
+        self._notify_positions(model)
+
+    def _prune_client_tags(self, model: str):
+        """가상 시간보다 뒤처진 클라이언트 태그 정리 (신규 클라이언트와 동일 취급)"""
+        if len(self._client_tags) < 1024:
+            return
+        for key in [k for k, tag in self._client_tags.items()
+                    if k[0] == model and tag <= self._virtual_time[(k[0], k[1])]]:
+            del self._client_tags[key]
+
+    def _notify_positions(self, model: str):
+        """대기 순번/예상 시간 변경을 대기자에게 알림"""
+        ordered = sorted(self._waiters[model], key=_Waiter.sort_key)
+        concurrency = max(1, self.concurrency(model))
+        service_time = self.average_service_time(model)
+        for index, waiter in enumerate(ordered):
+            position = index + 1
+            if waiter.on_update is None or waiter.last_position == position:
+                continue
+            waiter.last_position = position
+            eta = math.ceil(position / concurrency) * service_time
+            asyncio.create_task(self._safe_update(waiter.on_update, position, eta))
+
+    @staticmethod
+    async def _safe_update(callback: QueueUpdateCallback, position: int, eta: float):
+        try:
+            await callback(position, eta)
+        except Exception as e:
+            logger.debug(f"대기열 알림 실패: {e}")
+
+    @asynccontextmanager
+    async def slot(self, model: str, client_id: str = "unknown",
+                   priority: str = PRIORITY_BATCH,
+                   on_update: Optional[QueueUpdateCallback] = None,
+                   group: Optional[str] = None):
+        """생성 슬롯 컨텍스트 매니저"""
+        await self.acquire(model, client_id, priority, on_update, group)
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            # 취소된 생성은 처리 시간 통계에서 제외하고 슬롯을 바로 다음 대기 요청에 넘김
+            self.cancelled_active += 1
+            self.release(model)
+            raise
+        except BaseException:
+            self.release(model, time.monotonic() - started)
+            raise
+        else:
+            self.release(model, time.monotonic() - started)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """스케줄러 통계"""
+        models = set(self._active) | {m for m, w in self._waiters.items() if w}
+        return {
+            "max_queue": self.max_queue,
+            "max_batch_queue": self.max_batch_queue,
+            "node_count": self.node_count,
+            "queued": self.queue_depth(),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "cancelled_waiting": self.cancelled_waiting,
+            "cancelled_active": self.cancelled_active,
+            "promoted": self.promoted,
+            "average_wait": round(self.total_wait / self.dispatched_from_queue, 3)
+                            if self.dispatched_from_queue else 0.0,
+            "models": {
+                model: {
+                    "active": self._active.get(model, 0),
+                    "queued": len(self._waiters.get(model, [])),
+                    "concurrency": self.concurrency(model),
+                    "average_service_time": round(self.average_service_time(model), 3)
+                }
+                for model in sorted(models)
+            }
+        }
+
+# 전역 GPU 스케줄러 인스턴스
+gpu_scheduler = GPUScheduler(
+    model_concurrency=SCHEDULER_MODEL_CONCURRENCY,
+    default_concurrency=SCHEDULER_DEFAULT_CONCURRENCY,
+    max_queue=SCHEDULER_MAX_QUEUE,
+    max_batch_queue=SCHEDULER_MAX_BATCH_QUEUE,
+    client_weights=SCHEDULER_CLIENT_WEIGHTS,
+    initial_service_time=SCHEDULER_INITIAL_SERVICE_TIME
+)
@@ -0,0 +1,293 @@
+# Dec207Hub Backend Semantic Cache
+# Ollama 임베딩 기반 의미 유사 질문 캐시 (NumPy 벡터 인덱스, 모델별 네임스페이스)
+
+import re
+import time
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from config import (
+    ENABLE_SEMANTIC_CACHE, SEMANTIC_CACHE_EMBED_MODEL, SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_QUANTIZE,
+    SEMANTIC_CACHE_EMBED_TIMEOUT
+)
+from ollama_pool import ollama_pool
+from scheduler import gpu_scheduler, PRIORITY_INTERACTIVE
+
+try:
+    import numpy as np
+except ImportError:  # numpy 미설치 시 의미 캐시 비활성화
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# 이 크기 이하에서는 전수 비교, 초과 시 SimHash 후보 검색 후 재정렬
+EXACT_SEARCH_LIMIT = 4096
+SIGNATURE_BITS = 256
+RERANK_CANDIDATES = 64
+INITIAL_CAPACITY = 1024
+
+# 임베딩이 거의 같아도 답이 달라지는 부분 (숫자, 영문 이름/코드, 따옴표 안 문구)
+ENTITY_PATTERN = re.compile(r"\d+(?:[.,]\d+)*|[A-Za-z][A-Za-z0-9_./-]*|\"[^\"]+\"|'[^']+'|「[^」]+」")
+
+def extract_entities(text: str) -> frozenset:
+    """질문의 숫자/영문 토큰/인용 문구 집합 (대소문자 무시)"""
+    return frozenset(token.lower() for token in ENTITY_PATTERN.findall(text))
+
+_POPCOUNT_TABLE = (
+    np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8) if np is not None else None
+)
+
+def _popcount_rows(words: "np.ndarray") -> "np.ndarray":
+    """행별 비트 수 합계 (해밍 거리)"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.uint16)
+    # numpy < 2.0 호환: 바이트 단위 룩업 테이블
+    return _POPCOUNT_TABLE[words.view(np.uint8)].sum(axis=1, dtype=np.uint16)
+
+class VectorNamespace:
+    """모델 하나에 대한 벡터 인덱스 (float32 또는 int8 양자화 저장)"""
+
+    def __init__(self, dim: int, max_entries: int, ttl: float, quantize: bool,
+                 hyperplanes: "np.ndarray"):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quantize = quantize
+        self.hyperplanes = hyperplanes
+        self.count = 0
+        capacity = min(INITIAL_CAPACITY, max_entries)
+        self._vectors = np.zeros((capacity, dim), dtype=np.int8 if quantize else np.float32)
+        self._scales = np.ones(capacity, dtype=np.float32)
+        self._signatures = np.zeros((capacity, SIGNATURE_BITS // 64), dtype=np.uint64)
+        self._created = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._prompts: List[str] = [""] * capacity
+        self._responses: List[str] = [""] * capacity
+
+    @property
+    def capacity(self) -> int:
+        return self._vectors.shape[0]
+
+    def memory_bytes(self) -> int:
+        return int(self._vectors.nbytes + self._scales.nbytes + self._signatures.nbytes
+                   + self._created.nbytes + self._last_used.nbytes)
+
+    def _grow(self):
+        new_capacity = min(self.capacity * 2, self.max_entries)
+        extra = new_capacity - self.capacity
+        self._vectors = np.concatenate([self._vectors, np.zeros((extra, self.dim), dtype=self._vectors.dtype)])
+        self._scales = np.concatenate([self._scales, np.ones(extra, dtype=np.float32)])
+        self._signatures = np.concatenate([self._signatures, np.zeros((extra, self._signatures.shape[1]), dtype=np.uint64)])
+        self._created = np.concatenate([self._created, np.zeros(extra)])
+        self._last_used = np.concatenate([self._last_used, np.zeros(extra)])
+        self._prompts.extend([""] * extra)
+        self._responses.extend([""] * extra)
+
+    def _signature(self, vectors: "np.ndarray") -> "np.ndarray":
+        bits = (vectors @ self.hyperplanes) > 0
+        return np.packbits(bits, axis=-1).view(np.uint64)
+
+    def _encode(self, vector: "np.ndarray") -> Tuple["np.ndarray", float]:
+        if not self.quantize:
+            return vector, 1.0
+        scale = 127.0 / max(float(np.abs(vector).max()), 1e-12)
+        return np.round(vector * scale).astype(np.int8), scale
+
+    def add(self, vector: "np.ndarray", prompt: str, response: str):
+        """항목 추가 - 가득 차면 가장 오래 사용되지 않은 항목을 대체"""
+        now = time.time()
+        if self.count < self.capacity:
+            slot = self.count
+            self.count += 1
+        elif self.capacity < self.max_entries:
+            self._grow()
+            slot = self.count
+            self.count += 1
+        else:
+            slot = int(np.argmin(self._last_used[:self.count]))
+
+        encoded, scale = self._encode(vector)
+        self._vectors[slot] = encoded
+        self._scales[slot] = scale
+        self._signatures[slot] = self._signature(vector)
+        self._created[slot] = now
+        self._last_used[slot] = now
+        self._prompts[slot] = prompt
+        self._responses[slot] = response
+
+    def _remove(self, slot: int):
+        """슬롯 제거 (마지막 항목을 빈 자리로 이동)"""
+        last = self.count - 1
+        if slot != last:
+            self._vectors[slot] = self._vectors[last]
+            self._scales[slot] = self._scales[last]
+            self._signatures[slot] = self._signatures[last]
+            self._created[slot] = self._created[last]
+            self._last_used[slot] = self._last_used[last]
+            self._prompts[slot] = self._prompts[last]
+            self._responses[slot] = self._responses[last]
+        self._prompts[last] = ""
+        self._responses[last] = ""
+        self.count -= 1
+
+    def search_batch(self, queries: "np.ndarray") -> List[Tuple[int, float]]:
+        """정규화된 질의 벡터 묶음에 대해 (슬롯, 코사인 유사도) 최상위 결과 반환"""
+        if self.count == 0:
+            return [(-1, 0.0)] * len(queries)
+
+        vectors = self._vectors[:self.count]
+        scales = self._scales[:self.count]
+
+        if self.count <= EXACT_SEARCH_LIMIT:
+            sims = (vectors.astype(np.float32, copy=False) @ queries.T) / scales[:, None]
+            best = np.argmax(sims, axis=0)
+            return [(int(slot), float(sims[slot, i])) for i, slot in enumerate(best)]
+
+        # SimHash 해밍 거리로 후보를 좁힌 뒤 정확한 코사인으로 재정렬
+        query_signatures = self._signature(queries)
+        signatures = self._signatures[:self.count]
+        results = []
+        for i, query in enumerate(queries):
+            distances = _popcount_rows(signatures ^ query_signatures[i])
+            candidates = np.argpartition(distances, RERANK_CANDIDATES)[:RERANK_CANDIDATES]
+            sims = (vectors[candidates].astype(np.float32) @ query) / scales[candidates]
+            j = int(np.argmax(sims))
+            results.append((int(candidates[j]), float(sims[j])))
+        return results
+
+    def lookup(self, query: "np.ndarray", threshold: float) -> Optional[Tuple[str, float, str]]:
+        """임계값 이상 유사한 (캐시 응답, 유사도, 원래 질문) 반환 (만료 항목은 제거)"""
+        slot, similarity = self.search_batch(query[None, :])[0]
+        if slot < 0 or similarity < threshold:
+            return None
+        if self._created[slot] + self.ttl < time.time():
+            self._remove(slot)
+            return None
+        self._last_used[slot] = time.time()
+        return self._responses[slot], similarity, self._prompts[slot]
+
+class SemanticCache:
+    """모델별 네임스페이스를 가진 의미 유사 응답 캐시"""
+
+    def __init__(self, embed_model: str, threshold: float, max_entries: int,
+                 ttl: float, quantize: bool):
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quantize = quantize
+        self._namespaces: Dict[str, VectorNamespace] = {}
+        self._hyperplanes: Dict[int, "np.ndarray"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.embed_errors = 0
+        self.entity_mismatches = 0
+        self.skipped_busy = 0
+
+    async def embed(self, texts: List[str]) -> Optional["np.ndarray"]:
+        """Ollama 임베딩 API로 텍스트 묶음을 정규화된 벡터로 변환
+
+        임베딩도 GPU를 쓰므로 스케줄러 슬롯 안에서 실행하고, 바로 받을 슬롯이 없으면
+        기다리지 않고 건너뜀 (캐시 조회 때문에 생성이 늦어지지 않도록)
+        """
+        if not gpu_scheduler.has_capacity(self.embed_model):
+            self.skipped_busy += 1
+            return None
+        try:
+            node = ollama_pool.select(self.embed_model)
+            async with gpu_scheduler.slot(self.embed_model, priority=PRIORITY_INTERACTIVE), \
+                    ollama_pool.track(node):
+                response = await node.client.post(
+                    "/api/embed",
+                    json={"model": self.embed_model, "input": texts},
+                    timeout=SEMANTIC_CACHE_EMBED_TIMEOUT
+                )
+            if response.status_code != 200:
+                self.embed_errors += 1
+                logger.warning(f"임베딩 요청 실패: {response.status_code}")
+                return None
+            vectors = np.asarray(response.json().get("embeddings", []), dtype=np.float32)
+            if vectors.ndim != 2 or len(vectors) != len(texts):
+                self.embed_errors += 1
+                return None
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            return vectors / np.maximum(norms, 1e-12)
+        except Exception as e:
+            self.embed_errors += 1
+            logger.warning(f"임베딩 오류: {e}")
+            return None
+
+    def _namespace(self, model: str, dim: int) -> VectorNamespace:
+        namespace = self._namespaces.get(model)
+        if namespace is None or namespace.dim != dim:
+            if dim not in self._hyperplanes:
+                rng = np.random.default_rng(207)
+                self._hyperplanes[dim] = rng.standard_normal((dim, SIGNATURE_BITS)).astype(np.float32)
+            namespace = VectorNamespace(dim, self.max_entries, self.ttl, self.quantize, self._hyperplanes[dim])
+            self._namespaces[model] = namespace
+        return namespace
+
+    async def lookup(self, model: str, message: str) -> Tuple[Optional[str], Optional["np.ndarray"]]:
+        """(캐시 응답, 질의 임베딩) 반환 - 임베딩은 저장 시 재사용
+
+        유사도가 높아도 숫자/영문 이름/인용 문구가 다르면 다른 질문으로 보고 적중 처리하지 않음
+        """
+        vectors = await self.embed([message])
+        if vectors is None:
+            return None, None
+        query = vectors[0]
+        namespace = self._namespaces.get(model)
+        if namespace is not None and namespace.dim == len(query):
+            found = namespace.lookup(query, self.threshold)
+            if found is not None and extract_entities(found[2]) != extract_entities(message):
+                self.entity_mismatches += 1
+                logger.info(f"의미 캐시 후보 제외 (숫자/이름 불일치, 유사도 {found[1]:.3f}): {message[:30]}...")
+                found = None
+            if found is not None:
+                self.hits += 1
+                logger.info(f"의미 캐시 적중 (유사도 {found[1]:.3f}): {message[:30]}...")
+                return found[0], query
+        self.misses += 1
+        return None, query
+
+    def store(self, model: str, message: str, embedding: "np.ndarray", response: str):
+        """응답 저장"""
+        self._namespace(model, len(embedding)).add(embedding, message, response)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """의미 캐시 통계"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "embed_model": self.embed_model,
+            "threshold": self.threshold,
+            "quantized": self.quantize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "embed_errors": self.embed_errors,
+            "entity_mismatches": self.entity_mismatches,
+            "skipped_busy": self.skipped_busy,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "namespaces": {
+                model: {"entries": ns.count, "memory_bytes": ns.memory_bytes()}
+                for model, ns in self._namespaces.items()
+            }
+        }
+
+if ENABLE_SEMANTIC_CACHE and np is None:
+    logger.warning("⚠️ numpy가 설치되지 않아 의미 캐시를 비활성화합니다")
+
+# 전역 의미 캐시 인스턴스 (비활성화 시 None)
+semantic_cache = SemanticCache(
+    embed_model=SEMANTIC_CACHE_EMBED_MODEL,
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=SEMANTIC_CACHE_TTL_SECONDS,
+    quantize=SEMANTIC_CACHE_QUANTIZE
+) if ENABLE_SEMANTIC_CACHE and np is not None else None
+
+def get_semantic_cache_stats() -> Dict[str, Any]:
+    """의미 캐시 통계 반환 (외부 사용용)"""
+    if semantic_cache is None:
+        return {"enabled": False}
+    return semantic_cache.get_stats()
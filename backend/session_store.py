@@ -0,0 +1,212 @@
+# Dec207Hub Backend Session Store
+# 서버 측 대화 세션 저장소 (링 버퍼 히스토리 + 세션별 메모리 상한 + 유휴 만료 + 버전 관리되는 요약)
+
+import re
+import sys
+import time
+import uuid
+import logging
+from collections import deque, OrderedDict
+from typing import List, Dict, Any, Optional
+from config import (
+    SESSION_MAX_MESSAGES, SESSION_MAX_BYTES, SESSION_IDLE_TIMEOUT,
+    SESSION_MAX_SESSIONS, SESSION_SWEEP_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+class HistoryMessage:
+    """대화 메시지 1건 (dict 대신 __slots__로 메모리 절약)"""
+    __slots__ = ("seq", "role", "content", "timestamp")
+
+    def __init__(self, seq: int, role: str, content: str, timestamp: float):
+        self.seq = seq
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+# 메시지 레코드 자체의 고정 크기 (content 문자열 제외)
+RECORD_OVERHEAD_BYTES = sys.getsizeof(HistoryMessage(0, "user", "", 0.0)) + sys.getsizeof(0.0)
+
+def message_size(content: str) -> int:
+    return RECORD_OVERHEAD_BYTES + sys.getsizeof(content)
+
+class ConversationSession:
+    """세션 1개 - 최근 메시지만 유지하는 링 버퍼 + 오래된 턴의 누적 요약
+
+    history_version은 히스토리가 편집(교체)될 때마다 증가하며, 요약은 생성 시점의
+    버전과 다르면 폐기됨. summary_upto 이하 seq의 메시지는 요약에 포함된 것으로 간주.
+    temporary 세션은 저장소에 등록되지 않는 요청 1건용 (요약 대상 아님)
+    """
+    __slots__ = ("session_id", "temporary", "messages", "memory_bytes", "created_at", "last_active",
+                 "evicted", "next_seq", "history_version", "summary", "summary_upto", "summary_version")
+
+    def __init__(self, session_id: str, temporary: bool = False):
+        self.session_id = session_id
+        self.temporary = temporary
+        self.messages: deque = deque()
+        self.memory_bytes = 0
+        self.created_at = time.monotonic()
+        self.last_active = self.created_at
+        self.evicted = 0
+        self.next_seq = 1
+        self.history_version = 0
+        self.summary: Optional[str] = None
+        self.summary_upto = 0
+        self.summary_version = 0
+
+    def append(self, role: str, content: str):
+        """메시지 추가 - 개수/메모리 상한을 넘으면 오래된 메시지부터 제거"""
+        self.messages.append(HistoryMessage(self.next_seq, role, content, time.time()))
+        self.next_seq += 1
+        self.memory_bytes += message_size(content)
+        while self.messages and (len(self.messages) > SESSION_MAX_MESSAGES
+                                 or self.memory_bytes > SESSION_MAX_BYTES):
+            oldest = self.messages.popleft()
+            self.memory_bytes -= message_size(oldest.content)
+            self.evicted += 1
+        self.touch()
+
+    def sync(self, conversation_history: List[Dict]):
+        """클라이언트가 보낸 전체 히스토리 반영 (기존 프로토콜 호환)
+
+        서버가 가진 끝부분(링 버퍼)과 요청 히스토리의 끝부분이 겹치는 길이만큼 같으면 그대로 둠.
+        전체 히스토리를 매번 보내는 기존 클라이언트는 링 버퍼보다 길어도 편집으로 보지 않음.
+        다르면 편집된 것으로 보고 교체 후 요약 무효화
+        """
+        incoming = [(msg.get("role", "user"), msg.get("content", "")) for msg in conversation_history]
+        current = [(msg.role, msg.content) for msg in self.messages]
+        overlap = min(len(incoming), len(current))
+        if overlap and incoming[len(incoming) - overlap:] == current[len(current) - overlap:]:
+            self.touch()
+            return
+
+        self.messages.clear()
+        self.memory_bytes = 0
+        self.history_version += 1
+        self.invalidate_summary()
+        for role, content in incoming:
+            self.append(role, content)
+
+    def history(self) -> List[Dict[str, str]]:
+        return [msg.to_dict() for msg in self.messages]
+
+    def unsummarized(self) -> List[HistoryMessage]:
+        """아직 요약에 포함되지 않은 메시지"""
+        return [msg for msg in self.messages if msg.seq > self.summary_upto]
+
+    def context_history(self) -> List[Dict[str, str]]:
+        """프롬프트에 넣을 히스토리 (요약된 부분 제외)"""
+        return [msg.to_dict() for msg in self.unsummarized()]
+
+    def set_summary(self, summary: str, upto: int, based_on_version: int) -> bool:
+        """요약 반영 - 생성 중 히스토리가 편집됐으면 폐기하고 False 반환"""
+        if based_on_version != self.history_version or upto < self.summary_upto:
+            return False
+        self.summary = summary
+        self.summary_upto = upto
+        self.summary_version += 1
+        return True
+
+    def invalidate_summary(self):
+        self.summary = None
+        self.summary_upto = 0
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "messages": len(self.messages),
+            "memory_bytes": self.memory_bytes,
+            "evicted": self.evicted,
+            "summary_version": self.summary_version,
+            "summarized_upto": self.summary_upto,
+            "idle_seconds": round(now - self.last_active, 1)
+        }
+
+class SessionStore:
+    """세션 ID별 대화 저장소 (최근 사용 순 유지)"""
+
+    def __init__(self, max_sessions: int, idle_timeout: float, sweep_interval: float):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._last_sweep = time.monotonic()
+        self.created = 0
+        self.expired = 0
+
+    def get_or_create(self, session_id: Optional[str] = None) -> ConversationSession:
+        """세션 조회 - 없거나 잘못된 ID면 새 세션 생성 (서버 재시작 후 알 수 없는 ID는 같은 ID로 재생성)"""
+        self._sweep()
+        if session_id and SESSION_ID_PATTERN.match(session_id):
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.touch()
+                return session
+        else:
+            session_id = uuid.uuid4().hex
+
+        session = ConversationSession(session_id)
+        self._sessions[session_id] = session
+        self.created += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.expired += 1
+        return session
+
+    def temporary(self) -> ConversationSession:
+        """세션 ID 없는 요청용 임시 세션 (등록하지 않으므로 실제 세션을 LRU에서 밀어내지 않음)"""
+        return ConversationSession(uuid.uuid4().hex, temporary=True)
+
+    def resolve_history(self, session: ConversationSession,
+                        conversation_history: Optional[List[Dict]]) -> List[Dict[str, str]]:
+        """요청에 히스토리가 있으면 세션에 반영 후, 요약되지 않은 세션 히스토리 반환 (요약은 session.summary)"""
+        if conversation_history:
+            session.sync(conversation_history)
+        return session.context_history()
+
+    def record_turn(self, session: ConversationSession, user_message: str, ai_response: str):
+        """완료된 대화 1턴을 세션에 추가"""
+        session.append("user", user_message)
+        session.append("assistant", ai_response)
+
+    def _sweep(self):
+        """유휴 시간이 지난 세션 정리 (sweep_interval마다)"""
+        now = time.monotonic()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        expired = [sid for sid, s in self._sessions.items() if now - s.last_active > self.idle_timeout]
+        for sid in expired:
+            del self._sessions[sid]
+        if expired:
+            self.expired += len(expired)
+            logger.info(f"🧹 유휴 세션 {len(expired)}개 만료")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """세션 통계 (메모리 사용량 상위 세션별 내역 포함)"""
+        sessions = sorted(self._sessions.values(), key=lambda s: s.memory_bytes, reverse=True)
+        return {
+            "sessions": len(sessions),
+            "created": self.created,
+            "expired": self.expired,
+            "total_memory_bytes": sum(s.memory_bytes for s in sessions),
+            "max_memory_bytes_per_session": SESSION_MAX_BYTES,
+            "per_session": {s.session_id[:12]: s.get_stats() for s in sessions[:20]}
+        }
+
+# 전역 세션 저장소 인스턴스
+session_store = SessionStore(
+    max_sessions=SESSION_MAX_SESSIONS,
+    idle_timeout=SESSION_IDLE_TIMEOUT,
+    sweep_interval=SESSION_SWEEP_INTERVAL
+)
@@ -0,0 +1,157 @@
+# Dec207Hub Backend Conversation Summarizer
+# GPU 유휴 시간에 오래된 대화 턴을 누적 요약 (요청 처리 경로 밖에서 실행)
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from config import (
+    SUMMARY_MODEL, SUMMARY_KEEP_RECENT, SUMMARY_MIN_NEW_MESSAGES, SUMMARY_MAX_TOKENS,
+    SUMMARY_TIMEOUT, SUMMARY_IDLE_POLL, OLLAMA_KEEP_ALIVE
+)
+from session_store import ConversationSession, HistoryMessage
+from scheduler import gpu_scheduler, PRIORITY_BATCH
+from chat_handler import request_ollama_chat
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CLIENT_ID = "summarizer"
+
+def build_summary_payload(previous_summary: Optional[str], messages: List[HistoryMessage]) -> Dict[str, Any]:
+    """누적 요약용 페이로드 (이전 요약 + 새로 밀려난 턴 → 새 요약)"""
+    lines = []
+    for msg in messages:
+        role = "사용자" if msg.role == "user" else "AI"
+        lines.append(f"{role}: {msg.content}")
+
+    prompt = f"""다음 대화를 이후 답변에 필요한 사실, 결정 사항, 사용자 요청 위주로 간결하게 요약하세요.
+새로운 정보를 추가하지 말고 요약만 출력하세요.
+
+기존 요약:
+{previous_summary or "(없음)"}
+
+추가 대화:
+{chr(10).join(lines)}
+
+요약:"""
+
+    return {
+        "model": SUMMARY_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "stream": False,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {
+            "temperature": 0.1,
+            "num_predict": SUMMARY_MAX_TOKENS,
+        }
+    }
+
+class ConversationSummarizer:
+    """세션별 누적 요약 백그라운드 작업자"""
+
+    def __init__(self, keep_recent: int, min_new_messages: int, idle_poll: float):
+        self.keep_recent = keep_recent
+        self.min_new_messages = min_new_messages
+        self.idle_poll = idle_poll
+        self._pending: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.completed = 0
+        self.discarded = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+
+    def candidates(self, session: ConversationSession) -> List[HistoryMessage]:
+        """요약 대상 - 요약되지 않은 메시지 중 최근 keep_recent개를 제외한 나머지"""
+        unsummarized = session.unsummarized()
+        if len(unsummarized) <= self.keep_recent:
+            return []
+        return unsummarized[:len(unsummarized) - self.keep_recent]
+
+    def maybe_schedule(self, session: ConversationSession):
+        """요약할 턴이 충분히 쌓였으면 대기열에 추가 (임시 세션 제외)"""
+        if not session.temporary and len(self.candidates(session)) >= self.min_new_messages:
+            self._pending[session.session_id] = session
+            self._wakeup.set()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _gpu_idle(self) -> bool:
+        return gpu_scheduler.active_count() == 0 and gpu_scheduler.queue_depth() == 0
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            # 대화 요청이 없을 때만 요약 생성
+            if not self._gpu_idle():
+                await asyncio.sleep(self.idle_poll)
+                continue
+            _, session = self._pending.popitem(last=False)
+            try:
+                await self.summarize(session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"대화 요약 실패 ({session.session_id[:12]}): {e}")
+
+    async def summarize(self, session: ConversationSession) -> bool:
+        """세션의 오래된 턴을 기존 요약에 합침 - 생성 중 히스토리가 편집됐으면 결과 폐기"""
+        messages = self.candidates(session)
+        if not messages:
+            return False
+        version = session.history_version
+        upto = messages[-1].seq
+
+        started = time.monotonic()
+        async with gpu_scheduler.slot(SUMMARY_MODEL, SUMMARY_CLIENT_ID, PRIORITY_BATCH):
+            data = await request_ollama_chat(build_summary_payload(session.summary, messages), SUMMARY_TIMEOUT)
+        summary = data.get("message", {}).get("content", "").strip()
+        if not summary:
+            raise RuntimeError("빈 요약 응답")
+
+        if not session.set_summary(summary, upto, version):
+            self.discarded += 1
+            logger.info(f"히스토리 변경으로 요약 폐기: {session.session_id[:12]}")
+            return False
+
+        elapsed = time.monotonic() - started
+        self.completed += 1
+        self.total_seconds += elapsed
+        logger.info(f"📝 대화 요약 v{session.summary_version} ({session.session_id[:12]}, "
+                    f"메시지 {len(messages)}개, {elapsed:.1f}초)")
+        # 요약 중에 더 쌓였으면 다시 예약
+        self.maybe_schedule(session)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "model": SUMMARY_MODEL,
+            "pending": len(self._pending),
+            "completed": self.completed,
+            "discarded": self.discarded,
+            "failures": self.failures,
+            "average_seconds": round(self.total_seconds / self.completed, 2) if self.completed else 0.0
+        }
+
+# 전역 대화 요약기 인스턴스
+conversation_summarizer = ConversationSummarizer(
+    keep_recent=SUMMARY_KEEP_RECENT,
+    min_new_messages=SUMMARY_MIN_NEW_MESSAGES,
+    idle_poll=SUMMARY_IDLE_POLL
+)
@@ -0,0 +1,78 @@
+# Dec207Hub Backend 테스트 공용 설정
+# backend 모듈을 평소처럼 "from config import ..." 로 임포트하도록 경로 추가 + 로컬 Ollama 스텁 서버
+
+import os
+import sys
+import socket
+import threading
+import time
+from typing import Dict, Any
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+def free_port() -> int:
+    """사용하지 않는 로컬 포트"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class StubOllama:
+    """/api/tags, /api/ps만 응답하는 Ollama 스텁 서버 (healthy=False면 500)"""
+
+    def __init__(self, models: Dict[str, int], resident=()):
+        from fastapi import FastAPI
+        from fastapi.responses import JSONResponse
+        import uvicorn
+
+        self.models = dict(models)
+        self.resident = list(resident)
+        self.healthy = True
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+
+        app = FastAPI()
+
+        @app.get("/api/tags")
+        async def tags():
+            if not self.healthy:
+                return JSONResponse({"error": "down"}, status_code=500)
+            return {"models": [{"name": name, "size": size} for name, size in self.models.items()]}
+
+        @app.get("/api/ps")
+        async def ps():
+            return {"models": [{"name": name} for name in self.resident]}
+
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self) -> "StubOllama":
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("스텁 서버 시작 실패")
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+@pytest.fixture
+def stub_ollama():
+    """StubOllama(models, resident) 생성 함수 - 테스트 종료 시 모두 정지"""
+    servers = []
+
+    def start(models: Dict[str, Any], resident=()) -> StubOllama:
+        server = StubOllama(models, resident).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
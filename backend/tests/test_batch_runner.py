@@ -0,0 +1,97 @@
+# 배치 실행 - 같은 batch_id로 재개하면 완료 항목은 건너뛰고 실패 항목만 다시 실행
+
+import asyncio
+
+import pytest
+
+import batch_runner
+from batch_runner import (
+    BatchResultStore, BatchValidationError, parse_batch_items, run_batch, validate_batch_options
+)
+from chat_handler import GenerationFailed
+
+@pytest.fixture
+def fake_generation(monkeypatch):
+    """실제 생성 대신 항목별 호출을 기록하고 failing에 든 항목은 실패시킴"""
+    calls = []
+    failing = set()
+
+    async def run_batch_item(item, client_id):
+        calls.append(item.item_id)
+        await asyncio.sleep(0)
+        if item.item_id in failing:
+            raise GenerationFailed("AI 연결 오류가 발생했습니다.")
+        return f"answer to {item.message}"
+
+    monkeypatch.setattr(batch_runner, "run_batch_item", run_batch_item)
+    monkeypatch.setattr(batch_runner, "batch_store", BatchResultStore(max_batches=4, ttl=60.0))
+    return calls, failing
+
+async def collect(items, batch_id, **options):
+    return [event async for event in run_batch(items, batch_id=batch_id, **options)]
+
+def test_resume_skips_completed_and_retries_failed(fake_generation):
+    """실패 항목은 저장되지 않아 재개 시 그 항목만 다시 실행"""
+    calls, failing = fake_generation
+    items = parse_batch_items([{"id": "a", "message": "1"}, {"id": "b", "message": "2"},
+                               {"id": "c", "message": "3"}], default_model="gemma3:4b")
+    failing.add("b")
+    first = asyncio.run(collect(items, "batch-1", concurrency=2))
+    results = {event["id"]: event for event in first if event["type"] == "result"}
+    assert results["b"]["status"] == "error"
+    assert results["a"]["status"] == results["c"]["status"] == "ok"
+    assert first[-1]["completed"] == 2 and first[-1]["failed"] == 1
+
+    failing.clear()
+    calls.clear()
+    second = asyncio.run(collect(items, "batch-1"))
+    assert calls == ["b"]
+    assert second[0]["pending"] == 1 and second[0]["resumed"] == 2
+    replayed = [event for event in second if event.get("resumed") is True]
+    assert sorted(event["id"] for event in replayed) == ["a", "c"]
+    assert second[-1]["completed"] == 3 and second[-1]["failed"] == 0
+
+def test_resume_can_omit_completed_results(fake_generation):
+    """emit_completed=False면 재개 시 이미 받은 결과는 다시 보내지 않음"""
+    calls, _ = fake_generation
+    items = parse_batch_items([{"message": "1"}, {"message": "2"}])
+    asyncio.run(collect(items, "batch-2"))
+    calls.clear()
+    events = asyncio.run(collect(items, "batch-2", emit_completed=False))
+    assert calls == []
+    assert [event["type"] for event in events] == ["batch_start", "summary"]
+
+def test_parse_rejects_duplicate_ids():
+    """같은 항목 ID가 두 번 나오면 재개 기준이 모호하므로 거절"""
+    with pytest.raises(BatchValidationError):
+        parse_batch_items([{"id": "x", "message": "1"}, {"id": "x", "message": "2"}])
+
+@pytest.mark.parametrize("batch_id, concurrency", [(123, None), ("", None), ("  ", None),
+                                                   ("b", "4"), ("b", 2.5), ("b", True)])
+def test_invalid_options_are_rejected(batch_id, concurrency):
+    """batch_id는 비어 있지 않은 문자열, concurrency는 정수만 허용"""
+    with pytest.raises(BatchValidationError):
+        validate_batch_options(batch_id, concurrency)
+
+def test_resume_with_changed_items_is_rejected(fake_generation):
+    """완료된 항목의 메시지가 바뀐 채로 같은 batch_id를 재개하면 거절"""
+    items = parse_batch_items([{"id": "a", "message": "1"}, {"id": "b", "message": "2"}])
+    asyncio.run(collect(items, "batch-3"))
+    batch_runner.batch_store.validate_resume("batch-3", items)
+    changed = parse_batch_items([{"id": "a", "message": "다른 질문"}, {"id": "b", "message": "2"}])
+    with pytest.raises(BatchValidationError):
+        batch_runner.batch_store.validate_resume("batch-3", changed)
+
+def test_endpoint_rejects_bad_options_before_streaming(monkeypatch):
+    """형식이 틀린 옵션은 스트림을 시작하기 전에 400으로 응답"""
+    from fastapi.testclient import TestClient
+    import main
+    from logger import chat_logger
+
+    monkeypatch.setattr(chat_logger, "log_session_event", lambda *args, **kwargs: None)
+    client = TestClient(main.app)
+    items = [{"message": "1"}]
+    for body in ({"items": items, "concurrency": "4"}, {"items": items, "batch_id": 7}):
+        response = client.post("/chat/batch", json=body)
+        assert response.status_code == 400
+
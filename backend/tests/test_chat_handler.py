@@ -0,0 +1,57 @@
+# 헤지/요청 예산 - 백업 모델 응답 검증, 스트리밍 실패 안내 문구
+
+import asyncio
+
+import httpx
+
+import chat_handler
+from chat_handler import (
+    TIMEOUT_MESSAGE, CONNECTION_ERROR_MESSAGE, build_safe_payload, generate_ollama_response,
+    generate_ollama_stream
+)
+
+MODEL = "orieg/gemma3-tools:4b-it-qat"
+
+def make_payload(stream: bool):
+    return build_safe_payload(MODEL, [{"role": "user", "content": "질문"}], stream=stream)
+
+def test_hedge_winner_goes_through_response_filter(monkeypatch):
+    """백업 모델이 헤지에서 이기면 같은 필터를 거치고 주 모델 캐시에는 저장하지 않음"""
+    stored = []
+
+    async def hedged_call(*args, **kwargs):
+        return "hedge", {"message": {"content": "2025년 이후 새로운 기술이 나옵니다\n\n\n\n끝"}}
+
+    async def store_cached_response(*args):
+        stored.append(args)
+
+    monkeypatch.setattr(chat_handler, "hedged_call", hedged_call)
+    monkeypatch.setattr(chat_handler, "store_cached_response", store_cached_response)
+    response = asyncio.run(generate_ollama_response("질문", MODEL, [], make_payload(False), {}))
+    assert response.startswith("⚠️ **정확성 주의**")
+    assert "\n\n\n" not in response
+    assert stored == []
+
+def stream_failure(monkeypatch, error: Exception):
+    async def hedged_stream(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(chat_handler, "hedged_stream", hedged_stream)
+
+    async def collect():
+        return [event async for event in generate_ollama_stream("질문", MODEL, [], make_payload(True), {})]
+    return asyncio.run(collect())[-1]
+
+def test_stream_timeout_reports_timeout_message(monkeypatch):
+    """스트리밍 시작이 예산 안에 끝나지 않으면 연결 오류가 아닌 시간 초과 안내"""
+    for error in (asyncio.TimeoutError(), httpx.ReadTimeout("timed out")):
+        done = stream_failure(monkeypatch, error)
+        assert done["content"] == TIMEOUT_MESSAGE
+        assert done["failed"] is True
+
+def test_stream_connection_error_after_hedge_reports_connection_error(monkeypatch):
+    """헤지까지 실패한 연결 오류는 연결 오류 안내"""
+    monkeypatch.setattr(chat_handler, "ENABLE_HEDGING", True)
+    done = stream_failure(monkeypatch, httpx.ConnectError("refused"))
+    assert done["content"] == CONNECTION_ERROR_MESSAGE
+    assert done["model"] is None
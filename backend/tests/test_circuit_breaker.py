@@ -0,0 +1,78 @@
+# 서킷 브레이커 상태 전환 (closed → open → half-open → closed/open)
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
+
+@pytest.fixture
+def breaker(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "CIRCUIT_MIN_REQUESTS", 4)
+    monkeypatch.setattr(circuit_breaker, "CIRCUIT_ERROR_RATE", 0.5)
+    monkeypatch.setattr(circuit_breaker, "CIRCUIT_SLOW_CALL_SECONDS", 10.0)
+    monkeypatch.setattr(circuit_breaker, "CIRCUIT_SLOW_CALL_RATE", 0.75)
+    monkeypatch.setattr(circuit_breaker, "CIRCUIT_OPEN_SECONDS", 60.0)
+    monkeypatch.setattr(circuit_breaker, "CIRCUIT_HALF_OPEN_MAX_CALLS", 1)
+    return CircuitBreaker("test#model")
+
+def expire_open_period(breaker: CircuitBreaker):
+    breaker.opened_at -= circuit_breaker.CIRCUIT_OPEN_SECONDS
+
+def test_stays_closed_below_min_requests(breaker):
+    """최소 요청 수 전에는 모두 실패해도 열리지 않음"""
+    for _ in range(3):
+        breaker.record_failure("boom")
+    assert breaker.current_state() == STATE_CLOSED
+    assert breaker.allow_request()
+
+def test_opens_on_error_rate_and_rejects(breaker):
+    """오류율이 임계값에 닿으면 open, 이후 요청은 즉시 거절"""
+    breaker.record_success(0.1)
+    breaker.record_success(0.1)
+    breaker.record_failure("boom")
+    assert breaker.current_state() == STATE_CLOSED
+    breaker.record_failure("boom")
+    assert breaker.current_state() == STATE_OPEN
+    assert breaker.trips == 1
+    assert not breaker.allow_request()
+    assert breaker.rejected == 1
+    assert breaker.last_error == "boom"
+
+def test_opens_on_slow_calls(breaker):
+    """성공이라도 느린 호출 비율이 높으면 open"""
+    for _ in range(3):
+        breaker.record_success(12.0)
+    breaker.record_success(0.1)
+    assert breaker.current_state() == STATE_OPEN
+
+def test_half_open_success_closes(breaker):
+    """open 시간이 지나면 half-open으로 시험 요청 1건만 허용하고, 성공하면 closed"""
+    for _ in range(4):
+        breaker.record_failure("boom")
+    expire_open_period(breaker)
+    assert breaker.current_state() == STATE_HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.current_state() == STATE_CLOSED
+    assert breaker.allow_request()
+
+def test_half_open_failure_reopens(breaker):
+    """half-open 시험 요청이 실패하면 바로 다시 open"""
+    for _ in range(4):
+        breaker.record_failure("boom")
+    expire_open_period(breaker)
+    assert breaker.allow_request()
+    breaker.record_failure("still down")
+    assert breaker.current_state() == STATE_OPEN
+    assert breaker.trips == 2
+
+def test_cancelled_trial_returns_half_open_slot(breaker):
+    """결과 없이 취소된 시험 요청은 half-open 시험 슬롯을 돌려줌"""
+    for _ in range(4):
+        breaker.record_failure("boom")
+    expire_open_period(breaker)
+    assert breaker.allow_request()
+    breaker.record_cancelled(0.5)
+    assert breaker.current_state() == STATE_HALF_OPEN
+    assert breaker.allow_request()
@@ -0,0 +1,41 @@
+# 컨텍스트 패킹 - 블록 단위 제외로 연속 턴 프롬프트 prefix 유지 (KV 캐시 재사용)
+
+from chat_handler import build_prompt_messages
+from context_builder import plan_context
+
+def conversation(turns: int):
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"질문 {turn}"})
+        history.append({"role": "assistant", "content": f"답변 {turn}"})
+    return history
+
+def test_old_messages_are_dropped_in_blocks():
+    """메시지 수 상한을 넘으면 시작 위치가 블록 경계로만 이동"""
+    starts = []
+    for turns in range(4, 9):
+        plan = plan_context(conversation(turns), num_ctx=100_000, reserved_tokens=0,
+                            fixed_tokens=0, max_messages=8, drop_block=4)
+        starts.append(plan.dropped)
+        assert len(plan.messages) <= 8
+    assert starts == [0, 4, 4, 8, 8]
+
+def test_token_budget_drops_whole_blocks():
+    """예산을 넘으면 오래된 쪽부터 블록 단위로 제외"""
+    history = conversation(4)
+    plan = plan_context(history, num_ctx=40, reserved_tokens=0, fixed_tokens=0,
+                        max_messages=8, drop_block=4)
+    assert plan.reason == "token_budget"
+    assert plan.dropped % 4 == 0
+    assert plan.messages == history[plan.dropped:]
+    assert plan.history_tokens <= plan.budget
+
+def test_consecutive_turns_share_prompt_prefix():
+    """상한을 넘긴 긴 대화에서도 같은 블록 안의 다음 턴 프롬프트는 이전 프롬프트로 시작"""
+    history = conversation(5)
+    first, _ = build_prompt_messages(history, "질문 5", summary="앞선 대화 요약")
+    next_history = history + [{"role": "user", "content": "질문 5"},
+                              {"role": "assistant", "content": "답변 5"}]
+    second, _ = build_prompt_messages(next_history, "질문 6", summary="앞선 대화 요약")
+    assert len(history) > 8
+    assert second[:len(first)] == first
@@ -0,0 +1,192 @@
+# 멱등성 키 캐시 - 재전달, 진행 중 합류, 연결 종료 후 grace, 실패 미보관
+
+import asyncio
+
+import pytest
+
+from idempotency import IdempotencyCache, IdempotencyConflict, make_fingerprint
+
+KEY = "retry-key-0001"
+FINGERPRINT = make_fingerprint("안녕하세요", "gemma3:4b")
+
+class CountingFactory:
+    """호출 횟수를 세고, release 이벤트가 설정될 때까지 생성을 붙잡아 두는 생성 함수"""
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.cancelled = 0
+        self.fail = fail
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise RuntimeError("upstream failed")
+        return {"response": f"answer {self.calls}"}
+
+def make_cache(detach_grace: float = 5.0) -> IdempotencyCache:
+    return IdempotencyCache(ttl=60.0, max_entries=16, detach_grace=detach_grace)
+
+def test_completed_result_is_replayed():
+    """완료된 키로 다시 요청하면 생성하지 않고 저장된 결과 반환"""
+    async def scenario():
+        cache = make_cache()
+        factory = CountingFactory()
+        factory.release.set()
+        first = await cache.run(KEY, FINGERPRINT, factory)
+        second = await cache.run(KEY, FINGERPRINT, factory)
+        assert first == ({"response": "answer 1"}, "new")
+        assert second == ({"response": "answer 1"}, "replayed")
+        assert factory.calls == 1
+
+        with pytest.raises(IdempotencyConflict):
+            await cache.run(KEY, make_fingerprint("다른 질문", "gemma3:4b"), factory)
+
+    asyncio.run(scenario())
+
+def test_concurrent_retry_joins_in_flight_generation():
+    """진행 중인 키로 들어온 재시도는 같은 생성에 합류"""
+    async def scenario():
+        cache = make_cache()
+        factory = CountingFactory()
+        first = asyncio.create_task(cache.run(KEY, FINGERPRINT, factory))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.run(KEY, FINGERPRINT, factory))
+        await asyncio.sleep(0)
+        factory.release.set()
+        results = await asyncio.gather(first, second)
+        assert [status for _, status in results] == ["new", "joined"]
+        assert results[0][0] is results[1][0]
+        assert factory.calls == 1
+
+    asyncio.run(scenario())
+
+def test_disconnect_keeps_generation_for_reconnect():
+    """호출자가 취소돼도(연결 종료) grace 동안 생성이 계속되고 재연결 시 합류"""
+    async def scenario():
+        cache = make_cache(detach_grace=5.0)
+        factory = CountingFactory()
+        caller = asyncio.create_task(cache.run(KEY, FINGERPRINT, factory))
+        await asyncio.sleep(0)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        assert cache.detached == 1
+
+        retry = asyncio.create_task(cache.run(KEY, FINGERPRINT, factory))
+        await asyncio.sleep(0)
+        factory.release.set()
+        result, status = await retry
+        assert status == "joined"
+        assert result == {"response": "answer 1"}
+        assert factory.calls == 1
+        assert factory.cancelled == 0
+
+    asyncio.run(scenario())
+
+def test_generation_abandoned_after_grace():
+    """grace 안에 아무도 돌아오지 않으면 생성을 중단하고, 이후 재시도는 새로 생성"""
+    async def scenario():
+        cache = make_cache(detach_grace=0.05)
+        factory = CountingFactory()
+        caller = asyncio.create_task(cache.run(KEY, FINGERPRINT, factory))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        await asyncio.sleep(0.1)
+        assert factory.cancelled == 1
+        assert cache.abandoned == 1
+
+        factory.release.set()
+        assert await cache.run(KEY, FINGERPRINT, factory) == ({"response": "answer 2"}, "new")
+
+    asyncio.run(scenario())
+
+def test_user_abort_stops_without_grace():
+    """사용자가 명시적으로 취소하면 grace를 기다리지 않고 중단"""
+    async def scenario():
+        cache = make_cache(detach_grace=60.0)
+        factory = CountingFactory()
+        caller = asyncio.create_task(cache.run(KEY, FINGERPRINT, factory))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        assert cache.abort(KEY)
+        await asyncio.sleep(0)
+        assert factory.cancelled == 1
+        assert cache.get_stats()["entries"] == 0
+
+    asyncio.run(scenario())
+
+def test_failure_is_not_replayed():
+    """실패한 생성은 보관하지 않아 같은 키의 재시도가 새로 생성"""
+    async def scenario():
+        cache = make_cache()
+        factory = CountingFactory(fail=True)
+        factory.release.set()
+        with pytest.raises(RuntimeError):
+            await cache.run(KEY, FINGERPRINT, factory)
+        factory.fail = False
+        assert await cache.run(KEY, FINGERPRINT, factory) == ({"response": "answer 2"}, "new")
+        assert cache.failed == 1
+
+    asyncio.run(scenario())
+
+def test_expired_results_are_dropped_in_completion_order():
+    """먼저 시작했지만 늦게 끝난 항목이 있어도 만료된 결과는 모두 정리되고 진행 중인 항목은 유지"""
+    async def scenario():
+        cache = IdempotencyCache(ttl=0.05, max_entries=16, detach_grace=5.0)
+        slow = CountingFactory()
+        in_flight = asyncio.create_task(cache.run("slow-key-0001", FINGERPRINT, slow))
+        await asyncio.sleep(0)
+        for index in range(3):
+            done = CountingFactory()
+            done.release.set()
+            await cache.run(f"fast-key-000{index}", FINGERPRINT, done)
+
+        await asyncio.sleep(0.1)
+        cache._expire()
+        assert cache.get_stats()["entries"] == 1
+        assert cache.get_stats()["in_progress"] == 1
+
+        slow.release.set()
+        await in_flight
+
+    asyncio.run(scenario())
+
+def test_rest_retry_after_failed_generation_generates_again(monkeypatch):
+    """REST /chat 생성이 실패하면 같은 멱등성 키 재시도가 안내 문구 대신 새로 생성하고, 실패 턴은 히스토리에 남지 않음"""
+    from fastapi.testclient import TestClient
+    import main
+    from chat_handler import GenerationFailed
+    from logger import chat_logger
+    from session_store import session_store
+
+    calls = []
+
+    async def chat_with_ollama(message, model, conversation_history, **options):
+        calls.append(options.get("raise_on_failure"))
+        if len(calls) == 1:
+            raise GenerationFailed("요청 시간이 초과되었습니다.")
+        return "정상 답변"
+
+    monkeypatch.setattr(main, "chat_with_ollama", chat_with_ollama)
+    monkeypatch.setattr(chat_logger, "log_message", lambda *args, **kwargs: None)
+    client = TestClient(main.app)
+    body = {"message": "안녕하세요", "session_id": "idempotency-test-session"}
+    headers = {"Idempotency-Key": "rest-retry-0001"}
+
+    failed = client.post("/chat", json=body, headers=headers).json()
+    assert failed["ai_response"] == "요청 시간이 초과되었습니다."
+    assert session_store.get_or_create("idempotency-test-session").history() == []
+
+    retried = client.post("/chat", json=body, headers=headers).json()
+    assert retried["ai_response"] == "정상 답변"
+    assert retried["idempotency"] == "new"
+    assert calls == [True, True]
+    assert len(session_store.get_or_create("idempotency-test-session").history()) == 2
@@ -0,0 +1,27 @@
+# 백엔드 로그 파일 - import 시 부작용 없이 앱 시작/종료 시에만 핸들러 추가/제거
+
+import logging
+import logging.handlers
+
+import logger as logger_module
+from logger import setup_server_log_file, close_server_log_file
+
+def queue_handlers():
+    return [h for h in logging.getLogger().handlers if isinstance(h, logging.handlers.QueueHandler)]
+
+def test_import_does_not_attach_server_log_handler():
+    """모듈 import만으로는 로그 파일 핸들러/리스너 스레드가 생기지 않음"""
+    assert not hasattr(logger_module, "server_log_listener")
+    assert queue_handlers() == []
+
+def test_server_log_file_setup_and_close(tmp_path):
+    """시작 시 QueueHandler 추가, 종료 시 제거하고 남은 로그는 파일에 기록"""
+    path = tmp_path / "logs" / "backend.log"
+    listener = setup_server_log_file(str(path))
+    try:
+        assert len(queue_handlers()) == 1
+        logging.getLogger("test_logger").warning("server log line")
+    finally:
+        close_server_log_file(listener)
+    assert queue_handlers() == []
+    assert "server log line" in path.read_text(encoding="utf-8")
@@ -0,0 +1,137 @@
+# Ollama 노드 풀 - 로컬 스텁 서버로 라우팅, 장애 노드 제외/복귀 확인
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import ollama_pool as pool_module
+from ollama_client import ollama_clients
+from ollama_pool import OllamaPool, OllamaPoolUnavailable
+from scheduler import GPUScheduler
+from conftest import free_port
+
+MODEL = "gemma3:4b"
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    """노드 수 변경이 전역 스케줄러에 남지 않도록 테스트용 스케줄러 사용"""
+    scheduler = GPUScheduler({}, 1, 32, 8, {}, 1.0)
+    monkeypatch.setattr(pool_module, "gpu_scheduler", scheduler)
+    return scheduler
+
+def make_pool(endpoints, eject_seconds: float = 0.0) -> OllamaPool:
+    return OllamaPool(endpoints, health_interval=60.0, eject_failures=2,
+                      eject_seconds=eject_seconds, affinity_weight=1.5)
+
+def run(scenario):
+    """시나리오 실행 후 이벤트 루프에 묶인 공유 httpx 클라이언트 정리"""
+    async def wrapper():
+        try:
+            await scenario()
+        finally:
+            await ollama_clients.close()
+    asyncio.run(wrapper())
+
+def test_routes_to_resident_then_least_loaded(stub_ollama, scheduler):
+    """모델이 상주한 노드 우선, 진행 중 요청이 쌓이면 다른 노드로"""
+    cold = stub_ollama({MODEL: 3_000_000_000})
+    warm = stub_ollama({MODEL: 3_000_000_000}, resident=[MODEL])
+    other = stub_ollama({"llama3:8b": 5_000_000_000})
+
+    async def scenario():
+        pool = make_pool([cold.url, warm.url, other.url])
+        await pool.check_all()
+        assert pool.select(MODEL).base_url == warm.url
+        pool.node(warm.url).outstanding = 2
+        assert pool.select(MODEL).base_url == cold.url
+        assert pool.select("llama3:8b").base_url == other.url
+        with pytest.raises(OllamaPoolUnavailable):
+            pool.select("missing-model")
+
+    run(scenario)
+
+def test_unreachable_node_is_ejected(stub_ollama, scheduler):
+    """연결되지 않는 노드는 연속 실패 후 제외되고 슬롯 수도 줄어듦"""
+    alive = stub_ollama({MODEL: 1})
+    dead_url = f"http://127.0.0.1:{free_port()}"
+
+    async def scenario():
+        pool = make_pool([alive.url, dead_url], eject_seconds=60.0)
+        await pool.start()
+        assert scheduler.node_count == 2
+        await pool.stop()
+
+        await pool.check_all()
+        assert pool.node(dead_url).healthy
+        await pool.check_all()
+        assert not pool.node(dead_url).healthy
+        assert pool.ejections == 1
+        assert scheduler.node_count == 1
+        assert [node.base_url for node in pool.usable_nodes()] == [alive.url]
+        for _ in range(3):
+            assert pool.select(MODEL).base_url == alive.url
+
+    run(scenario)
+
+def test_ejected_node_returns_after_recovery(stub_ollama, scheduler):
+    """실패하던 노드가 제외 시간 이후 헬스체크를 통과하면 복귀"""
+    flaky = stub_ollama({MODEL: 1}, resident=[MODEL])
+    alive = stub_ollama({MODEL: 1})
+
+    async def scenario():
+        pool = make_pool([flaky.url, alive.url], eject_seconds=0.3)
+        node = pool.node(flaky.url)
+        flaky.healthy = False
+        await pool.check_all()
+        await pool.check_all()
+        assert not node.healthy
+        assert pool.select(MODEL).base_url == alive.url
+
+        # 제외 시간 안에는 헬스체크가 통과해도 복귀하지 않음
+        flaky.healthy = True
+        assert await pool.check_node(node)
+        assert not node.healthy
+
+        await asyncio.sleep(max(0.0, node.ejected_until - time.monotonic()))
+        assert await pool.check_node(node)
+        assert node.healthy
+        assert pool.select(MODEL) is node
+
+    run(scenario)
+
+def test_transport_errors_in_requests_eject_node(stub_ollama, scheduler):
+    """요청 중 연결 오류도 노드 실패로 집계되어 제외로 이어짐"""
+    alive = stub_ollama({MODEL: 1})
+    dead_url = f"http://127.0.0.1:{free_port()}"
+
+    async def scenario():
+        pool = make_pool([dead_url, alive.url], eject_seconds=60.0)
+        node = pool.node(dead_url)
+        for _ in range(2):
+            with pytest.raises(httpx.TransportError):
+                async with pool.track(node):
+                    await node.client.get("/api/tags", timeout=1.0)
+        assert node.outstanding == 0
+        assert not node.healthy
+        assert pool.ejections == 1
+
+    run(scenario)
+
+def test_last_usable_node_is_never_ejected(scheduler):
+    """남은 노드가 하나뿐이면 계속 실패해도 제외하지 않고 선택 가능하게 둠 (서킷 브레이커가 담당)"""
+    dead_url = f"http://127.0.0.1:{free_port()}"
+
+    async def scenario():
+        pool = make_pool([dead_url], eject_seconds=60.0)
+        node = pool.node(dead_url)
+        for _ in range(4):
+            await pool.check_all()
+        assert node.healthy
+        assert node.consecutive_failures == 4
+        assert pool.ejections == 0
+        assert pool.ejections_skipped == 1
+        assert pool.select(MODEL) is node
+
+    run(scenario)
@@ -0,0 +1,115 @@
+# 요청 합치기 - 동일 요청은 생성 1회, 공유 슬롯은 가장 높은 우선순위 + 대기 알림은 모든 구독자에게
+
+import asyncio
+
+import request_coalescer as coalescer_module
+from request_coalescer import RequestCoalescer
+from scheduler import GPUScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+MODEL = "test-model"
+
+def test_identical_requests_share_one_generation_and_best_priority(monkeypatch):
+    """배치 요청에 대화형 요청이 합류하면 대기 중인 공유 슬롯이 대화형 레인으로 올라감"""
+    scheduler = GPUScheduler({}, 1, 32, 8, {}, 1.0)
+    monkeypatch.setattr(coalescer_module, "gpu_scheduler", scheduler)
+
+    async def scenario():
+        coalescer = RequestCoalescer()
+        order = []
+        updates = {"batch": [], "interactive": []}
+        generations = 0
+
+        def notifier(name):
+            async def on_update(position, eta):
+                updates[name].append(position)
+            return on_update
+
+        def factory(shared):
+            async def generate():
+                nonlocal generations
+                generations += 1
+                async with scheduler.slot(MODEL, "client", shared.priority, shared.notify_queue, shared.key):
+                    order.append("shared")
+                    yield {"type": "done", "content": "답변"}
+            return generate()
+
+        async def other_batch():
+            async with scheduler.slot(MODEL, "other", PRIORITY_BATCH):
+                order.append("other")
+
+        await scheduler.acquire(MODEL, "holder")
+        other = asyncio.create_task(other_batch())
+        await asyncio.sleep(0)
+        first = asyncio.create_task(
+            coalescer.run("key", factory, PRIORITY_BATCH, notifier("batch")))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(
+            coalescer.run("key", factory, PRIORITY_INTERACTIVE, notifier("interactive")))
+        await asyncio.sleep(0.01)
+        assert updates["batch"] and updates["interactive"] == [1]
+
+        scheduler.release(MODEL)
+        results = await asyncio.gather(first, second, other)
+        assert results[0]["content"] == results[1]["content"] == "답변"
+        assert generations == 1
+        assert order == ["shared", "other"]
+        assert coalescer.coalesced == 1
+
+    asyncio.run(scenario())
+
+def test_promote_moves_waiting_group_to_interactive_lane():
+    """공유 생성 그룹을 promote하면 이미 대기 중인 배치 요청보다 먼저 배정"""
+    async def scenario():
+        scheduler = GPUScheduler({}, 1, 32, 8, {}, 1.0)
+        order = []
+
+        async def request(client_id: str, group=None):
+            await scheduler.acquire(MODEL, client_id, PRIORITY_BATCH, group=group)
+            order.append(client_id)
+            scheduler.release(MODEL)
+
+        await scheduler.acquire(MODEL, "holder")
+        first = asyncio.create_task(request("batch"))
+        await asyncio.sleep(0)
+        shared = asyncio.create_task(request("shared", group="key"))
+        await asyncio.sleep(0)
+        scheduler.promote("key", PRIORITY_INTERACTIVE)
+        scheduler.release(MODEL)
+        await asyncio.gather(first, shared)
+        assert order == ["shared", "batch"]
+        assert scheduler.promoted == 1
+
+    asyncio.run(scenario())
+
+def test_stream_request_does_not_join_unary_generation(monkeypatch):
+    """같은 질문이라도 스트리밍 요청은 단건 생성에 합류하지 않고 delta를 받음"""
+    import chat_handler
+
+    started = []
+
+    async def generate_ollama_response(message, model, history, payload, cache_ref, prompt_tokens=None):
+        started.append("unary")
+        await asyncio.sleep(0.05)
+        return "답변"
+
+    async def generate_ollama_stream(message, model, history, payload, cache_ref, prompt_tokens=None):
+        started.append("stream")
+        yield {"type": "delta", "content": "답변"}
+        yield {"type": "done", "content": "답변", "first_token_time": 0.0, "model": model}
+
+    async def lookup_cached_response(model, message, history, prompt, options):
+        return None, {"key": "same-prompt", "embedding": None}
+
+    monkeypatch.setattr(chat_handler, "generate_ollama_response", generate_ollama_response)
+    monkeypatch.setattr(chat_handler, "generate_ollama_stream", generate_ollama_stream)
+    monkeypatch.setattr(chat_handler, "lookup_cached_response", lookup_cached_response)
+
+    async def scenario():
+        unary = asyncio.create_task(chat_handler.chat_with_ollama("질문", MODEL, []))
+        await asyncio.sleep(0)
+        events = [event async for event in chat_handler.stream_chat_with_ollama("질문", MODEL, [])]
+        assert [event["type"] for event in events] == ["delta", "done"]
+        assert await unary == "답변"
+
+    asyncio.run(scenario())
+    assert sorted(started) == ["stream", "unary"]
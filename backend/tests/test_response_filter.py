@@ -0,0 +1,53 @@
+# 응답 필터 - 결합 정규식으로 줄 판별 후 규칙별 매칭, 스트리밍 청크 증분 검사
+
+import json
+
+import pytest
+
+from response_filter import CompiledRuleSet, FilterRule, ResponseFilterEngine
+
+RULES = [
+    {"id": "future_year", "pattern": "2025년.*이후", "label": "미래 정보"},
+    {"id": "new_technology", "pattern": "새로운?\\s*(기술|제품|서비스)", "label": "신기술 정보"},
+    {"id": "official_announcement", "pattern": "공식.*발표.*했습니다", "label": "공식 발표"},
+]
+
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / "filter_rules.json"
+    path.write_text(json.dumps({"rules": RULES}, ensure_ascii=False), encoding="utf-8")
+    return ResponseFilterEngine(str(path), reload_check_interval=0.0)
+
+def rule_ids(findings):
+    return sorted(rule.rule_id for rule in findings)
+
+def test_overlapping_rules_on_one_line_all_fire():
+    """앞 규칙의 ".*" 매치가 같은 줄의 다른 규칙 매치를 덮어도 모든 규칙을 보고"""
+    ruleset = CompiledRuleSet([FilterRule(r["id"], r["pattern"], r["label"]) for r in RULES], 1)
+    fired = {}
+    ruleset.scan_line("2025년 이후 새로운 기술을 공식 발표했습니다", fired)
+    assert sorted(fired) == ["future_year", "new_technology", "official_announcement"]
+
+def test_clean_line_fires_nothing():
+    """결합 정규식에 걸리지 않는 줄은 규칙별 검사 없이 통과"""
+    ruleset = CompiledRuleSet([FilterRule(r["id"], r["pattern"], r["label"]) for r in RULES], 1)
+    fired = {}
+    ruleset.scan_line("파이썬 리스트는 순서가 있는 자료형입니다", fired)
+    assert fired == {}
+
+def test_stream_scanner_matches_line_scan_across_chunks(engine):
+    """줄 중간에서 잘린 청크도 완성된 줄 기준으로 검사"""
+    text = "첫 줄은 괜찮습니다\n2025년 이후에는 새로운 서비스가\n나옵니다"
+    scanner = engine.scanner()
+    for index in range(0, len(text), 3):
+        scanner.feed(text[index:index + 3])
+    assert rule_ids(scanner.finish()) == ["future_year", "new_technology"]
+    assert rule_ids(engine.scan(text)) == ["future_year", "new_technology"]
+
+def test_invalid_rule_is_skipped_on_reload(engine, tmp_path):
+    """잘못된 정규식 규칙만 건너뛰고 나머지는 적용"""
+    rules = RULES + [{"id": "broken", "pattern": "(unclosed", "label": "오류"}]
+    (tmp_path / "filter_rules.json").write_text(json.dumps({"rules": rules}), encoding="utf-8")
+    assert engine.reload()
+    assert [rule.rule_id for rule in engine.ruleset.rules] == [r["id"] for r in RULES]
+    assert engine.reload_errors == 1
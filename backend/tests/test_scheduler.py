@@ -0,0 +1,78 @@
+# GPU 스케줄러 - 가중 공정 큐잉, 우선순위 레인, 배치 레인 상한
+
+import asyncio
+
+import pytest
+
+from scheduler import GPUScheduler, SchedulerQueueFull, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+MODEL = "test-model"
+
+def make_scheduler(**overrides) -> GPUScheduler:
+    options = dict(model_concurrency={}, default_concurrency=1, max_queue=32, max_batch_queue=8,
+                   client_weights={}, initial_service_time=1.0)
+    options.update(overrides)
+    return GPUScheduler(**options)
+
+async def dispatch_order(scheduler: GPUScheduler, requests):
+    """슬롯 1개를 잡아 둔 채 (client_id, priority) 요청을 차례로 대기시킨 뒤 배정 순서 반환"""
+    order = []
+
+    async def request(client_id: str, priority: str):
+        await scheduler.acquire(MODEL, client_id, priority)
+        order.append(client_id)
+        scheduler.release(MODEL, 0.01)
+
+    await scheduler.acquire(MODEL, "holder")
+    tasks = []
+    for client_id, priority in requests:
+        tasks.append(asyncio.create_task(request(client_id, priority)))
+        await asyncio.sleep(0)
+    assert scheduler.queue_depth(MODEL) == len(requests)
+    scheduler.release(MODEL)
+    await asyncio.gather(*tasks)
+    return order
+
+def test_fair_queueing_interleaves_clients():
+    """먼저 몰아 넣은 클라이언트가 있어도 클라이언트별로 번갈아 배정"""
+    scheduler = make_scheduler()
+    requests = [("a", PRIORITY_BATCH)] * 4 + [("b", PRIORITY_BATCH)] * 2
+    order = asyncio.run(dispatch_order(scheduler, requests))
+    assert order == ["a", "b", "a", "b", "a", "a"]
+
+def test_client_weight_gets_proportional_share():
+    """가중치 2인 클라이언트는 같은 구간에 두 배로 배정"""
+    scheduler = make_scheduler(client_weights={"vip": 2.0})
+    requests = [("regular", PRIORITY_BATCH)] * 3 + [("vip", PRIORITY_BATCH)] * 3
+    order = asyncio.run(dispatch_order(scheduler, requests))
+    assert order == ["vip", "regular", "vip", "vip", "regular", "regular"]
+
+def test_interactive_lane_goes_first():
+    """대화형 레인은 먼저 들어온 배치 요청보다 먼저 배정"""
+    scheduler = make_scheduler()
+    requests = [("batch", PRIORITY_BATCH)] * 2 + [("ws", PRIORITY_INTERACTIVE)]
+    order = asyncio.run(dispatch_order(scheduler, requests))
+    assert order == ["ws", "batch", "batch"]
+
+def test_batch_lane_cap_leaves_room_for_interactive():
+    """배치 레인이 상한에 닿으면 배치만 거절하고 대화형 요청은 계속 받음"""
+    async def scenario():
+        scheduler = make_scheduler(max_queue=4, max_batch_queue=2)
+        await scheduler.acquire(MODEL, "holder")
+        waiting = [asyncio.create_task(scheduler.acquire(MODEL, f"batch{i}", PRIORITY_BATCH))
+                   for i in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(SchedulerQueueFull):
+            await scheduler.acquire(MODEL, "batch2", PRIORITY_BATCH)
+        waiting.append(asyncio.create_task(scheduler.acquire(MODEL, "ws", PRIORITY_INTERACTIVE)))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth(MODEL) == 3
+        assert scheduler.rejected == 1
+
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        assert scheduler.queue_depth(MODEL) == 0
+
+    asyncio.run(scenario())
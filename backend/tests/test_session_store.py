@@ -0,0 +1,56 @@
+# 세션 히스토리 동기화 - 링 버퍼 끝부분 비교 (기존 전체 히스토리 클라이언트 호환)
+
+from config import SESSION_MAX_MESSAGES
+from session_store import ConversationSession
+
+def conversation(turns: int):
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"질문 {turn}"})
+        history.append({"role": "assistant", "content": f"답변 {turn}"})
+    return history
+
+def make_session(history) -> ConversationSession:
+    session = ConversationSession("s1")
+    for msg in history:
+        session.append(msg["role"], msg["content"])
+    return session
+
+def test_full_history_longer_than_ring_is_not_an_edit():
+    """링 버퍼보다 긴 전체 히스토리라도 끝부분이 같으면 교체하지 않음"""
+    history = conversation(SESSION_MAX_MESSAGES)
+    session = make_session(history)
+    session.summary = "이전 요약"
+    assert len(session.messages) == SESSION_MAX_MESSAGES
+
+    session.sync(history)
+    assert session.history_version == 0
+    assert session.summary == "이전 요약"
+    assert session.history() == history[-SESSION_MAX_MESSAGES:]
+
+def test_tail_only_history_is_not_an_edit():
+    """최근 몇 개만 보내는 클라이언트도 서버 히스토리를 유지"""
+    history = conversation(5)
+    session = make_session(history)
+    session.sync(history[-2:])
+    assert session.history_version == 0
+    assert session.history() == history
+
+def test_edited_message_replaces_history():
+    """겹치는 끝부분이 다르면 편집으로 보고 교체 + 요약 무효화"""
+    history = conversation(5)
+    session = make_session(history)
+    session.summary = "이전 요약"
+    edited = history[:-1] + [{"role": "assistant", "content": "수정된 답변"}]
+
+    session.sync(edited)
+    assert session.history_version == 1
+    assert session.summary is None
+    assert session.history() == edited
+
+def test_new_session_takes_client_history():
+    """서버에 히스토리가 없으면 클라이언트 히스토리로 채움"""
+    session = ConversationSession("s2")
+    history = conversation(2)
+    session.sync(history)
+    assert session.history() == history
@@ -2,22 +2,37 @@
 # WebSocket 연결 관리 및 실시간 채팅
 
 import json
+import time
+import asyncio
 import hashlib
 import logging
+from collections import Counter, deque
 from datetime import datetime
-from typing import List
+from typing import List, Dict, Any, Optional, Callable, Awaitable
 from fastapi import WebSocket, WebSocketDisconnect
 from logger import chat_logger
-from chat_handler import chat_with_ollama
-from config import DEFAULT_MODEL
+from chat_handler import chat_with_ollama, stream_chat_with_ollama, GenerationFailed
+from scheduler import SchedulerQueueFull, PRIORITY_INTERACTIVE
+from session_store import session_store
+from summarizer import conversation_summarizer
+from model_router import model_router
+from idempotency import (
+    idempotency_cache, validate_idempotency_key, make_fingerprint,
+    IdempotencyKeyError, IdempotencyConflict
+)
+from config import ENABLE_STREAMING, ENABLE_SUMMARIZATION, WS_PIPELINE_MAX_PENDING
 
 logger = logging.getLogger(__name__)
 
+FrameSender = Callable[[Dict[str, Any]], Awaitable[None]]
+
 class ConnectionManager:
     """WebSocket 연결 관리 클래스"""
     
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        self.cancellations: Counter = Counter()
+        self.pipeline_stats: Counter = Counter()
 
     async def connect(self, websocket: WebSocket):
         """WebSocket 연결 수락"""
@@ -46,11 +61,119 @@ class ConnectionManager:
             except Exception as e:
                 logger.error(f"브로드캐스트 실패: {e}")
 
+    def record_cancellation(self, reason: str):
+        """응답 생성 취소 집계 (user: 클라이언트 cancel 메시지, disconnect: 연결 종료)"""
+        self.cancellations[reason] += 1
+
+    def get_cancellation_stats(self) -> Dict[str, Any]:
+        return {"total": sum(self.cancellations.values()), "by_reason": dict(self.cancellations)}
+
+    def get_pipeline_stats(self) -> Dict[str, Any]:
+        """연결별 파이프라인 통계 (accepted: 수락, rejected: 대기열 초과, duplicates: 중복 무시)"""
+        return {
+            "max_pending": WS_PIPELINE_MAX_PENDING,
+            "accepted": self.pipeline_stats["accepted"],
+            "rejected": self.pipeline_stats["rejected"],
+            "duplicates": self.pipeline_stats["duplicates"]
+        }
+
 # 전역 연결 매니저 인스턴스
 manager = ConnectionManager()
 
+class PendingRequest:
+    """파이프라인에 들어온 채팅 요청 1건"""
+    __slots__ = ("request_id", "message_data", "message_hash", "enqueued_at")
+
+    def __init__(self, request_id: str, message_data: dict, message_hash: str):
+        self.request_id = request_id
+        self.message_data = message_data
+        self.message_hash = message_hash
+        self.enqueued_at = time.monotonic()
+
+class ConnectionPipeline:
+    """연결별 요청 파이프라인 - 제한된 대기열을 도착 순서대로 하나씩 처리
+
+    응답은 요청 순서대로 전달되며 모든 프레임에 request_id가 붙음.
+    앞 요청이 끝나면 바로 다음 요청을 GPU 스케줄러에 넣으므로 연속 질문 사이에 공백이 없음
+    """
+
+    def __init__(self, websocket: WebSocket, user_ip: str, max_pending: int):
+        self.websocket = websocket
+        self.user_ip = user_ip
+        self.max_pending = max_pending
+        self.pending: deque = deque()
+        self.current: Optional[PendingRequest] = None
+        self.session_id: Optional[str] = None  # 세션 ID 없이 이어 보낸 요청은 이 연결의 세션 사용
+        self._task: Optional[asyncio.Task] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def has_request(self, request_id: str) -> bool:
+        if self.current is not None and self.current.request_id == request_id:
+            return True
+        return any(request.request_id == request_id for request in self.pending)
+
+    def outstanding(self) -> int:
+        """진행 중 + 대기 중인 요청 수"""
+        return len(self.pending) + (1 if self.current is not None else 0)
+
+    def submit(self, request: PendingRequest) -> bool:
+        """대기열에 추가 - 진행 중 포함 max_pending건이 차 있으면 False"""
+        if self.outstanding() >= self.max_pending:
+            return False
+        self.pending.append(request)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._drain())
+        return True
+
+    async def _drain(self):
+        while self.pending:
+            request = self.pending.popleft()
+            self.current = request
+            self._task = asyncio.create_task(handle_chat_message(self, request))
+            try:
+                await asyncio.wait({self._task})
+            finally:
+                self.current = None
+                self._task = None
+
+    async def cancel(self, reason: str, request_id: Optional[str] = None) -> List[str]:
+        """요청 취소 - request_id가 없으면 진행 중인 요청과 대기 중인 요청 모두 취소
+
+        진행 중인 요청은 태스크 종료까지 대기 (GPU 슬롯 반납 + 업스트림 Ollama 요청 중단)
+        """
+        cancelled = []
+        for request in list(self.pending):
+            if request_id is None or request.request_id == request_id:
+                self.pending.remove(request)
+                cancelled.append(request.request_id)
+
+        task, current = self._task, self.current
+        if task is not None and not task.done() and (request_id is None or current.request_id == request_id):
+            task.cancel()
+            await asyncio.wait({task})
+            cancelled.insert(0, current.request_id)
+            # 멱등성 키 생성은 연결과 분리되어 있으므로 사용자 취소일 때만 함께 중단
+            # (연결 종료는 구독만 해제 → 재연결 후 같은 키로 재전송하면 이어받음)
+            idempotency_key = current.message_data.get("idempotency_key")
+            if reason == "user" and idempotency_key:
+                idempotency_cache.abort(str(idempotency_key))
+
+        for _ in cancelled:
+            manager.record_cancellation(reason)
+        if cancelled:
+            chat_logger.log_session_event(self.user_ip, f"응답 생성 취소 ({reason}, {len(cancelled)}건)")
+            logger.info(f"🛑 응답 생성 취소 ({self.user_ip}, 사유: {reason}, {len(cancelled)}건)")
+        return cancelled
+
+    async def close(self, reason: str):
+        """연결 종료 - 대기 중/진행 중 요청 모두 취소 후 작업자 정리"""
+        await self.cancel(reason)
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            await asyncio.wait({self._worker})
+
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket을 통한 실시간 채팅 - 메시지 중복 방지 개선"""
+    """WebSocket을 통한 실시간 채팅 - 연결별 요청 파이프라인 + 진행 중 생성 취소"""
     await manager.connect(websocket)
     
     # 클라이언트 IP 추출
@@ -60,8 +183,8 @@ async def websocket_endpoint(websocket: WebSocket):
     chat_logger.log_session_event(user_ip, f"WebSocket 세션 시작 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     logger.info(f"WebSocket 클라이언트 연결됨: {user_ip}")
     
-    # 메시지 처리 상태 추적
-    processing_message = False
+    # 응답 생성은 파이프라인 작업자가 처리 (생성 중에도 다음 요청/cancel 메시지 수신)
+    pipeline = ConnectionPipeline(websocket, user_ip, WS_PIPELINE_MAX_PENDING)
     last_message_hash = None
     
     try:
@@ -70,68 +193,52 @@ async def websocket_endpoint(websocket: WebSocket):
             data = await websocket.receive_text()
             message_data = json.loads(data)
             
-            # 메시지 처리
-            should_continue = await process_websocket_message(
-                websocket, message_data, user_ip, processing_message, last_message_hash
-            )
+            # 응답 생성 취소 요청 (request_id 지정 시 해당 요청만)
+            if message_data.get("type") == "cancel":
+                cancelled = await pipeline.cancel("user", message_data.get("request_id"))
+                for request_id in cancelled:
+                    await manager.send_personal_message(
+                        json.dumps({
+                            "type": "chat_cancelled",
+                            "message": "응답 생성을 중단했습니다.",
+                            "request_id": request_id,
+                            "timestamp": datetime.now().isoformat()
+                        }),
+                        websocket
+                    )
+                continue
             
-            if not should_continue[0]:  # 처리 중단
+            # 메시지 검증
+            request, last_message_hash = await process_websocket_message(
+                websocket, message_data, user_ip, pipeline, last_message_hash
+            )
+            if request is None:  # 처리 중단
                 continue
-                
-            processing_message, last_message_hash = should_continue[1], should_continue[2]
             
-            try:
-                user_message = message_data.get("message", "").strip()
-                model = message_data.get("model", DEFAULT_MODEL)
-                conversation_history = message_data.get("conversation_history", [])
-                
-                logger.info(f"사용자 메시지 받음 ({user_ip}): {user_message[:50]}...")
-                
-                # 사용자 메시지 로깅
-                chat_logger.log_message(user_ip, "user", user_message)
-                
-                # AI 응답 생성 (대화 히스토리 포함)
-                start_time = datetime.now()
-                ai_response = await chat_with_ollama(user_message, model, conversation_history)
-                response_time = (datetime.now() - start_time).total_seconds()
-                
-                # AI 응답 로깅
-                chat_logger.log_message(user_ip, "assistant", ai_response, response_time, model)
-                
-                # 클라이언트에게 AI 응답 전송
-                response_data = {
-                    "type": "chat_response",
-                    "message": ai_response,
-                    "model": model,
-                    "response_time": response_time,
-                    "timestamp": datetime.now().isoformat(),
-                    "message_hash": last_message_hash  # 메시지 해시 반환
-                }
-                
-                await manager.send_personal_message(
-                    json.dumps(response_data), 
-                    websocket
-                )
-                
-            except Exception as e:
-                logger.error(f"메시지 처리 중 오류: {e}")
+            if not pipeline.submit(request):
+                manager.pipeline_stats["rejected"] += 1
+                logger.warning(f"연결별 대기열 초과로 요청 거절 ({user_ip}): {request.request_id}")
                 await manager.send_personal_message(
                     json.dumps({
                         "type": "error",
-                        "message": f"메시지 처리 오류: {str(e)}",
+                        "code": "queue_full",
+                        "message": f"대기 중인 요청이 너무 많습니다 (최대 {WS_PIPELINE_MAX_PENDING}건). 이전 응답을 받은 뒤 다시 보내주세요.",
+                        "request_id": request.request_id,
                         "timestamp": datetime.now().isoformat()
                     }),
                     websocket
                 )
-            finally:
-                # 처리 완료 후 플래그 해제
-                processing_message = False
+                continue
+            manager.pipeline_stats["accepted"] += 1
                 
     except WebSocketDisconnect:
+        # 탭을 닫는 등 연결이 끊기면 아무도 받지 않을 생성을 중단
+        await pipeline.close("disconnect")
         manager.disconnect(websocket)
         chat_logger.log_session_event(user_ip, f"WebSocket 세션 종료 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         logger.info(f"클라이언트 연결 해제됨: {user_ip}")
     except Exception as e:
+        await pipeline.close("error")
         logger.error(f"WebSocket 오류 ({user_ip}): {str(e)}")
         chat_logger.log_message(user_ip, "system", f"WebSocket 오류: {str(e)}")
         await manager.send_personal_message(
@@ -143,44 +250,238 @@ async def websocket_endpoint(websocket: WebSocket):
             websocket
         )
 
-async def process_websocket_message(websocket: WebSocket, message_data: dict, 
-                                   user_ip: str, processing_message: bool, 
-                                   last_message_hash: str) -> tuple:
-    """WebSocket 메시지 전처리 및 검증"""
-    
-    # 데이터 처리 및 유효성 검사
-    message_type = message_data.get("type", "chat")  # 기본값은 chat
+async def handle_chat_message(pipeline: ConnectionPipeline, request: PendingRequest):
+    """채팅 요청 1건 처리 - 세션 히스토리, 모델 라우팅, 응답 생성/전송 (모든 프레임에 request_id)"""
+    websocket, user_ip, message_data = pipeline.websocket, pipeline.user_ip, request.message_data
+    tags = {"request_id": request.request_id, "message_hash": request.message_hash}
     user_message = message_data.get("message", "").strip()
+    attached = True  # 이 요청이 취소/연결 종료되면 생성은 계속되더라도 프레임 전송 중단
     
-    # 메시지 타입이 chat이 아니면 무시
-    if message_type != "chat":
-        logger.warning(f"알 수 없는 메시지 타입: {message_type}")
-        return (False, processing_message, last_message_hash)
+    async def send_frame(frame: Dict[str, Any]):
+        if attached:
+            await manager.send_personal_message(json.dumps(frame), websocket)
     
-    # 메시지 중복 처리 방지 - 빈 메시지는 무시하지만 처리 중인 경우 대기
-    if not user_message:
-        return (False, processing_message, last_message_hash)
+    async def generate() -> Dict[str, Any]:
+        # 서버 측 세션 히스토리 (기존 클라이언트가 보낸 전체 히스토리도 그대로 지원)
+        session = session_store.get_or_create(message_data.get("session_id") or pipeline.session_id)
+        pipeline.session_id = session.session_id
+        conversation_history = session_store.resolve_history(
+            session, message_data.get("conversation_history") or []
+        )
+        
+        logger.info(f"사용자 메시지 받음 ({user_ip}, {request.request_id}): {user_message[:50]}...")
+        
+        # 사용자 메시지 로깅
+        chat_logger.log_message(user_ip, "user", user_message)
         
-    if processing_message:
-        # 처리 중인 경우 대기 메시지 전송
+        # 질문 복잡도 / 현재 부하로 모델 선택
+        route = model_router.route(user_message, conversation_history, message_data.get("model"))
+        model = route.model
+        
+        # AI 응답 생성 (대화 히스토리 포함)
+        # 생성 실패는 예외로 전달 → 멱등성 키 항목이 지워지고 세션 히스토리에도 남지 않음
+        start_time = datetime.now()
+        first_token_time = None
+        on_queue_update = make_queue_notifier(send_frame, tags)
+        if ENABLE_STREAMING:
+            ai_response, first_token_time, model = await stream_websocket_response(
+                send_frame, user_message, model, conversation_history, tags,
+                user_ip, on_queue_update, summary=session.summary,
+                num_predict=route.num_predict
+            )
+            if model is None:
+                raise GenerationFailed(ai_response)
+        else:
+            ai_response = await chat_with_ollama(
+                user_message, model, conversation_history,
+                client_id=user_ip, priority=PRIORITY_INTERACTIVE,
+                on_queue_update=on_queue_update, summary=session.summary,
+                num_predict=route.num_predict, raise_on_failure=True
+            )
+        response_time = (datetime.now() - start_time).total_seconds()
+        session_store.record_turn(session, user_message, ai_response)
+        if ENABLE_SUMMARIZATION:
+            conversation_summarizer.maybe_schedule(session)
+        
+        # AI 응답 로깅
+        chat_logger.log_message(user_ip, "assistant", ai_response, response_time, model)
+        return {
+            "ai_response": ai_response,
+            "model": model,
+            "route": route.to_dict(),
+            "response_time": response_time,
+            "first_token_time": first_token_time,
+            "session_id": session.session_id
+        }
+    
+    status = None
+    start_time = datetime.now()
+    try:
+        # 멱등성 키가 있으면 재연결 후 재전송은 원래 결과를 받거나 진행 중인 생성에 합류
+        idempotency_key = message_data.get("idempotency_key")
+        if idempotency_key:
+            result, status = await idempotency_cache.run(
+                validate_idempotency_key(str(idempotency_key)),
+                make_fingerprint(user_message, message_data.get("model")), generate
+            )
+            pipeline.session_id = pipeline.session_id or result["session_id"]
+        else:
+            result = await generate()
+        
+        # 클라이언트에게 AI 응답 전송 (스트리밍 시 최종 전체 텍스트)
+        response_data = {
+            "type": "chat_response",
+            "message": result["ai_response"],
+            "model": result["model"],
+            "route": result["route"],           # 모델 선택 사유
+            "response_time": result["response_time"],
+            "first_token_time": result["first_token_time"],
+            "streamed": ENABLE_STREAMING and status in (None, "new"),  # 합류/재사용 시 delta 없음
+            "idempotency": status,
+            "timestamp": datetime.now().isoformat(),
+            **tags,                             # 요청 ID / 메시지 해시 반환
+            "pending": len(pipeline.pending),   # 이 연결에서 아직 대기 중인 요청 수
+            "session_id": result["session_id"]  # 다음 요청부터 히스토리 대신 전송
+        }
+        
+        await manager.send_personal_message(
+            json.dumps(response_data), 
+            websocket
+        )
+        
+    except asyncio.CancelledError:
+        attached = False
+        raise
+    except (IdempotencyKeyError, IdempotencyConflict) as e:
+        logger.warning(f"멱등성 키 오류 ({user_ip}): {e}")
         await manager.send_personal_message(
             json.dumps({
-                "type": "system",
-                "message": "이전 메시지를 처리 중입니다. 잠시만 기다려주세요.",
+                "type": "error",
+                "code": "idempotency_conflict" if isinstance(e, IdempotencyConflict) else "invalid_idempotency_key",
+                "message": str(e),
+                **tags,
                 "timestamp": datetime.now().isoformat()
             }),
             websocket
         )
-        return (False, processing_message, last_message_hash)
-        
-    # 동일한 메시지 중복 처리 방지 (해시 비교)
+    except GenerationFailed as e:
+        # 안내 문구만 전달 (스트리밍이면 delta로 이미 보냄) - 히스토리/멱등성 결과로 남기지 않음
+        logger.warning(f"응답 생성 실패 ({user_ip}, {request.request_id}): {e}")
+        await send_frame({
+            "type": "chat_response",
+            "message": str(e),
+            "model": None,
+            "route": None,
+            "response_time": (datetime.now() - start_time).total_seconds(),
+            "first_token_time": None,
+            "streamed": ENABLE_STREAMING and status in (None, "new"),
+            "failed": True,
+            "idempotency": status,
+            "timestamp": datetime.now().isoformat(),
+            **tags,
+            "pending": len(pipeline.pending),
+            "session_id": pipeline.session_id
+        })
+    except SchedulerQueueFull as e:
+        logger.warning(f"대기열 초과로 요청 거절 ({user_ip})")
+        await manager.send_personal_message(
+            json.dumps({
+                "type": "error",
+                "code": "server_busy",
+                "message": str(e),
+                **tags,
+                "timestamp": datetime.now().isoformat()
+            }),
+            websocket
+        )
+    except Exception as e:
+        logger.error(f"메시지 처리 중 오류: {e}")
+        await manager.send_personal_message(
+            json.dumps({
+                "type": "error",
+                "message": f"메시지 처리 오류: {str(e)}",
+                **tags,
+                "timestamp": datetime.now().isoformat()
+            }),
+            websocket
+        )
+
+def make_queue_notifier(send_frame: FrameSender, tags: Dict[str, str]):
+    """GPU 스케줄러 대기 순번/예상 시간을 system 프레임으로 전달하는 콜백 생성"""
+    async def notify(position: int, eta: float):
+        await send_frame({
+            "type": "system",
+            "message": f"요청 대기 중입니다 ({position}번째, 약 {eta:.0f}초)",
+            "queue_position": position,
+            "eta_seconds": round(eta, 1),
+            **tags,
+            "timestamp": datetime.now().isoformat()
+        })
+    return notify
+
+async def stream_websocket_response(send_frame: FrameSender, user_message: str, model: str,
+                                    conversation_history: list, tags: Dict[str, str],
+                                    user_ip: str = "unknown", on_queue_update=None,
+                                    summary: str = None, num_predict: int = None) -> tuple:
+    """스트리밍 응답을 chat_response_delta 프레임으로 전달 - (최종 응답, 첫 토큰 시간, 실제 응답한 모델) 반환
+
+    헤지로 백업 모델이 응답했으면 그 모델, 생성 실패로 안내 문구만 전달했으면 None
+    """
+    ai_response = ""
+    first_token_time = None
+    answered_by = model
+    
+    events = stream_chat_with_ollama(
+        user_message, model, conversation_history,
+        client_id=user_ip, priority=PRIORITY_INTERACTIVE, on_queue_update=on_queue_update,
+        summary=summary, num_predict=num_predict
+    )
+    async for event in events:
+        if event["type"] == "delta":
+            await send_frame({
+                "type": "chat_response_delta",
+                "delta": event["content"],
+                "model": model,
+                **tags
+            })
+        elif event["type"] == "done":
+            ai_response = event["content"]
+            first_token_time = event.get("first_token_time")
+            answered_by = event.get("model", model)
+    
+    return ai_response, first_token_time, answered_by
+
+async def process_websocket_message(websocket: WebSocket, message_data: dict, user_ip: str,
+                                    pipeline: ConnectionPipeline, last_message_hash: str) -> tuple:
+    """WebSocket 메시지 전처리 및 검증 - (처리할 요청 또는 None, 마지막 메시지 해시) 반환"""
+    
+    # 데이터 처리 및 유효성 검사
+    message_type = message_data.get("type", "chat")  # 기본값은 chat
+    user_message = message_data.get("message", "").strip()
+    
+    # 메시지 타입이 chat이 아니면 무시 (cancel은 수신 루프에서 먼저 처리)
+    if message_type != "chat":
+        logger.warning(f"알 수 없는 메시지 타입: {message_type}")
+        return (None, last_message_hash)
+    
+    # 빈 메시지는 무시
+    if not user_message:
+        return (None, last_message_hash)
+    
     message_hash = hashlib.md5(f"{user_message}_{datetime.now().strftime('%Y%m%d%H%M')}".encode()).hexdigest()
-    if message_hash == last_message_hash:
-        logger.warning(f"중복 메시지 무시: {user_message[:30]}...")
-        return (False, processing_message, last_message_hash)
-        
-    # 처리 상태 플래그 설정
-    processing_message = True
-    last_message_hash = message_hash
+    request_id = str(message_data.get("request_id") or "")[:64]
+    if request_id:
+        # 같은 요청 ID 재전송은 대기 중/진행 중이면 무시 (클라이언트 재시도)
+        if pipeline.has_request(request_id):
+            manager.pipeline_stats["duplicates"] += 1
+            logger.warning(f"중복 요청 ID 무시: {request_id}")
+            return (None, last_message_hash)
+    else:
+        # 요청 ID가 없는 기존 클라이언트는 동일한 메시지 중복 처리 방지 (해시 비교)
+        if message_hash == last_message_hash:
+            manager.pipeline_stats["duplicates"] += 1
+            logger.warning(f"중복 메시지 무시: {user_message[:30]}...")
+            return (None, last_message_hash)
+        request_id = message_hash[:12]
     
-    return (True, processing_message, last_message_hash)
+    return (PendingRequest(request_id, message_data, message_hash), message_hash)
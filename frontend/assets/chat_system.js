@@ -6,8 +6,13 @@
 class ChatSystem {
     constructor() {
         this.conversationHistory = [];
+        this.sessionId = null;  // 서버 측 세션 ID (받은 뒤에는 히스토리 대신 전송)
         this.isProcessingMessage = false;
+        this.pendingRequests = [];  // 응답을 아직 못 받은 요청 {requestId, message} (재연결 시 재전송)
+        this.requestSeq = 0;
         this.demoResponseTimer = null;
+        this.streamingMessageEl = null;
+        this.streamingText = '';
         this.init();
     }
 
@@ -43,6 +48,10 @@ class ChatSystem {
                     this.sendMessage();
                     return false;
                 }
+                // ESC: 진행 중/대기 중인 응답 생성 중단
+                if (e.key === 'Escape' && this.isProcessingMessage) {
+                    window.websocketClient?.cancelGeneration();
+                }
             });
         }
         
@@ -71,7 +80,8 @@ class ChatSystem {
             return;
         }
         
-        if (this.isProcessingMessage) {
+        // 서버가 연결별로 요청을 순서대로 처리하므로 응답 대기 중에도 바로 전송 (데모 모드에서는 기존처럼 무시)
+        if (this.isProcessingMessage && !window.websocketClient?.isWebSocketConnected()) {
             console.log('이미 처리 중인 메시지로 인한 전송 취소');
             return;
         }
@@ -102,10 +112,15 @@ class ChatSystem {
     sendToAI(message) {
         console.log('AI 전송 시작:', { message, isConnected: window.websocketClient?.isConnected });
         
-        // WebSocket 전송 시도
-        const sent = window.websocketClient?.sendMessage(message, this.getConversationHistoryForAI());
+        // WebSocket 전송 시도 (이어 보낸 요청은 서버가 같은 연결의 세션 히스토리 사용)
+        const pipelined = this.pendingRequests.length > 0;
+        const history = this.sessionId || pipelined ? [] : this.getConversationHistoryForAI();
+        const requestId = this.createRequestId();
+        const sent = window.websocketClient?.sendMessage(message, history, this.sessionId, requestId);
         
-        if (!sent) {
+        if (sent) {
+            this.pendingRequests.push({ requestId, message });
+        } else {
             console.log('WebSocket 전송 실패, 데모 모드로 전환');
             this.simulateDemoResponse(message);
         }
@@ -219,6 +234,9 @@ class ChatSystem {
         const chatMessages = document.querySelector('.dec207-chat-messages');
         if (!chatMessages) return;
         
+        // 이어 보낸 요청이 있어도 표시는 하나만 (맨 아래로 이동)
+        this.hideTypingIndicator();
+        
         const typingEl = document.createElement('div');
         typingEl.className = 'dec207-typing-indicator';
         typingEl.innerHTML = `
@@ -234,6 +252,13 @@ class ChatSystem {
         chatMessages.scrollTop = chatMessages.scrollHeight;
     }
 
+    updateQueueStatus(position, etaSeconds) {
+        const label = document.querySelector('.dec207-typing-indicator span');
+        if (label) {
+            label.textContent = `대기 중... (${position}번째, 약 ${Math.round(etaSeconds)}초)`;
+        }
+    }
+
     hideTypingIndicator() {
         const typingIndicator = document.querySelector('.dec207-typing-indicator');
         if (typingIndicator) {
@@ -279,13 +304,34 @@ class ChatSystem {
 
     // ===== WebSocket 메시지 처리 =====
     handleWebSocketMessage(data) {
+        // 대기열 상태는 타이핑 인디케이터에만 표시
+        if (data.type === 'system' && data.queue_position !== undefined) {
+            this.updateQueueStatus(data.queue_position, data.eta_seconds);
+            return;
+        }
+        
+        // 생성 중단 확인 - 받은 부분까지 남기고 해당 요청 정리
+        if (data.type === 'chat_cancelled') {
+            this.keepPartialStreamingMessage();
+            this.completeRequest(data.request_id);
+            return;
+        }
+        
         this.hideTypingIndicator();
         
         switch (data.type) {
+            case 'chat_response_delta':
+                this.appendStreamingDelta(data.delta);
+                break;
+                
             case 'chat_response':
+                this.finishStreamingMessage();
+                if (data.session_id) {
+                    this.sessionId = data.session_id;
+                }
                 const sanitizedMessage = this.sanitizeMessage(data.message);
                 this.addMessageToChat(sanitizedMessage, 'ai');
-                this.isProcessingMessage = false;
+                this.completeRequest(data.request_id);
 
                 // TTS 처리
                 if (window.voiceHandler?.isTTSActive()) {
@@ -300,14 +346,85 @@ class ChatSystem {
                 break;
                 
             case 'error':
+                this.finishStreamingMessage();
                 const sanitizedError = this.sanitizeMessage(data.message);
                 console.error('WebSocket 오류:', sanitizedError);
                 // 오류 알림 메시지 제거 - 콘솔 로그만
-                this.isProcessingMessage = false;
+                if (data.request_id) {
+                    this.completeRequest(data.request_id);
+                } else {
+                    this.pendingRequests = [];
+                    this.isProcessingMessage = false;
+                }
                 break;
         }
     }
 
+    createRequestId() {
+        // 요청 ID는 멱등성 키로도 사용 (연결/탭이 달라도 겹치지 않게)
+        if (window.crypto?.randomUUID) {
+            return window.crypto.randomUUID();
+        }
+        return `req-${Date.now()}-${++this.requestSeq}-${Math.random().toString(36).slice(2, 10)}`;
+    }
+
+    resendPendingRequests() {
+        // 재연결 후 응답을 못 받은 요청은 같은 키로 재전송 - 서버가 원래 결과를 돌려주거나 진행 중인 생성에 합류
+        if (this.pendingRequests.length === 0) return;
+        
+        console.log(`응답 대기 중이던 요청 ${this.pendingRequests.length}건 재전송`);
+        this.finishStreamingMessage();
+        this.pendingRequests.forEach(({ requestId, message }) => {
+            window.websocketClient?.sendMessage(message, [], this.sessionId, requestId);
+        });
+        this.isProcessingMessage = true;
+        this.showTypingIndicator();
+    }
+
+    completeRequest(requestId) {
+        // 응답/오류/취소를 받은 요청 제거 - 남은 요청이 있으면 계속 대기 표시
+        this.pendingRequests = this.pendingRequests.filter(request => request.requestId !== requestId);
+        this.isProcessingMessage = this.pendingRequests.length > 0;
+        if (this.isProcessingMessage) {
+            this.showTypingIndicator();
+        }
+    }
+
+    // ===== 스트리밍 응답 처리 =====
+    appendStreamingDelta(delta) {
+        const chatMessages = document.querySelector('.dec207-chat-messages');
+        if (!chatMessages || typeof delta !== 'string') return;
+        
+        if (!this.streamingMessageEl) {
+            this.streamingMessageEl = document.createElement('div');
+            this.streamingMessageEl.className = 'dec207-message ai streaming';
+            this.streamingText = '';
+            chatMessages.appendChild(this.streamingMessageEl);
+        }
+        
+        // 진행 중에는 텍스트로만 표시, 최종 응답 수신 시 포맷팅
+        this.streamingText += delta;
+        this.streamingMessageEl.textContent = this.sanitizeMessage(this.streamingText);
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    }
+
+    keepPartialStreamingMessage() {
+        // 중단된 응답은 받은 부분까지 남김
+        if (this.streamingMessageEl) {
+            this.streamingMessageEl.classList.remove('streaming');
+        }
+        this.streamingMessageEl = null;
+        this.streamingText = '';
+    }
+
+    finishStreamingMessage() {
+        if (this.streamingMessageEl) {
+            this.streamingMessageEl.remove();
+        }
+        this.streamingMessageEl = null;
+        this.streamingText = '';
+    }
+
     sanitizeMessage(message) {
         if (typeof message !== 'string') {
             return '잘못된 메시지 형식';
@@ -348,6 +465,7 @@ class ChatSystem {
     
     clearChatHistory() {
         this.conversationHistory = [];
+        this.sessionId = null;
         const chatMessages = document.querySelector('.dec207-chat-messages');
         if (chatMessages) {
             chatMessages.innerHTML = '';
@@ -101,6 +101,9 @@ class WebSocketClient {
         this.updateConnectionStatus(true);
         console.log('✅ WebSocket 연결 성공!');
         
+        // 끊기기 전에 응답을 못 받은 요청 재전송
+        window.chatSystem?.resendPendingRequests();
+        
         // 알림 메시지 제거 - 콘솔 로그만 남김
     }
 
@@ -166,11 +169,14 @@ class WebSocketClient {
     }
 
     // ===== 메시지 전송 =====
-    sendMessage(message, conversationHistory = []) {
+    sendMessage(message, conversationHistory = [], sessionId = null, requestId = null) {
         if (this.websocket && this.websocket.readyState === WebSocket.OPEN) {
             const payload = {
                 type: 'chat',
                 message: message,
+                request_id: requestId,  // 응답 프레임에 그대로 돌아옴
+                idempotency_key: requestId,  // 재연결 후 재전송해도 다시 생성하지 않음
+                session_id: sessionId,
                 conversation_history: conversationHistory,
                 timestamp: new Date().toISOString()
             };
@@ -183,6 +189,16 @@ class WebSocketClient {
         return false;
     }
 
+    // 진행 중인 응답 생성 중단 요청 (서버가 Ollama 생성까지 중단)
+    cancelGeneration() {
+        if (this.websocket && this.websocket.readyState === WebSocket.OPEN) {
+            this.websocket.send(JSON.stringify({ type: 'cancel' }));
+            return true;
+        }
+        
+        return false;
+    }
+
     // ===== 상태 관리 =====
     updateConnectionStatus(connected) {
         if (window.uiComponents) {
@@ -192,7 +208,7 @@ class WebSocketClient {
 
     resetProcessingState() {
         if (window.chatSystem && window.chatSystem.isProcessingMessage) {
-            window.chatSystem.isProcessingMessage = false;
+            window.chatSystem.isProcessingMessage = false;  // 대기 중이던 요청은 재연결 시 재전송
             window.chatSystem.hideTypingIndicator();
         }
     }